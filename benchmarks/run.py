@@ -0,0 +1,357 @@
+'''
+Run the benchmarks and compare them against a baseline.
+
+Run from the repository root:
+
+    python -m benchmarks.run [--sizes 1000 100000 1000000] [--save-baseline]
+
+A result that isn't in the baseline fails the comparison, so a new benchmark has to be added to the baseline (with `--benchmarks <name> --save-baseline`, which leaves the other results alone) in the same change that adds it.
+
+Every benchmark runs in a fresh process, so that its peak RSS isn't inflated by whatever ran before it. Synthetic question and score files are generated (offline, from fixed seeds) into a temporary directory once per size.
+'''
+
+import argparse
+import builtins
+import contextlib
+import io
+import json
+import multiprocessing
+import os
+import random
+import resource
+import shutil
+import sys
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from benchmarks import synthetic
+
+# The repository root, which the config file's paths are relative to.
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+BASELINE_FILE_PATH = os.path.join(ROOT, 'benchmarks', 'baseline.json')
+QUESTION_FILE_NAME = 'questions.json'
+SCORE_FILE_NAME = 'scores.json'
+# The number of processes saving scores at once, and the number of scores each saves, in the concurrent save benchmark.
+SAVING_PROCESSES = 8
+SAVES_PER_PROCESS = 250
+# Differences smaller than these are timer and allocator noise, not regressions.
+NOISE_SECONDS = 0.005
+NOISE_RSS_KB = 4096
+# The number of worker processes in the parallel question loading benchmark.
+PARALLEL_LOAD_WORKERS = 4
+
+def bench_load_questions_file(directory:str, size:int):
+    import file_handling as files
+    file_path = os.path.join(directory, QUESTION_FILE_NAME)
+    return lambda: files.load_questions_file(file_path), size
+
+def bench_load_merged_questions_file(directory:str, size:int):
+    import file_handling as files
+    file_path = os.path.join(directory, f'merged-{os.getpid()}.json')
+    synthetic.write_merged_question_file(file_path, size)
+    return lambda: files.load_questions_file(file_path), size
+
+def bench_load_questions_parallel(directory:str, size:int):
+    import file_handling as files
+    file_path = os.path.join(directory, QUESTION_FILE_NAME)
+    merged_path = os.path.join(directory, f'merged-{os.getpid()}.json')
+    synthetic.write_merged_question_file(merged_path, size)
+
+    # Parsing in parallel must give exactly the same questions as parsing in one process, or the timing means nothing.
+    for path in (file_path, merged_path):
+        serial = files.load_questions_file(path)
+        parallel = files.load_questions_file(path, PARALLEL_LOAD_WORKERS)
+        parts = lambda question: (question.get_question, question.get_answer, question.get_answer_options, question.get_aliases, question.get_accepted_answers)
+        if [parts(question) for question in parallel] != [parts(question) for question in serial]:
+            raise AssertionError(f'Parsing {path} in parallel gave different questions')
+
+    return lambda: files.load_questions_file(file_path, PARALLEL_LOAD_WORKERS), size
+
+def bench_compile_merged_bank(directory:str, size:int):
+    import compiled_bank
+    file_path = os.path.join(directory, f'merged-{os.getpid()}.json')
+    synthetic.write_merged_question_file(file_path, size)
+    return lambda: compiled_bank.compile_bank(file_path, file_path + '.qbank'), size
+
+def bench_load_score_file(directory:str, size:int):
+    import file_handling as files
+    file_path = os.path.join(directory, SCORE_FILE_NAME)
+    return lambda: files.load_score_file(file_path), size
+
+def bench_load_score_history(directory:str, size:int):
+    import score_history
+    from score_store import ColumnarScoreStore
+    file_path = os.path.join(directory, f'scores-{os.getpid()}.history')
+    ColumnarScoreStore(file_path, os.path.join(directory, SCORE_FILE_NAME)).close()
+    return lambda: score_history.load_score_history(file_path), size
+
+def bench_save_score_file(directory:str, size:int):
+    import file_handling as files
+    scores = files.load_score_file(os.path.join(directory, SCORE_FILE_NAME))
+    file_path = os.path.join(directory, f'saved-{os.getpid()}.json')
+    return lambda: files.save_score_file(file_path, scores), size
+
+def save_scores(file_path:str, process:int, journal_compaction_size:int):
+    from score_store import JsonScoreStore
+    store = JsonScoreStore(file_path, journal_compaction_size)
+    for number in range(SAVES_PER_PROCESS):
+        store.add_score(f'saver{process}', f'2030-01-01 00:{number // 60:02d}:{number % 60:02d}', number % 101)
+
+def bench_concurrent_saves(directory:str, size:int):
+    import file_handling as files
+    file_path = os.path.join(directory, f'concurrent-{os.getpid()}.json')
+    scores = files.load_score_file(os.path.join(directory, SCORE_FILE_NAME))
+    context = multiprocessing.get_context('fork')
+
+    def save_concurrently():
+        files.save_score_file(file_path, scores)
+        # Small enough that the journal is compacted a few times while saving.
+        journal_compaction_size = SAVES_PER_PROCESS * 64
+        savers = [context.Process(target=save_scores, args=(file_path, process, journal_compaction_size)) for process in range(SAVING_PROCESSES)]
+        for saver in savers:
+            saver.start()
+        for saver in savers:
+            saver.join()
+        saved = files.load_score_file(file_path)
+        if any(len(saved.get(f'saver{process}', {})) != SAVES_PER_PROCESS for process in range(SAVING_PROCESSES)):
+            raise RuntimeError('Scores saved concurrently were lost.')
+
+    return save_concurrently, SAVING_PROCESSES * SAVES_PER_PROCESS
+
+def bench_sort_dict(directory:str, size:int):
+    import file_handling as files
+    from scores import sort_dict
+    scores = files.load_score_file(os.path.join(directory, SCORE_FILE_NAME))
+    all_scores = {f'{name} {time_stamp}' : score for name, user_scores in scores.items() for time_stamp, score in user_scores.items()}
+    return lambda: sort_dict(all_scores), size
+
+def bench_print_scores(directory:str, size:int):
+    import file_handling as files
+    from display_text import DisplayText
+    from prompts import Prompts
+    from scores import print_scores
+    from score_store import ColumnarScoreStore
+
+    settings = files.load_config_file(files.CONFIG_FILE_PATH)
+    files.load_data_class(settings.get_display_text_file_path, DisplayText)
+    files.load_data_class(settings.get_prompt_file_path, Prompts)
+    store = ColumnarScoreStore(os.path.join(directory, f'scores-{os.getpid()}.history'), os.path.join(directory, SCORE_FILE_NAME))
+    user_scores = len(store.get_user_scores('player0'))
+
+    def print_first_page():
+        # Show the first page, then answer "no" to seeing more.
+        with contextlib.redirect_stdout(io.StringIO()):
+            print_scores('player0', store, settings.get_score_table_size)
+
+    builtins.input = lambda *prompt: 'N'
+    return print_first_page, user_scores
+
+def bench_select_questions(directory:str, size:int):
+    import question_stats
+    from array import array
+
+    # Every tenth question has been asked, and every other one of those was answered incorrectly.
+    keys = array('Q', range(size))
+    stats = question_stats.QuestionStats()
+    for key in range(0, size, 10):
+        stats.add(key, 3 if key % 20 == 0 else 1, key % 20 != 0)
+    generator = random.Random(0)
+
+    def select():
+        selector = question_stats.QuestionSelector(keys, stats, 0.7)
+        for _ in range(100):
+            selector.sample(10, generator)
+
+    return select, size
+
+def bench_sample_sharded_bank(directory:str, size:int):
+    import question_shards
+
+    # The questions are split evenly into four categories, and each quiz draws ten questions from one of them.
+    bank_path = os.path.join(directory, f'shards-{os.getpid()}')
+    os.mkdir(bank_path)
+    categories = ['geography', 'history', 'science', 'music']
+    for seed, category in enumerate(categories):
+        synthetic.write_question_file(os.path.join(bank_path, f'{category}.json'), max(1, size // len(categories)), seed)
+    question_shards.index_sharded_bank(bank_path)
+
+    def sample():
+        bank = question_shards.index_sharded_bank(bank_path)
+        for quiz in range(100):
+            bank.sample(10, {categories[quiz % len(categories)] : 10}, quiz)
+
+    return sample, size
+
+def bench_quiz_scoring(directory:str, size:int):
+    import file_handling as files
+    from engine import QuizEngine
+
+    questions = files.load_questions_file(os.path.join(directory, QUESTION_FILE_NAME))
+    engine = QuizEngine(True, True, 3)
+
+    # Answer correctly first time about half the time, and after one or two wrong answers otherwise.
+    generator = random.Random(0)
+    answers:list[int] = []
+    for question in questions:
+        correct = question.get_answer_options.index(question.get_answer)
+        wrong = [o for o in range(len(question.get_answer_options)) if o != correct]
+        answers.extend(generator.sample(wrong, generator.choice((0, 0, 1, 2))))
+        answers.append(correct)
+
+    return lambda: engine.run(questions, answers), size
+
+# Every benchmark, keyed by name. Each takes the data directory and size, does any setup that shouldn't be timed, and returns the function to time and the number of operations (questions or scores) one call of it does.
+BENCHMARKS = {
+    'load_questions_file' : bench_load_questions_file
+    ,'load_merged_questions_file' : bench_load_merged_questions_file
+    ,'load_questions_parallel' : bench_load_questions_parallel
+    ,'compile_merged_bank' : bench_compile_merged_bank
+    ,'load_score_file' : bench_load_score_file
+    ,'load_score_history' : bench_load_score_history
+    ,'save_score_file' : bench_save_score_file
+    ,'concurrent_saves' : bench_concurrent_saves
+    ,'sort_dict' : bench_sort_dict
+    ,'print_scores' : bench_print_scores
+    ,'select_questions' : bench_select_questions
+    ,'sample_sharded_bank' : bench_sample_sharded_bank
+    ,'quiz_scoring' : bench_quiz_scoring
+}
+
+def measure(name:str, directory:str, size:int, repeat:int) -> dict:
+    '''
+    Run one benchmark (in a worker process).
+
+    Parameters:
+        name : str
+            The benchmark to run.
+        directory : str
+            The directory the synthetic files are in.
+        size : int
+            The number of questions or scores in the synthetic files.
+        repeat : int
+            The number of times to time the benchmark. The fastest time is kept.
+
+    Returns:
+        The fastest wall time, the operations per second at that time, and the process's peak RSS.
+    '''
+    os.chdir(ROOT)
+    run, operations = BENCHMARKS[name](directory, size)
+
+    wall_seconds = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        run()
+        wall_seconds = min(wall_seconds, time.perf_counter() - start)
+
+    return {
+        'wall_seconds' : wall_seconds
+        ,'ops_per_second' : operations / max(wall_seconds, 1e-9)
+        # `ru_maxrss` is in kilobytes on Linux.
+        ,'peak_rss_kb' : resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    }
+
+def compare(results:dict[str, dict], baseline:dict[str, dict], tolerance:float) -> list[str]:
+    '''
+    Parameters:
+        results : dict[str, dict]
+            This run's results, keyed by `"name@size"`.
+        baseline : dict[str, dict]
+            The baseline results, keyed the same way.
+        tolerance : float
+            How much worse (as a fraction) than the baseline a result can be before it counts as a regression (as long as it is also worse by more than `NOISE_SECONDS` or `NOISE_RSS_KB`).
+
+    Returns:
+        A description of every regression, and of every result missing from the baseline (which can't be checked, so it fails too, rather than passing unnoticed).
+    '''
+    regressions = []
+    for key, result in results.items():
+        if key not in baseline:
+            regressions.append(f'{key}: not in the baseline (run it with --save-baseline to add it)')
+            continue
+        for metric, noise in (('wall_seconds', NOISE_SECONDS), ('peak_rss_kb', NOISE_RSS_KB)):
+            limit = max(baseline[key][metric] * (1 + tolerance), baseline[key][metric] + noise)
+            if result[metric] > limit:
+                regressions.append(f'{key}: {metric} {result[metric]:.4g} > {limit:.4g} (baseline {baseline[key][metric]:.4g} + {tolerance:.0%})')
+    return regressions
+
+def load_baseline(file_path:str) -> dict[str, dict]|None:
+    '''
+    Parameters:
+        file_path : str
+            The path to the baseline.
+
+    Returns:
+        The baseline results, keyed by `"name@size"`, or `None` if there is no baseline.
+    '''
+    try:
+        file = open(file_path, 'r')
+    except FileNotFoundError:
+        return None
+    try:
+        return json.load(file)['results']
+    finally:
+        file.close()
+
+def save_report(file_path:str, report:dict):
+    file = open(file_path, 'w')
+    try:
+        json.dump(report, file, indent=4)
+    finally:
+        file.close()
+
+def parse_arguments() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description='Benchmark loading, saving and sorting questions and scores, and grading quizzes.')
+    parser.add_argument('--sizes', type=int, nargs='+', default=[1000, 100000, 1000000], help='The numbers of questions and scores to benchmark with.')
+    parser.add_argument('--benchmarks', nargs='+', choices=BENCHMARKS.keys(), default=list(BENCHMARKS.keys()), help='The benchmarks to run.')
+    parser.add_argument('--repeat', type=int, default=3, help='The number of times to time each benchmark (the fastest is kept).')
+    parser.add_argument('--baseline', default=BASELINE_FILE_PATH, help='The baseline to compare against.')
+    parser.add_argument('--tolerance', type=float, default=0.25, help='How much slower or bigger (as a fraction) than the baseline a result can be.')
+    parser.add_argument('--save-baseline', action='store_true', help='Save the results in the baseline (replacing those for the same benchmarks and sizes) instead of comparing against it.')
+    parser.add_argument('--output', help='Also write the results to this JSON file.')
+    return parser.parse_args()
+
+def main() -> int:
+    '''
+    Returns:
+        The exit status: 1 if anything regressed (or isn't in the baseline), 0 otherwise.
+    '''
+    arguments = parse_arguments()
+    results:dict[str, dict] = {}
+    context = multiprocessing.get_context('spawn')
+
+    for size in arguments.sizes:
+        directory = tempfile.mkdtemp(prefix='quiz-benchmark-')
+        try:
+            synthetic.write_question_file(os.path.join(directory, QUESTION_FILE_NAME), size)
+            synthetic.write_score_file(os.path.join(directory, SCORE_FILE_NAME), size)
+            for name in arguments.benchmarks:
+                with ProcessPoolExecutor(1, mp_context=context) as worker:
+                    result = worker.submit(measure, name, directory, size, arguments.repeat).result()
+                results[f'{name}@{size}'] = result
+                print(f'{name:<20} {size:>9}  {result["wall_seconds"]:>10.4f}s  {result["ops_per_second"]:>14,.0f} ops/s  {result["peak_rss_kb"] / 1024:>8.1f} MiB')
+        finally:
+            shutil.rmtree(directory)
+
+    report = {'python' : sys.version.split()[0], 'results' : results}
+    if arguments.output is not None:
+        save_report(arguments.output, report)
+
+    baseline = load_baseline(arguments.baseline)
+    if arguments.save_baseline:
+        # Only the benchmarks and sizes that were run are replaced, so a new benchmark can be added without re-timing (and hiding any regressions in) the others.
+        save_report(arguments.baseline, {**report, 'results' : {**(baseline or {}), **results}})
+        print(f'Saved baseline to "{arguments.baseline}".')
+        return 0
+
+    if baseline is None:
+        print(f'No baseline at "{arguments.baseline}" (run with --save-baseline to make one).')
+        return 0
+
+    regressions = compare(results, baseline, arguments.tolerance)
+    for regression in regressions:
+        print(f'FAILED {regression}', file=sys.stderr)
+    return 1 if len(regressions) > 0 else 0
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,129 @@
+import datetime
+import json
+import random
+
+# Words the synthetic questions and answer options are made from.
+WORDS = ('ancient', 'lizard', 'terrible', 'giant', 'dragon', 'fossil', 'jurassic', 'cretaceous', 'triassic', 'reptile', 'feather', 'claw', 'egg', 'herd', 'swamp', 'volcano', 'meteor', 'tooth', 'tail', 'crest')
+# The answer options shared by the questions of merged question files.
+DISTRACTORS = tuple(f'{first} {second}'.title() for first in WORDS for second in WORDS if first != second)
+
+# When the first synthetic score was achieved. Later scores are a minute apart.
+FIRST_TIME_STAMP = datetime.datetime(2023, 1, 1)
+
+def synthetic_question(generator:random.Random, number:int) -> dict:
+    '''
+    Parameters:
+        generator : random.Random
+            Where the question's words come from.
+        number : int
+            The question's number, so that every question is different.
+
+    Returns:
+        A question in the question file's format, with four answer options (one of which is the answer).
+    '''
+    answer_options = [' '.join(generator.choices(WORDS, k=3)).title() + f' {number}-{o}' for o in range(4)]
+    return {
+        'question' : f'Question {number}: which ' + ' '.join(generator.choices(WORDS, k=8)) + '?'
+        ,'answer' : generator.choice(answer_options)
+        ,'answer_options' : answer_options
+    }
+
+def write_question_file(file_path:str, number_of_questions:int, seed:int = 0):
+    '''
+    Write a synthetic question file.
+
+    The same `seed` always writes the same file.
+
+    Parameters:
+        file_path : str
+            Where to write the file.
+        number_of_questions : int
+            The number of questions to write.
+        seed : int
+            Seed for the questions' words.
+    '''
+    generator = random.Random(seed)
+    file = open(file_path, 'w')
+    try:
+        file.write('[')
+        for number in range(number_of_questions):
+            if number > 0:
+                file.write(',')
+            json.dump(synthetic_question(generator, number), file)
+        file.write(']')
+    finally:
+        file.close()
+
+def write_merged_question_file(file_path:str, number_of_questions:int, seed:int = 0):
+    '''
+    Write a synthetic question file like one merged from several others: every fourth question repeats an earlier one (every other repeat with different case and spacing), and the answer options are all drawn from the same few hundred distractors.
+
+    The same `seed` always writes the same file.
+
+    Parameters:
+        file_path : str
+            Where to write the file.
+        number_of_questions : int
+            The number of questions to write, including repeats.
+        seed : int
+            Seed for the questions' words.
+    '''
+    generator = random.Random(seed)
+    written:list[dict] = []
+    file = open(file_path, 'w')
+    try:
+        file.write('[')
+        for number in range(number_of_questions):
+            if number % 4 == 3:
+                question = dict(generator.choice(written))
+                if number % 8 == 7:
+                    question['question'] = question['question'].upper().replace(' ', '  ')
+            else:
+                answer_options = generator.sample(DISTRACTORS, 4)
+                question = {
+                    'question' : f'Question {number}: which ' + ' '.join(generator.choices(WORDS, k=8)) + '?'
+                    ,'answer' : generator.choice(answer_options)
+                    ,'answer_options' : answer_options
+                }
+                written.append(question)
+            if number > 0:
+                file.write(',')
+            json.dump(question, file)
+        file.write(']')
+    finally:
+        file.close()
+
+def synthetic_scores(number_of_scores:int, number_of_users:int = 100, seed:int = 0) -> dict[str, dict[str, int]]:
+    '''
+    Parameters:
+        number_of_scores : int
+            The total number of scores.
+        number_of_users : int
+            The number of users the scores are shared between (round robin).
+        seed : int
+            Seed for the scores.
+
+    Returns:
+        A score history in the score file's format. Every score has a different timestamp.
+    '''
+    generator = random.Random(seed)
+    scores:dict[str, dict[str, int]] = {}
+    for number in range(number_of_scores):
+        time_stamp = (FIRST_TIME_STAMP + datetime.timedelta(minutes=number)).strftime('%Y-%m-%d %H:%M:%S')
+        scores.setdefault(f'player{number % number_of_users}', {})[time_stamp] = generator.randint(0, 100)
+    return scores
+
+def write_score_file(file_path:str, number_of_scores:int, number_of_users:int = 100, seed:int = 0):
+    '''
+    Write a synthetic score file (see `synthetic_scores`).
+
+    Parameters:
+        file_path : str
+            Where to write the file.
+        (See `synthetic_scores` for the rest.)
+    '''
+    file = open(file_path, 'w')
+    try:
+        json.dump(synthetic_scores(number_of_scores, number_of_users, seed), file)
+    finally:
+        file.close()
@@ -0,0 +1,129 @@
+import hashlib
+import marshal
+import os
+
+# Bump whenever the contents of a bundle change, so that old bundles are rebuilt.
+BUNDLE_VERSION = 1
+
+def fingerprint(file_path:str) -> tuple[int, int]:
+    '''
+    Parameters:
+        file_path : str
+            The path to the file.
+
+    Raises:
+        FileNotFoundError
+            If the file does not exist.
+
+    Returns:
+        The file's modification time (in nanoseconds) and size.
+    '''
+    stat = os.stat(file_path)
+    return stat.st_mtime_ns, stat.st_size
+
+def hash_contents(contents:bytes) -> bytes:
+    '''
+    Parameters:
+        contents : bytes
+            The contents of a file.
+
+    Returns:
+        The SHA-256 digest of `contents`.
+    '''
+    return hashlib.sha256(contents).digest()
+
+def check_source(file_path:str, source:tuple[int, int, bytes]) -> tuple[int, int, bytes]|None:
+    '''
+    Check whether a source file is unchanged since it was bundled.
+
+    The file is only read (to compare hashes) if its modification time or size have changed.
+
+    Parameters:
+        file_path : str
+            The path to the source file.
+        source : tuple[int, int, bytes]
+            The modification time, size and SHA-256 digest the file had when it was bundled.
+
+    Returns:
+        The file's current modification time, size and digest if it is unchanged (which differ from `source` if it was touched without being changed), or `None` if it has changed.
+    '''
+    mtime_ns, size, digest = source
+    try:
+        current = fingerprint(file_path)
+        if current == (mtime_ns, size):
+            return source
+        file = open(file_path, 'rb')
+    except FileNotFoundError:
+        return None
+    try:
+        if hash_contents(file.read()) != digest:
+            return None
+    finally:
+        file.close()
+    return (*current, digest)
+
+def load_bundle(bundle_path:str) -> dict|None:
+    '''
+    Load a startup bundle, if it is up to date.
+
+    If any of its source files were touched without being changed, the bundle is saved again with their new modification times, so that they aren't hashed again on every start.
+
+    Parameters:
+        bundle_path : str
+            The path to the bundle.
+
+    Returns:
+        The bundled values (see `save_bundle`), or `None` if the bundle is missing, unreadable, or any of its source files have changed.
+    '''
+    try:
+        file = open(bundle_path, 'rb')
+    except FileNotFoundError:
+        return None
+    try:
+        bundle = marshal.load(file)
+    except (EOFError, ValueError, TypeError):
+        return None
+    finally:
+        file.close()
+
+    if not isinstance(bundle, dict) or bundle.get('version') != BUNDLE_VERSION:
+        return None
+    sources = bundle['sources']
+    touched = False
+    for file_path, source in sources.items():
+        current = check_source(file_path, source)
+        if current is None:
+            return None
+        if current != source:
+            sources[file_path] = current
+            touched = True
+    if touched:
+        save_bundle(bundle_path, sources, {key : value for key, value in bundle.items() if key not in ('version', 'sources')})
+    return bundle
+
+def save_bundle(bundle_path:str, sources:dict[str, tuple[int, int, bytes]], values:dict):
+    '''
+    Save a startup bundle, so that the next start can skip reading and parsing its source files.
+
+    The bundle is written to a temporary file and moved into place, so a half-written bundle is never loaded. Failing to save it (e.g. on a read-only file system) is not an error: the next start just parses the source files again.
+
+    Parameters:
+        bundle_path : str
+            The path to save the bundle to.
+        sources : dict[str, tuple[int, int, bytes]]
+            The modification time, size and SHA-256 digest of every file the values came from, keyed by path.
+        values : dict
+            The values to bundle (only types supported by `marshal`).
+    '''
+    bundle = {'version' : BUNDLE_VERSION, 'sources' : sources, **values}
+    temporary_path = f'{bundle_path}.{os.getpid()}.tmp'
+    try:
+        file = open(temporary_path, 'wb')
+        try:
+            marshal.dump(bundle, file)
+        finally:
+            file.close()
+        os.replace(temporary_path, bundle_path)
+    except OSError:
+        if os.path.exists(temporary_path):
+            os.remove(temporary_path)
@@ -0,0 +1,188 @@
+import json
+import os
+from typing import Sequence
+
+import file_handling as files
+from engine import QuizEngine
+from question import Question, question_key
+from profiling import profiler
+
+# Bump whenever the checkpoint format changes, so that old checkpoints aren't resumed.
+CHECKPOINT_VERSION = 1
+
+class CheckpointState:
+    '''
+    A quiz as it was when its checkpoint was last written.
+
+    Attributes:
+        __name : str
+            The user's name.
+        __engine : QuizEngine
+            An engine with the quiz's rules.
+        __questions : list[Question]
+            Every question in the quiz, in the order they are asked.
+        __answered : list[tuple[list[int], int, int, bool, list[str]]]
+            Every question answered so far, in order: the order its answer options were displayed in, the attempts used, the points earned, whether it was answered correctly, and the text of every answer given.
+    '''
+
+    def __init__(self, name:str, engine:QuizEngine, questions:list[Question], answered:list[tuple[list[int], int, int, bool, list[str]]]):
+        self.__name = name
+        self.__engine = engine
+        self.__questions = questions
+        self.__answered = answered
+
+    @property
+    def get_name(self) -> str:
+        return self.__name
+    @property
+    def get_engine(self) -> QuizEngine:
+        return self.__engine
+    @property
+    def get_questions(self) -> list[Question]:
+        return self.__questions
+    @property
+    def get_answered(self) -> list[tuple[list[int], int, int, bool, list[str]]]:
+        return self.__answered
+
+class Checkpoint:
+    '''
+    The checkpoint of the quiz being played, so that it can be resumed (with `--resume`) if the program is interrupted.
+
+    The checkpoint starts with a header describing the whole quiz, written once when the quiz starts. Each answered question then adds one short line, with a single `O_APPEND` write to a file that is kept open, so checkpointing an answer costs one small write. The file isn't flushed to disk after each answer: it survives the program being interrupted or crashing, just not the computer crashing.
+
+    Attributes:
+        __file_path : str
+            The path to the checkpoint file.
+        __file : int | None
+            The open checkpoint file (a file descriptor), or `None` if no quiz has been started.
+    '''
+
+    def __init__(self, file_path:str):
+        self.__file_path = file_path
+        self.__file:int|None = None
+
+    @property
+    def get_file_path(self) -> str:
+        return self.__file_path
+
+    def start(self, name:str, engine:QuizEngine, questions:Sequence[Question]):
+        '''
+        Start checkpointing a new quiz, replacing any earlier checkpoint.
+
+        Parameters:
+            name : str
+                The user's name.
+            engine : QuizEngine
+                The engine the quiz is graded by (for its rules).
+            questions : Sequence[Question]
+                Every question in the quiz, in the order they will be asked.
+        '''
+        header = {
+            'version' : CHECKPOINT_VERSION
+            ,'name' : name
+            ,'multiple_choice' : engine.get_multiple_choice
+            ,'select_using_index' : engine.get_select_using_index
+            ,'max_number_of_attempts' : engine.get_max_number_of_attempts
+            ,'max_typo_distance' : engine.get_max_typo_distance
+            ,'questions' : [[question.get_question, question.get_answer, question.get_answer_options, question.get_aliases] for question in questions]
+        }
+        temporary_path = files.write_temporary_file(self.__file_path, (json.dumps(header, separators=(',', ':')) + '\n').encode('utf-8'))
+        os.replace(temporary_path, self.__file_path)
+        self.resume()
+
+    def resume(self):
+        '''
+        Carry on checkpointing the quiz already in the checkpoint file.
+        '''
+        self.close()
+        self.__file = os.open(self.__file_path, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+
+    def record(self, number:int, question:Question, option_order:list[int], attempts_used:int, points:int, correct:bool, answers:list[str]):
+        '''
+        Record an answered question.
+
+        Parameters:
+            number : int
+                The (0-based) number of the question in the quiz.
+            question : Question
+                The question.
+            option_order : list[int]
+                The order its answer options were displayed in, as indices into `Question.get_answer_options`.
+            attempts_used : int
+                The number of answers given.
+            points : int
+                The points earned.
+            correct : bool
+                Whether it was answered correctly.
+            answers : list[str]
+                The text of every answer given.
+        '''
+        if self.__file is None:
+            return
+        # The question's key is only there to check the record belongs to the question at `number` when resuming.
+        record = (json.dumps([number, question_key(question.get_question), option_order, attempts_used, points, correct, answers], separators=(',', ':')) + '\n').encode('utf-8')
+        os.write(self.__file, record)
+        profiler.count('bytes_written', len(record))
+
+    def close(self):
+        '''
+        Stop checkpointing, keeping the checkpoint file.
+        '''
+        if self.__file is not None:
+            os.close(self.__file)
+            self.__file = None
+
+    def discard(self):
+        '''
+        Stop checkpointing and delete the checkpoint file, once the quiz is over.
+        '''
+        self.close()
+        if os.path.exists(self.__file_path):
+            os.remove(self.__file_path)
+
+@profiler.timed('checkpoint.load')
+def load_checkpoint(file_path:str) -> CheckpointState|None:
+    '''
+    Load a quiz's checkpoint.
+
+    Only the header and one line per answered question are read. A final line without a trailing newline was cut short mid-write, and is ignored.
+
+    Parameters:
+        file_path : str
+            The path to the checkpoint file.
+
+    Raises:
+        ValueError
+            If the checkpoint file is formatted incorrectly.
+
+    Returns:
+        The checkpointed quiz, or `None` if there is no checkpoint.
+    '''
+    try:
+        file = open(file_path, 'r', encoding='utf-8')
+    except FileNotFoundError:
+        return None
+    try:
+        lines = file.read().split('\n')[:-1]
+    finally:
+        file.close()
+    if len(lines) == 0:
+        return None
+
+    try:
+        header = json.loads(lines[0])
+        if header['version'] != CHECKPOINT_VERSION:
+            raise ValueError
+        engine = QuizEngine(header['multiple_choice'], header['select_using_index'], header['max_number_of_attempts'], header['max_typo_distance'])
+        questions = [Question(*question) for question in header['questions']]
+
+        answered = []
+        for number, line in enumerate(lines[1:]):
+            recorded_number, key, option_order, attempts_used, points, correct, answers = json.loads(line)
+            if recorded_number != number or number >= len(questions) or key != question_key(questions[number].get_question):
+                raise ValueError
+            answered.append((option_order, attempts_used, points, correct, answers))
+    except (KeyError, TypeError, AttributeError):
+        raise ValueError
+
+    return CheckpointState(header['name'], engine, questions, answered)
@@ -0,0 +1,490 @@
+import hashlib
+import mmap
+import os
+import random
+import struct
+import sys
+import tempfile
+from array import array
+
+from error_handling import *
+from duplicates import DuplicateFinder
+from question import Question, QuestionPool, question_key
+import file_handling as files
+import schema
+from profiling import profiler
+
+# File layout (all integers little-endian):
+#
+#   Header        MAGIC, version, record count, offset table position, string count, string table position,
+#                 source mtime (ns), source size, source SHA-256
+#   Records       One per question: u32 record length, then u16 answer option count, u16 alias count, the
+#                 u32-length-prefixed UTF-8 question, and the u32 string ids of the answer, answer options... and aliases...
+#   Offset table  One u64 per record: the position of that record in the file
+#   Key table     One u64 per record: the key of that record's question (see `question.question_key`)
+#   String table  One u64 per string, plus one: the position of each string (and of the end of the last) in the file,
+#                 followed by every distinct answer, answer option and alias in UTF-8, in id order
+MAGIC = b'QBNK'
+VERSION = 4
+HEADER = struct.Struct('<4sHHQQQQqQ32s')
+# The source mtime, and where it is in the header, so that it can be updated without recompiling.
+SOURCE_MTIME = struct.Struct('<q')
+SOURCE_MTIME_POSITION = struct.calcsize('<4sHHQQQQ')
+RECORD_LENGTH = struct.Struct('<I')
+FIELD_COUNTS = struct.Struct('<HH')
+FIELD_LENGTH = struct.Struct('<I')
+STRING_ID = struct.Struct('<I')
+OFFSET = struct.Struct('<Q')
+STRING_BOUNDS = struct.Struct('<QQ')
+# The most answer options (or aliases) a question can have: their counts are stored in 16 bits.
+MAX_FIELD_COUNT = (1 << 16) - 1
+
+class CompiledBankError(Exception):
+    '''
+    An exception to be raised when a compiled question bank is missing, out of date, or not in the expected format.
+    '''
+    def __init__(self, *args: object) -> None:
+        super().__init__(*args)
+
+class CompileFailedError(OSError):
+    '''
+    An exception to be raised when a compiled question bank can't be written (as opposed to its question file not being readable).
+
+    Arguments:
+
+    1. The path to the compiled bank
+    2. Why it couldn't be written
+    '''
+    def __init__(self, *args: object) -> None:
+        super().__init__(*args)
+
+def hash_file(file_path:str, chunk_size:int = 1 << 20) -> bytes:
+    '''
+    Calculate the SHA-256 digest of a file without reading it into memory all at once.
+
+    Parameters:
+        file_path : str
+            The path to the file to hash.
+        chunk_size : int
+            The number of bytes to read at a time.
+
+    Returns:
+        The 32-byte digest.
+    '''
+    digest = hashlib.sha256()
+    file = open(file_path, 'rb')
+    try:
+        while chunk := file.read(chunk_size):
+            digest.update(chunk)
+    finally:
+        file.close()
+    return digest.digest()
+
+def check_field_counts(question:dict, index:int) -> list[str]:
+    '''
+    Check that a question's answer options and aliases fit in a compiled record.
+
+    Parameters:
+        question : dict
+            The question as parsed from the question file. It should already have been checked against `schema.QUESTION_SCHEMA`.
+        index : int
+            The question's index in the question file.
+
+    Returns:
+        Every problem with the question (as `schema.Schema.check_element` would describe them). Empty if it fits.
+    '''
+    where = f'{schema.QUESTION_SCHEMA.get_name} {index + 1}'
+    problems:list[str] = []
+    for name in ('answer_options', 'aliases'):
+        items = question.get(name) or []
+        if len(items) > MAX_FIELD_COUNT:
+            problems.append(ErrorMessages.TOO_MANY_ITEMS.format(where, name, len(items), MAX_FIELD_COUNT))
+    return problems
+
+def encode_question(question:dict, string_ids:dict[str, int]) -> bytes:
+    '''
+    Encode a question from the question file as a length-prefixed record.
+
+    Parameters:
+        question : dict
+            The question as parsed from the question file. It should already have been checked against `schema.QUESTION_SCHEMA`.
+        string_ids : dict[str, int]
+            The id of every string in the string table so far, keyed by the string. The question's answer, answer options and aliases are added to it if they aren't already there.
+
+    Raises:
+        ValueError
+            If the question does not have the expected fields.
+
+    Returns:
+        The encoded record, including its length prefix.
+    '''
+    try:
+        encoded_question = question['question'].encode('utf-8')
+        answer_options = question['answer_options']
+        aliases = question.get('aliases') or []
+        strings = [question['answer'], *answer_options, *aliases]
+    except (KeyError, TypeError, AttributeError):
+        raise ValueError
+
+    body = [FIELD_COUNTS.pack(len(answer_options), len(aliases)), FIELD_LENGTH.pack(len(encoded_question)), encoded_question]
+    for string in strings:
+        body.append(STRING_ID.pack(string_ids.setdefault(string, len(string_ids))))
+    body = b''.join(body)
+
+    return RECORD_LENGTH.pack(len(body)) + body
+
+def decode_question(buffer, position:int, string_table_position:int, pool:QuestionPool|None = None) -> Question:
+    '''
+    Decode the record at `position` in `buffer` into a `Question`.
+
+    Parameters:
+        buffer
+            The compiled bank (any object supporting the buffer protocol).
+        position : int
+            The position of the record's length prefix.
+        string_table_position : int
+            The position of the string table in the compiled bank.
+        pool : QuestionPool | None
+            The pool to share the question's parts with the rest of its bank through.
+
+    Returns:
+        The decoded question.
+    '''
+    start = position
+    position += RECORD_LENGTH.size
+    option_count, alias_count = FIELD_COUNTS.unpack_from(buffer, position)
+    position += FIELD_COUNTS.size
+    (length,) = FIELD_LENGTH.unpack_from(buffer, position)
+    position += FIELD_LENGTH.size
+    question = str(buffer[position:position + length], 'utf-8')
+    position += length
+
+    strings:list[str] = []
+    for (string_id,) in STRING_ID.iter_unpack(buffer[position:position + (1 + option_count + alias_count) * STRING_ID.size]):
+        string_start, string_end = STRING_BOUNDS.unpack_from(buffer, string_table_position + string_id * OFFSET.size)
+        strings.append(str(buffer[string_start:string_end], 'utf-8'))
+    position += len(strings) * STRING_ID.size
+
+    profiler.count('bytes_read', position - start)
+    profiler.count('questions_created')
+    return Question(question, strings[0], strings[1:1 + option_count], strings[1 + option_count:], pool)
+
+@profiler.timed('questions.compile')
+def compile_bank(source_path:str, compiled_path:str, duplicates:DuplicateFinder|None = None) -> int:
+    '''
+    Compile a question file into the binary bank format.
+
+    The question file is streamed, so compiling needs no more memory than the offset and key tables, the string table and what it takes to find duplicates. Every question is checked against `schema.QUESTION_SCHEMA` on the way, and the compiled bank is only rebuilt when the question file changes, so an unchanged question file isn't checked again. The compiled bank is written to a temporary file of its own (so processes compiling at the same time don't write over each other's) and then moved into place, so a half-written bank is never left at `compiled_path`.
+
+    Exact duplicates of earlier questions (see `duplicates.DuplicateFinder`) are left out, and each distinct answer, answer option and alias is only stored once, in the string table, so a bank merged from several question files compiles to a fraction of its size.
+
+    Parameters:
+        source_path : str
+            The path to the question file (JSON).
+        compiled_path : str
+            The path to write the compiled bank to.
+        duplicates : DuplicateFinder | None
+            Finds the duplicate questions to leave out, and records them. `None` to only look for exact duplicates, without recording them anywhere.
+
+    Raises:
+        FileNotFoundError
+            If the question file does not exist.
+        SchemaError
+            If any questions don't match `schema.QUESTION_SCHEMA`, or have too many answer options or aliases to compile (with every problem found).
+        ValueError
+            If the question file is corrupted.
+        CompileFailedError
+            If the compiled bank couldn't be written.
+
+    Returns:
+        The number of questions compiled.
+    '''
+    source_stat = os.stat(source_path)
+    source_hash = hash_file(source_path)
+    if duplicates is None:
+        duplicates = DuplicateFinder(find_near_duplicates=False)
+
+    offsets = array('Q')
+    keys = array('Q')
+    string_ids:dict[str, int] = {}
+    problems:list[str] = []
+    directory, name = os.path.split(os.path.abspath(compiled_path))
+    try:
+        descriptor, temporary_path = tempfile.mkstemp(prefix=name + '.', suffix='.tmp', dir=directory)
+    except OSError as error:
+        raise CompileFailedError(compiled_path, error.strerror) from error
+    file = os.fdopen(descriptor, 'wb')
+    try:
+        file.write(b'\0' * HEADER.size)
+        position = HEADER.size
+        for index, question in enumerate(files.iter_json_array(source_path)):
+            # Keep looking for problems, but stop compiling once there are any.
+            question_problems = schema.QUESTION_SCHEMA.check_element(question, index)
+            problems.extend(question_problems if len(question_problems) > 0 else check_field_counts(question, index))
+            if len(problems) > 0 or duplicates.add(index, question):
+                continue
+            record = encode_question(question, string_ids)
+            offsets.append(position)
+            keys.append(question_key(question['question']))
+            file.write(record)
+            position += len(record)
+        if len(problems) > 0:
+            raise schema.SchemaError(*problems)
+
+        table_position = position
+        for table in (offsets, keys):
+            if table.itemsize != OFFSET.size or sys.byteorder != 'little':
+                for value in table:
+                    file.write(OFFSET.pack(value))
+            else:
+                table.tofile(file)
+
+        string_table_position = table_position + 2 * len(offsets) * OFFSET.size
+        encoded_strings = [string.encode('utf-8') for string in string_ids]
+        string_position = string_table_position + (len(encoded_strings) + 1) * OFFSET.size
+        for encoded_string in encoded_strings:
+            file.write(OFFSET.pack(string_position))
+            string_position += len(encoded_string)
+        file.write(OFFSET.pack(string_position))
+        file.write(b''.join(encoded_strings))
+
+        file.seek(0)
+        file.write(HEADER.pack(MAGIC, VERSION, 0, len(offsets), table_position, len(encoded_strings), string_table_position, source_stat.st_mtime_ns, source_stat.st_size, source_hash))
+        file.flush()
+        os.fsync(file.fileno())
+        file.close()
+        os.replace(temporary_path, compiled_path)
+    except BaseException as error:
+        file.close()
+        if os.path.exists(temporary_path):
+            os.remove(temporary_path)
+        # Errors reading the question file are its own; any other I/O error is in writing the compiled bank.
+        if isinstance(error, OSError) and error.filename != source_path:
+            raise CompileFailedError(compiled_path, error.strerror or str(error)) from error
+        raise
+
+    profiler.count('duplicate_questions', len(duplicates.get_exact_duplicates))
+    return len(offsets)
+
+class CompiledBank:
+    '''
+    A read-only, memory-mapped view of a compiled question bank.
+
+    Questions are only decoded when they are accessed, so drawing a few questions from a large bank only reads those few records. The questions decoded share their answers, answer options and accepted answers through the bank's `QuestionPool`.
+
+    Attributes:
+        __file
+            The open compiled bank file.
+        __buffer : mmap.mmap
+            The memory-mapped contents of the file.
+        __count : int
+            The number of questions in the bank.
+        __table_position : int
+            The position of the offset table in the file.
+        __string_count : int
+            The number of strings in the string table.
+        __string_table_position : int
+            The position of the string table in the file.
+        __pool : QuestionPool
+            Shares the decoded questions' parts.
+        __source_mtime_ns : int
+            The modification time of the question file the bank was compiled from.
+        __source_size : int
+            The size of the question file the bank was compiled from.
+        __source_hash : bytes
+            The SHA-256 digest of the question file the bank was compiled from.
+    '''
+
+    def __init__(self, compiled_path:str):
+        try:
+            self.__file = open(compiled_path, 'rb')
+        except FileNotFoundError:
+            raise CompiledBankError(compiled_path)
+
+        try:
+            self.__buffer = mmap.mmap(self.__file.fileno(), 0, access=mmap.ACCESS_READ)
+            magic, version, _, self.__count, self.__table_position, self.__string_count, self.__string_table_position, self.__source_mtime_ns, self.__source_size, self.__source_hash = HEADER.unpack_from(self.__buffer, 0)
+            if magic != MAGIC or version != VERSION or self.__table_position + 2 * self.__count * OFFSET.size > len(self.__buffer) or self.__string_table_position + (self.__string_count + 1) * OFFSET.size > len(self.__buffer):
+                raise CompiledBankError(compiled_path)
+        except (ValueError, struct.error):
+            # An empty file can't be mapped, and a truncated one has no complete header.
+            self.close()
+            raise CompiledBankError(compiled_path)
+        except CompiledBankError:
+            self.close()
+            raise
+        self.__pool = QuestionPool()
+
+    def __len__(self) -> int:
+        return self.__count
+
+    def __getitem__(self, index:int) -> Question:
+        if index < 0:
+            index += self.__count
+        if index not in range(self.__count):
+            raise IndexError(index)
+        (position,) = OFFSET.unpack_from(self.__buffer, self.__table_position + index * OFFSET.size)
+        return decode_question(self.__buffer, position, self.__string_table_position, self.__pool)
+
+    @property
+    def get_keys(self) -> array:
+        '''
+        The key of every question in the bank (see `question.question_key`), in order (`array('Q')`), copied straight from the key table without decoding any questions.
+        '''
+        start = self.__table_position + self.__count * OFFSET.size
+        keys = array('Q')
+        keys.frombytes(self.__buffer[start:start + self.__count * OFFSET.size])
+        if sys.byteorder != 'little':
+            keys.byteswap()
+        return keys
+
+    def close(self):
+        '''
+        Unmap and close the compiled bank file.
+        '''
+        if hasattr(self, '_CompiledBank__buffer'):
+            self.__buffer.close()
+        self.__file.close()
+
+    def is_up_to_date(self, source_path:str) -> bool:
+        '''
+        Check whether the bank was compiled from the current contents of the question file.
+
+        The question file is only hashed if its modification time or size have changed. If it was only touched (its modification time changed, but not its contents), the bank's record of its modification time is updated, so that it isn't hashed again next time.
+
+        Parameters:
+            source_path : str
+                The path to the question file.
+
+        Returns:
+            `True` if the question file is unchanged since the bank was compiled.
+            `False` otherwise.
+        '''
+        source_stat = os.stat(source_path)
+        if source_stat.st_size != self.__source_size:
+            return False
+        if source_stat.st_mtime_ns == self.__source_mtime_ns:
+            return True
+        if hash_file(source_path) != self.__source_hash:
+            return False
+        try:
+            # Only the modification time is rewritten, so anything else reading the bank is unaffected.
+            file = open(self.__file.name, 'r+b')
+            try:
+                file.seek(SOURCE_MTIME_POSITION)
+                file.write(SOURCE_MTIME.pack(source_stat.st_mtime_ns))
+            finally:
+                file.close()
+            self.__source_mtime_ns = source_stat.st_mtime_ns
+        except OSError:
+            # The bank is read-only: it is still up to date, just slower to check.
+            pass
+        return True
+
+    def select(self, indices:list[int]) -> 'QuestionSelection':
+        '''
+        Parameters:
+            indices : list[int]
+                The indices of the questions to select, in the order they should be asked.
+
+        Returns:
+            A lazy sequence of the selected questions.
+        '''
+        return QuestionSelection(self, indices)
+
+    def sample(self, number_of_questions:int, seed:int|None = None) -> 'QuestionSelection':
+        '''
+        Draw a random selection of questions.
+
+        Parameters:
+            number_of_questions : int
+                The maximum number of questions to draw.
+            seed : int | None
+                Seed for the random draw, so that it can be reproduced. `None` for a different draw every time.
+
+        Returns:
+            A lazy sequence of the drawn questions, in random order.
+        '''
+        generator = random.Random(seed)
+        return self.select(generator.sample(range(self.__count), min(number_of_questions, self.__count)))
+
+class QuestionSelection:
+    '''
+    A lazy sequence of questions from a `CompiledBank`: each question is decoded when the quiz reaches it.
+
+    Attributes:
+        __bank : CompiledBank
+            The bank the questions are in.
+        __indices : list[int]
+            The indices of the selected questions in the bank.
+    '''
+
+    def __init__(self, bank:CompiledBank, indices:list[int]):
+        self.__bank = bank
+        self.__indices = list(indices)
+
+    def __len__(self) -> int:
+        return len(self.__indices)
+
+    def __getitem__(self, index:int) -> Question:
+        return self.__bank[self.__indices[index]]
+
+    def __iter__(self):
+        for index in self.__indices:
+            yield self.__bank[index]
+
+    def __str__(self) -> str:
+        return str(self.__indices)
+
+    @property
+    def get_indices(self) -> list[int]:
+        return self.__indices
+
+@profiler.timed('questions.open_compiled_bank')
+def open_compiled_bank(source_path:str, compiled_path:str) -> CompiledBank:
+    '''
+    Open a compiled question bank, (re)compiling it first if it is missing, corrupted or out of date.
+
+    Will abend if the question file is:
+
+    - Not found
+    - Empty
+    - Corrupted
+
+    Parameters:
+        source_path : str
+            The path to the question file (JSON).
+        compiled_path : str
+            The path to the compiled bank.
+
+    Returns:
+        The opened bank.
+
+    Calls:
+        compile_bank
+    '''
+    try:
+        bank = CompiledBank(compiled_path)
+        if bank.is_up_to_date(source_path):
+            return bank
+        bank.close()
+    except CompiledBankError:
+        pass
+    except FileNotFoundError:
+        abend(ErrorMessages.FILE_NOT_FOUND.format(os.path.abspath(source_path)))
+
+    try:
+        compile_bank(source_path, compiled_path)
+    except CompileFailedError as error:
+        abend(ErrorMessages.COMPILE_FAILED.format(os.path.abspath(compiled_path), error.args[1]))
+    except FileNotFoundError:
+        abend(ErrorMessages.FILE_NOT_FOUND.format(os.path.abspath(source_path)))
+    except schema.SchemaError as error:
+        abend(schema.describe_problems(source_path, list(error.args)))
+    except ValueError:
+        abend(ErrorMessages.FILE_CORRUPTED.format(os.path.abspath(source_path)))
+
+    bank = CompiledBank(compiled_path)
+    if len(bank) == 0:
+        abend(ErrorMessages.FILE_INCOMPLETE.format(os.path.abspath(source_path)))
+    return bank
@@ -12,16 +12,48 @@ class Config(object):
         __select_using_index : bool
             Whether the user should be able to select the correct answer by its index or have to type it in (only applies if `__multpile_choice` is true).
         __question_file_path : str
-            The path to the file containing all the questions.
+            The path to the file containing all the questions, or to a sharded question bank (a directory of question files, see `question_shards`).
         __score_file_path : str
             The path to the file containing all past scores.
         __display_text_file_path : str
             The path to the file containing display text.
         __prompt_file_path : str
             The path to the file containing prompt text.
+        __question_seed : int | None
+            The seed used to draw questions from the question file, so that a draw can be reproduced. `None` for a different draw every time.
+        __compiled_question_file_path : str | None
+            The path to the compiled (binary) copy of the question file. `None` to read the question file directly.
+        __score_journal_compaction_size : int
+            The size (in bytes) the score journal can grow to before it is folded into the score file.
+        __score_backend : str
+            Where scores are saved: `"json"` for the score file, `"sqlite"` for the score database, or `"columnar"` for the score history file.
+        __score_database_path : str
+            The path to the score database (only used if `__score_backend` is `"sqlite"`).
+        __score_table_size : int
+            The number of scores to display at a time.
+        __session_log_path : str | None
+            The path to the log of every finished quiz (so that they can be re-graded). `None` to not log quizzes.
+        __max_typo_distance : int
+            The number of typos (single-character insertions, deletions or substitutions) to allow in typed answers.
+        __profile_report_path : str | None
+            Where to write a profiling report (timings and counters) when the program ends. `None` to only profile when asked to on the command line.
+        __score_history_path : str
+            The path to the columnar score history file (only used if `__score_backend` is `"columnar"`).
+        __question_stats_path : str | None
+            The path to the file of statistics about how each question has gone. `None` to not keep statistics.
+        __target_difficulty : float | None
+            The difficulty (from 0, always answered correctly first time, to 1, never) to draw questions around, using the question statistics. `None` to draw questions uniformly at random.
+        __checkpoint_path : str | None
+            The path to the checkpoint of the quiz being played, so that it can be resumed with `--resume` if the program is interrupted. `None` to not checkpoint quizzes.
+        __category_quotas : dict[str, int] | None
+            The number of questions to draw from each category, in place of `__number_of_questions` (only used if `__question_file_path` is a sharded question bank). `None` to draw from every category.
+        __reload_interval : float | None
+            How often (in seconds, at least 0.1) the server checks the question file and the display text and prompt files for changes, and reloads any that have changed. `None` to never reload them.
+        __question_load_workers : int | None
+            The number of worker processes to parse a large question file with (see `parallel_parsing`). 1 to parse it in this process, `None` for one per CPU. Small question files are always parsed in this process.
     '''
 
-    def __init__(self, number_of_questions:int, number_of_attempts:int, multiple_choice:bool, select_using_index:bool, question_file_path:str, score_file_path:str, display_text_file_path:str, prompt_file_path:str):
+    def __init__(self, number_of_questions:int, number_of_attempts:int, multiple_choice:bool, select_using_index:bool, question_file_path:str, score_file_path:str, display_text_file_path:str, prompt_file_path:str, question_seed:int|None = None, compiled_question_file_path:str|None = None, score_journal_compaction_size:int = 65536, score_backend:str = 'json', score_database_path:str = 'data/scores.db', score_table_size:int = 10, session_log_path:str|None = None, max_typo_distance:int = 0, profile_report_path:str|None = None, score_history_path:str = 'data/scores.history', question_stats_path:str|None = None, target_difficulty:float|None = None, checkpoint_path:str|None = None, category_quotas:dict[str, int]|None = None, reload_interval:float|None = None, question_load_workers:int|None = 1):
         # Ensure numbers of attempts and questions are positive.
         self.__number_of_questions = max(1, number_of_questions)
         self.__number_of_attempts = max(1, number_of_attempts)
@@ -31,6 +63,24 @@ class Config(object):
         self.__score_file_path = score_file_path
         self.__display_text_file_path = display_text_file_path
         self.__prompt_file_path = prompt_file_path
+        self.__question_seed = question_seed
+        self.__compiled_question_file_path = compiled_question_file_path
+        self.__score_journal_compaction_size = score_journal_compaction_size
+        self.__score_backend = score_backend
+        self.__score_database_path = score_database_path
+        self.__score_table_size = max(1, score_table_size)
+        self.__session_log_path = session_log_path
+        self.__max_typo_distance = max(0, max_typo_distance)
+        self.__profile_report_path = profile_report_path
+        self.__score_history_path = score_history_path
+        self.__question_stats_path = question_stats_path
+        # Ensure the target difficulty is between 0 and 1.
+        self.__target_difficulty = None if target_difficulty is None else min(1.0, max(0.0, float(target_difficulty)))
+        self.__checkpoint_path = checkpoint_path
+        self.__category_quotas = category_quotas
+        # Ensure the server doesn't check for changes in a busy loop.
+        self.__reload_interval = None if reload_interval is None else max(0.1, float(reload_interval))
+        self.__question_load_workers = question_load_workers
 
     def __str__(self) -> str:
         return f'''number_of_questions: {self.__number_of_questions}
@@ -40,7 +90,23 @@ select_using_index: {self.__select_using_index}
 question_file_path: {self.__question_file_path}
 score_file_path: {self.__score_file_path}
 display_text_file_path: {self.__display_text_file_path}
-prompt_file_path: {self.__prompt_file_path}'''
+prompt_file_path: {self.__prompt_file_path}
+question_seed: {self.__question_seed}
+compiled_question_file_path: {self.__compiled_question_file_path}
+score_journal_compaction_size: {self.__score_journal_compaction_size}
+score_backend: {self.__score_backend}
+score_database_path: {self.__score_database_path}
+score_table_size: {self.__score_table_size}
+session_log_path: {self.__session_log_path}
+max_typo_distance: {self.__max_typo_distance}
+profile_report_path: {self.__profile_report_path}
+score_history_path: {self.__score_history_path}
+question_stats_path: {self.__question_stats_path}
+target_difficulty: {self.__target_difficulty}
+checkpoint_path: {self.__checkpoint_path}
+category_quotas: {self.__category_quotas}
+reload_interval: {self.__reload_interval}
+question_load_workers: {self.__question_load_workers}'''
 
     @property
     def get_number_of_questions(self):
@@ -66,6 +132,54 @@ prompt_file_path: {self.__prompt_file_path}'''
     @property
     def get_prompt_file_path(self):
         return self.__prompt_file_path
+    @property
+    def get_question_seed(self):
+        return self.__question_seed
+    @property
+    def get_compiled_question_file_path(self):
+        return self.__compiled_question_file_path
+    @property
+    def get_score_journal_compaction_size(self):
+        return self.__score_journal_compaction_size
+    @property
+    def get_score_backend(self):
+        return self.__score_backend
+    @property
+    def get_score_database_path(self):
+        return self.__score_database_path
+    @property
+    def get_score_table_size(self):
+        return self.__score_table_size
+    @property
+    def get_session_log_path(self):
+        return self.__session_log_path
+    @property
+    def get_max_typo_distance(self):
+        return self.__max_typo_distance
+    @property
+    def get_profile_report_path(self):
+        return self.__profile_report_path
+    @property
+    def get_score_history_path(self):
+        return self.__score_history_path
+    @property
+    def get_question_stats_path(self):
+        return self.__question_stats_path
+    @property
+    def get_target_difficulty(self):
+        return self.__target_difficulty
+    @property
+    def get_checkpoint_path(self):
+        return self.__checkpoint_path
+    @property
+    def get_category_quotas(self):
+        return self.__category_quotas
+    @property
+    def get_reload_interval(self):
+        return self.__reload_interval
+    @property
+    def get_question_load_workers(self):
+        return self.__question_load_workers
     
     @get_number_of_questions.setter
     def set_number_of_questions(self, value):
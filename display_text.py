@@ -1,4 +1,6 @@
-class DisplayText:
+from text_table import TextTable
+
+class DisplayText(metaclass=TextTable):
     '''
     A class containing all non-prompt display text.
 
@@ -77,7 +79,7 @@ class DisplayText:
 
             Arguments:
 
-            1. Timestamp (formatted, max length 16)
+            1. Timestamp (`datetime`)
             2. Score (integer, max 3 digits)
         SCORE_SAVED : str
             Inform the user that their score has been saved.
@@ -89,6 +91,41 @@ class DisplayText:
             1. The character in question.
         COULD_NOT_SAVE_SCORE : str
             Error message for when the user's score could not be saved to the score file.
+        LEADERBOARD_HEADER : str
+            The header row for the table of best scores from all users.
+        LEADERBOARD_ROW : str
+            A row for the table of best scores from all users.
+
+            Arguments:
+
+            1. Name
+            2. Timestamp (`datetime`)
+            3. Score (integer, max 3 digits)
+        USER_STATS : str
+            A summary of the user's saved scores.
+
+            Arguments:
+
+            1. Number of scores
+            2. Mean score
+            3. Best score
+            4. Mean of the most recent scores
+        SCORE_PERCENTILE : str
+            Inform the user how their score compares with every saved score.
+
+            Arguments:
+
+            1. Percentage of saved scores lower than the user's score
+        RESUMING_QUIZ : str
+            Inform the user that an interrupted quiz is being resumed.
+
+            Arguments:
+
+            1. User's name
+            2. Number of questions already answered
+            3. Number of questions
+        NO_QUIZ_TO_RESUME : str
+            Inform the user that there is no interrupted quiz to resume, so a new one is starting.
     '''
 
     WELCOME : str
@@ -107,21 +144,9 @@ class DisplayText:
     SCORE_SAVED : str
     INVALID_CHARACTER : str
     COULD_NOT_SAVE_SCORE : str
-
-    def set_values(self, welcome:str, score_table_header:str, goodbye:str, question:str, indexed_answer_option:str, answer_option:str, correct:str, incorrect:str, current_score:str, results:str, time_stamp:str, no_scores_for_user:str, score_table_row:str, score_saved:str, invalid_character:str, could_not_save_score:str):
-        DisplayText.WELCOME = welcome
-        DisplayText.SCORE_TABLE_HEADER = score_table_header
-        DisplayText.GOODBYE = goodbye
-        DisplayText.QUESTION = question
-        DisplayText.INDEXED_ANSWER_OPTION = indexed_answer_option
-        DisplayText.ANSWER_OPTION = answer_option
-        DisplayText.CORRECT = correct
-        DisplayText.INCORRECT = incorrect
-        DisplayText.CURRENT_SCORE = current_score
-        DisplayText.RESULTS = results
-        DisplayText.TIME_STAMP = time_stamp
-        DisplayText.NO_SCORES_FOR_USER = no_scores_for_user
-        DisplayText.SCORE_TABLE_ROW = score_table_row
-        DisplayText.SCORE_SAVED = score_saved
-        DisplayText.INVALID_CHARACTER = invalid_character
-        DisplayText.COULD_NOT_SAVE_SCORE = could_not_save_score
+    LEADERBOARD_HEADER : str
+    LEADERBOARD_ROW : str
+    USER_STATS : str
+    SCORE_PERCENTILE : str
+    RESUMING_QUIZ : str
+    NO_QUIZ_TO_RESUME : str
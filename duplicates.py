@@ -0,0 +1,164 @@
+import hashlib
+import json
+import re as regex
+import unicodedata
+from array import array
+
+from question import question_key
+
+# Questions at least this similar (the estimated Jaccard similarity of their word pairs) are near duplicates.
+NEAR_DUPLICATE_SIMILARITY = 0.8
+# The number of hash functions in each question's MinHash signature (one 32-bit slice of a 64-byte BLAKE2b digest each), and the number of bands it is split into to find candidate near duplicates. With 4 bands of 4, questions 80% similar are candidates 88% of the time, and questions 30% similar 3% of the time.
+SIGNATURE_SIZE = 16
+BANDS = 4
+ROWS = SIGNATURE_SIZE // BANDS
+
+WORD = regex.compile(r'\w+')
+
+def normalise_question(question:str) -> str:
+    '''
+    Normalise a question's text so that copies of it that only differ in case, Unicode forms or spacing are recognised as the same question.
+
+    Unlike `question.normalise_answer`, punctuation is kept: "2+2" and "2-2" are different questions.
+
+    Parameters:
+        question : str
+            The question's text.
+
+    Returns:
+        The text in NFKC form, case-folded, with every run of whitespace collapsed to a single space.
+    '''
+    return ' '.join(unicodedata.normalize('NFKC', question).casefold().split())
+
+def contents_key(normalised:str, question:dict) -> int:
+    '''
+    Identify a question by everything that is graded, so that only copies that would be asked and graded the same way are exact duplicates.
+
+    Parameters:
+        normalised : str
+            The normalised question (see `normalise_question`).
+        question : dict
+            The question as parsed from the question file.
+
+    Returns:
+        A 64-bit hash of the normalised text, the answer, and the answer options and aliases (in any order).
+    '''
+    return question_key(json.dumps([normalised, question['answer'], sorted(question.get('answer_options') or []), sorted(question.get('aliases') or [])]))
+
+def signature(question:str) -> array:
+    '''
+    Work out a question's MinHash signature: for each hash function, the smallest hash of any pair of consecutive words in the normalised question. The fraction of two questions' signatures that match estimates the Jaccard similarity of their sets of word pairs.
+
+    Every hash function's value for a word pair comes from one BLAKE2b digest, so each word pair is only hashed once.
+
+    Parameters:
+        question : str
+            The normalised question (see `normalise_question`).
+
+    Returns:
+        The signature (`array('I')` of `SIGNATURE_SIZE` values).
+    '''
+    words = WORD.findall(question)
+    if len(words) < 2:
+        shingles = {' '.join(words)}
+    else:
+        shingles = {f'{first} {second}' for first, second in zip(words, words[1:])}
+    # One row of hashes per word pair: the signature is each column's minimum.
+    hashes = array('I', b''.join([hashlib.blake2b(shingle.encode('utf-8'), digest_size=SIGNATURE_SIZE * 4).digest() for shingle in shingles]))
+    return array('I', [min(hashes[column::SIGNATURE_SIZE]) for column in range(SIGNATURE_SIZE)])
+
+class DuplicateFinder:
+    '''
+    Finds exact and near duplicates among the questions of a bank, one question at a time, as a bank merged from several question files is built.
+
+    Exact duplicates have the same normalised text (see `normalise_question`), answer, answer options and aliases. A question with the same text as an earlier one but a different answer, answer options or aliases (e.g. a corrected copy) is a conflict: it is kept and reported, since there is no telling which copy is right. Near duplicates are found with MinHash and locality-sensitive hashing: each question's signature is split into bands, and a question is only compared with the first earlier question that has the same values in one of its bands. So finding them takes time and memory in proportion to the number of questions, rather than comparing every pair, but working out the signatures still takes over ten times as long as finding exact duplicates, so finding near duplicates can be turned off.
+
+    Attributes:
+        __find_near_duplicates : bool
+            Whether to look for near duplicates as well as exact ones.
+        __texts : dict[int, int]
+            The index of the first question with each normalised text, keyed by its hash (see `question.question_key`).
+        __exact : dict[int, int]
+            The index of the first question with each normalised text, answer, answer options and aliases, keyed by their hash (see `contents_key`).
+        __bands : list[dict[int, int]]
+            For each band, the number (in the order they were added) of the first question with each of its values, keyed by their hash.
+        __signatures : array
+            The signature (see `signature`) of every question added, one after the other (`array('I')`).
+        __indices : array
+            The index of every question added, in the order they were added (`array('Q')`).
+        __exact_duplicates : list[tuple[int, int]]
+            The index of every exact duplicate found, and the index of the question it duplicates.
+        __conflicts : list[tuple[int, int]]
+            The index of every question with the same text as an earlier one but a different answer, answer options or aliases, and the index of the first question with that text.
+        __near_duplicates : list[tuple[int, int, float]]
+            The index of every near duplicate found, the index of the question it is similar to, and their estimated similarity.
+    '''
+
+    def __init__(self, find_near_duplicates:bool = True):
+        self.__find_near_duplicates = find_near_duplicates
+        self.__texts:dict[int, int] = {}
+        self.__exact:dict[int, int] = {}
+        self.__bands:list[dict[int, int]] = [{} for _ in range(BANDS)]
+        self.__signatures = array('I')
+        self.__indices = array('Q')
+        self.__exact_duplicates:list[tuple[int, int]] = []
+        self.__conflicts:list[tuple[int, int]] = []
+        self.__near_duplicates:list[tuple[int, int, float]] = []
+
+    @property
+    def get_exact_duplicates(self) -> list[tuple[int, int]]:
+        return self.__exact_duplicates
+    @property
+    def get_conflicts(self) -> list[tuple[int, int]]:
+        return self.__conflicts
+    @property
+    def get_near_duplicates(self) -> list[tuple[int, int, float]]:
+        return self.__near_duplicates
+
+    def add(self, index:int, question:dict) -> bool:
+        '''
+        Check whether a question duplicates one added before it, and add it if it isn't an exact duplicate.
+
+        Parameters:
+            index : int
+                The question's index in the bank (for reporting duplicates).
+            question : dict
+                The question as parsed from the question file (which must match `schema.QUESTION_SCHEMA`).
+
+        Returns:
+            `True` if the question is an exact duplicate of one added before it, so it should be left out of the bank.
+            `False` otherwise (including if it is a conflict or a near duplicate, which are only reported).
+        '''
+        normalised = normalise_question(question['question'])
+        key = contents_key(normalised, question)
+        original = self.__exact.get(key)
+        if original is not None:
+            self.__exact_duplicates.append((index, original))
+            return True
+        self.__exact[key] = index
+
+        original = self.__texts.setdefault(question_key(normalised), index)
+        if original != index:
+            # Its text is certainly similar to the earlier question's, so it isn't reported as a near duplicate too.
+            self.__conflicts.append((index, original))
+            return False
+        if not self.__find_near_duplicates:
+            return False
+
+        question_signature = signature(normalised)
+        number = len(self.__indices)
+        reported = False
+        for band in range(BANDS):
+            band_key = hash(tuple(question_signature[band * ROWS:(band + 1) * ROWS]))
+            candidate = self.__bands[band].setdefault(band_key, number)
+            if candidate == number or reported:
+                continue
+            candidate_signature = self.__signatures[candidate * SIGNATURE_SIZE:(candidate + 1) * SIGNATURE_SIZE]
+            similarity = sum(1 for a, b in zip(question_signature, candidate_signature) if a == b) / SIGNATURE_SIZE
+            if similarity >= NEAR_DUPLICATE_SIMILARITY:
+                self.__near_duplicates.append((index, self.__indices[candidate], similarity))
+                reported = True
+
+        self.__signatures.extend(question_signature)
+        self.__indices.append(index)
+        return False
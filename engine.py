@@ -0,0 +1,386 @@
+from random import shuffle
+from typing import Callable, Iterable, Iterator, Sequence
+from question import Question
+from results import Results
+
+class QuizEngine:
+    '''
+    Scores quizzes without any terminal I/O, so that recorded or scripted answers can be graded as fast as they can be read.
+
+    Answers are either the text of the answer (typed in or selected), or the index of the selected answer option in `Question.get_answer_options` (whatever order the options were displayed in).
+
+    Attributes:
+        __multiple_choice : bool
+            Whether the user gets to choose from different answer options.
+        __select_using_index : bool
+            Whether answer options are selected by index rather than typed in.
+        __max_number_of_attempts : int
+            The maximum number of attempts the user gets per question.
+        __max_typo_distance : int
+            The number of typos allowed in typed answers.
+    '''
+
+    def __init__(self, multiple_choice:bool, select_using_index:bool, max_number_of_attempts:int, max_typo_distance:int = 0) -> None:
+        self.__multiple_choice = multiple_choice
+        self.__select_using_index = select_using_index
+        self.__max_number_of_attempts = max_number_of_attempts
+        self.__max_typo_distance = max_typo_distance
+
+    def __str__(self) -> str:
+        return f'''multiple_choice: {self.__multiple_choice}
+select_using_index: {self.__select_using_index}
+max_number_of_attempts: {self.__max_number_of_attempts}
+max_typo_distance: {self.__max_typo_distance}'''
+
+    @property
+    def get_multiple_choice(self) -> bool:
+        return self.__multiple_choice
+    @property
+    def get_select_using_index(self) -> bool:
+        return self.__select_using_index
+    @property
+    def get_max_number_of_attempts(self) -> int:
+        return self.__max_number_of_attempts
+    @property
+    def get_max_typo_distance(self) -> int:
+        return self.__max_typo_distance
+
+    def attempts_allowed(self, question:Question) -> int:
+        '''
+        Parameters:
+            question : Question
+
+        Returns:
+            The number of points `question` adds to the maximum score.
+        '''
+        if self.__multiple_choice:
+            # Ensure number of attempts does not exceed the number of incorrect answer options.
+            return min(self.__max_number_of_attempts, len(question.get_answer_options) - 1)
+        return self.__max_number_of_attempts
+
+    def is_correct(self, question:Question, answer:str|int|None) -> bool:
+        '''
+        Parameters:
+            question : Question
+            answer : str | int | None
+                The text of the answer, the index of the selected answer option, or `None` if no answer was given.
+
+        Returns:
+            `True` if `answer` is the correct answer (selected answers have to match exactly; typed answers are matched by `Question.accepts`).
+            `False` otherwise.
+        '''
+        if isinstance(answer, int):
+            if answer not in range(len(question.get_answer_options)):
+                return False
+            answer = question.get_answer_options[answer]
+            return answer == question.get_answer
+        if answer is None:
+            return False
+        if self.__multiple_choice and self.__select_using_index:
+            return answer == question.get_answer
+        return question.accepts(answer, self.__max_typo_distance)
+
+    def start_question(self, question:Question, option_order:list[int]|None = None, answers:list[str]|None = None) -> 'QuestionAttempt':
+        '''
+        Start grading a question one answer at a time, for front ends that can't supply answers through an iterator (e.g. because they wait for them asynchronously).
+
+        Parameters:
+            question : Question
+                The question being answered.
+            option_order : list[int] | None
+                The order its answer options are displayed in (see `QuestionAttempt`). `None` for the order they are in.
+            answers : list[str] | None
+                Where to record the text of every answer given. `None` to not record them.
+
+        Returns:
+            The attempt, to submit answers to.
+        '''
+        return QuestionAttempt(self, question, option_order, answers)
+
+    def grade_question(self, question:Question, answers:Iterator[str|int], on_incorrect:Callable[[int], None]|None = None) -> tuple[int, bool]:
+        '''
+        Grade the answers given to a question, taking answers until one is correct or the user runs out of attempts.
+
+        Parameters:
+            question : Question
+                The question being answered.
+            answers : Iterator[str | int]
+                The user's answers. Running out of answers counts as answering incorrectly.
+            on_incorrect : Callable[[int], None] | None
+                Called with the number of remaining attempts after each incorrect answer.
+
+        Returns:
+            `tuple[int, bool]`
+                The `int` is the number of points the user earned for this question.
+                The `bool` is whether or not the user entered the correct answer.
+
+        Calls:
+            start_question
+        '''
+        attempt = self.start_question(question)
+
+        while not attempt.get_finished:
+            attempt.submit(next(answers, None))
+
+            if not attempt.get_correct and on_incorrect is not None:
+                on_incorrect(attempt.get_attempts_remaining)
+
+        return attempt.get_points, attempt.get_correct
+
+    def score_question(self, results:Results, question:Question, answers:Iterator[str|int], on_incorrect:Callable[[int], None]|None = None) -> tuple[int, bool]:
+        '''
+        Grade the answers given to a question and add them to `results`.
+
+        Parameters:
+            results : Results
+                The results of the quiz so far.
+            question : Question
+                The question being answered.
+            answers : Iterator[str | int]
+                The user's answers.
+            on_incorrect : Callable[[int], None] | None
+                Called with the number of remaining attempts after each incorrect answer.
+
+        Returns:
+            The points earned and whether the question was answered correctly (see `grade_question`).
+
+        Calls:
+            attempts_allowed
+            grade_question
+        '''
+        results.increase_max_score_by(self.attempts_allowed(question))
+
+        points, correct = self.grade_question(question, answers, on_incorrect)
+
+        if correct:
+            results.increase_score_by(points)
+            results.increment_questions_correct()
+
+        return points, correct
+
+    def run(self, questions:Iterable[Question], answers:Iterable[str|int]) -> Results:
+        '''
+        Grade a whole quiz.
+
+        Parameters:
+            questions : Iterable[Question]
+                The questions, in the order they were asked.
+            answers : Iterable[str | int]
+                Every answer the user gave, in order. Each question takes answers until one is correct or the user runs out of attempts.
+
+        Returns:
+            The results of the quiz.
+
+        Calls:
+            score_question
+        '''
+        results = Results()
+        answers = iter(answers)
+        for question in questions:
+            self.score_question(results, question, answers)
+        return results
+
+class QuizProgress:
+    '''
+    The state of one quiz being played, whatever it is played through (the terminal's `Quiz`, or a server session): the questions asked so far, the answers given to them and the results.
+
+    Front ends only do the I/O: they display each question started here (see `rendering.question_lines`), submit the user's answers to its `QuestionAttempt`, and finish it here.
+
+    Attributes:
+        __engine : QuizEngine
+            The engine the quiz is graded by.
+        __questions : Sequence[Question]
+            Every question in the quiz, in the order they are asked (shared, so never modified).
+        __results : Results
+            The results so far.
+        __answer_log : list[tuple[str, list[str]]]
+            Every question asked so far, with the text of every answer given to it.
+        __outcomes : list[tuple[Question, int, bool]]
+            Every question answered so far, with the points earned for it and whether it was answered correctly.
+        __next_question : int
+            The number of questions answered (and the index of the next one to ask).
+    '''
+
+    def __init__(self, engine:QuizEngine, questions:Sequence[Question]) -> None:
+        self.__engine = engine
+        self.__questions = questions
+        self.__results = Results()
+        self.__answer_log:list[tuple[str, list[str]]] = []
+        self.__outcomes:list[tuple[Question, int, bool]] = []
+        self.__next_question = 0
+
+    @property
+    def get_engine(self) -> QuizEngine:
+        return self.__engine
+    @property
+    def get_questions(self) -> Sequence[Question]:
+        return self.__questions
+    @property
+    def get_results(self) -> Results:
+        return self.__results
+    @property
+    def get_answer_log(self) -> list[tuple[str, list[str]]]:
+        return self.__answer_log
+    @property
+    def get_outcomes(self) -> list[tuple[Question, int, bool]]:
+        return self.__outcomes
+    @property
+    def get_next_question(self) -> int:
+        return self.__next_question
+    @property
+    def get_finished(self) -> bool:
+        return self.__next_question >= len(self.__questions)
+
+    def start_question(self) -> 'QuestionAttempt':
+        '''
+        Start the next question: shuffle its answer options (for multiple choice), and count it towards the maximum score.
+
+        Returns:
+            The attempt, to display and submit answers to.
+        '''
+        question = self.__questions[self.__next_question]
+        option_order = list(range(len(question.get_answer_options)))
+        if self.__engine.get_multiple_choice:
+            shuffle(option_order)
+
+        self.__results.increase_max_score_by(self.__engine.attempts_allowed(question))
+        answers:list[str] = []
+        self.__answer_log.append((question.get_question, answers))
+        return self.__engine.start_question(question, option_order, answers)
+
+    def finish_question(self, attempt:'QuestionAttempt'):
+        '''
+        Add a finished question's points to the results, and move on to the next question.
+
+        Parameters:
+            attempt : QuestionAttempt
+                The attempt started with `start_question`.
+        '''
+        self.__outcomes.append((attempt.get_question, attempt.get_points, attempt.get_correct))
+        if attempt.get_correct:
+            self.__results.increase_score_by(attempt.get_points)
+            self.__results.increment_questions_correct()
+        self.__next_question += 1
+
+    def restore(self, answered:list[tuple[list[int], int, int, bool, list[str]]]):
+        '''
+        Restore the state of a resumed quiz from its checkpoint, as if its answered questions had just been asked, without asking them again.
+
+        Parameters:
+            answered : list[tuple[list[int], int, int, bool, list[str]]]
+                The questions answered so far (see `CheckpointState.get_answered`), in order.
+        '''
+        for question, (_, _, points, correct, answers) in zip(self.__questions[self.__next_question:], answered):
+            self.__results.increase_max_score_by(self.__engine.attempts_allowed(question))
+            self.__answer_log.append((question.get_question, list(answers)))
+            self.__outcomes.append((question, points, correct))
+            if correct:
+                self.__results.increase_score_by(points)
+                self.__results.increment_questions_correct()
+            self.__next_question += 1
+
+    def results_values(self) -> tuple[int, int, int, int, int]:
+        '''
+        Returns:
+            The values of `DisplayText.RESULTS`: the number of questions answered correctly, the number of questions, the score, the maximum score and the final (adjusted) score.
+        '''
+        return self.__results.get_questions_correct, len(self.__questions), self.__results.get_score, self.__results.get_max_score, self.__results.calculate_adjusted_score()
+
+class QuestionAttempt:
+    '''
+    The state of one question while it is being answered: answers are submitted one at a time until one is correct or the user runs out of attempts.
+
+    Attributes:
+        __engine : QuizEngine
+            The engine whose rules the answers are graded by.
+        __question : Question
+            The question being answered.
+        __option_order : list[int] | None
+            The order the answer options are displayed in, as indices into `Question.get_answer_options` (the question itself is shared, so it is never shuffled). `None` for the order they are in.
+        __answers : list[str] | None
+            The text of every answer submitted, or `None` to not record them.
+        __attempt : int
+            The number of the next attempt (starting from 1).
+        __points : int
+            The points the user will earn if they answer correctly now.
+        __correct : bool
+            Whether the user has answered correctly.
+    '''
+
+    def __init__(self, engine:QuizEngine, question:Question, option_order:list[int]|None = None, answers:list[str]|None = None) -> None:
+        self.__engine = engine
+        self.__question = question
+        self.__option_order = option_order
+        self.__answers = answers
+        self.__attempt = 1
+        self.__points = engine.get_max_number_of_attempts
+        self.__correct = False
+
+    @property
+    def get_question(self) -> Question:
+        return self.__question
+    @property
+    def get_option_order(self) -> list[int]:
+        return list(range(len(self.__question.get_answer_options))) if self.__option_order is None else self.__option_order
+    @property
+    def get_displayed_options(self) -> list[str]:
+        '''
+        The answer options, in the order they are displayed.
+        '''
+        return [self.__question.get_answer_options[o] for o in self.get_option_order]
+    @property
+    def get_answers(self) -> list[str]:
+        return [] if self.__answers is None else self.__answers
+    @property
+    def get_points(self) -> int:
+        return self.__points
+    @property
+    def get_correct(self) -> bool:
+        return self.__correct
+    @property
+    def get_attempts_remaining(self) -> int:
+        return self.__engine.get_max_number_of_attempts - self.__attempt + 1
+    @property
+    def get_finished(self) -> bool:
+        return self.__correct or self.__attempt > self.__engine.get_max_number_of_attempts
+
+    def select(self, choice) -> int|None:
+        '''
+        Parameters:
+            choice
+                The (1-based) position of an answer option as it was displayed.
+
+        Returns:
+            The index of the answer option in `Question.get_answer_options` (to submit), or `None` if `choice` isn't the position of an answer option.
+        '''
+        option_order = self.get_option_order
+        if not isinstance(choice, int) or isinstance(choice, bool) or choice - 1 not in range(len(option_order)):
+            return None
+        return option_order[choice - 1]
+
+    def submit(self, answer:str|int|None) -> bool:
+        '''
+        Submit an answer.
+
+        Parameters:
+            answer : str | int | None
+                The text of the answer, the index of the selected answer option, or `None` if no answer was given.
+
+        Raises:
+            ValueError
+                If the question has already been finished.
+
+        Returns:
+            Whether the answer was correct.
+        '''
+        if self.get_finished:
+            raise ValueError('Question already finished.')
+        if self.__answers is not None and answer is not None:
+            self.__answers.append(self.__question.get_answer_options[answer] if isinstance(answer, int) and answer in range(len(self.__question.get_answer_options)) else str(answer))
+
+        self.__correct = self.__engine.is_correct(self.__question, answer)
+        if not self.__correct:
+            self.__points -= 1
+        self.__attempt += 1
+
+        return self.__correct
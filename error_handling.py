@@ -23,12 +23,93 @@ class ErrorMessages:
             Arguments:
 
             1. File path
+        FILE_INVALID : str
+            Error message for when a file's contents don't match what is expected of them.
+
+            Arguments:
+
+            1. File path
+            2. Every problem found, one per line
+        MORE_PROBLEMS : str
+            Summarise the problems that weren't listed.
+
+            Arguments:
+
+            1. Number of problems not listed
+        KEY_MISSING : str
+            Describe a missing key.
+
+            Arguments:
+
+            1. Where the key should be
+            2. The key
+        KEY_UNEXPECTED : str
+            Describe a key that isn't expected.
+
+            Arguments:
+
+            1. Where the key is
+            2. The key
+        WRONG_TYPE : str
+            Describe a value of the wrong type.
+
+            Arguments:
+
+            1. Where the value is
+            2. The expected types
+            3. The value's type
+        NOT_A_CHOICE : str
+            Describe a value that isn't one of the allowed values.
+
+            Arguments:
+
+            1. Where the value is
+            2. The allowed values
+            3. The value
+        TOO_MANY_ITEMS : str
+            Describe a list with more items than can be stored.
+
+            Arguments:
+
+            1. Where the list is
+            2. The list's key
+            3. The number of items in it
+            4. The most items allowed
+        COMPILE_FAILED : str
+            Error message for when a compiled question bank couldn't be written.
+
+            Arguments:
+
+            1. File path
+            2. Why it couldn't be written
+        SCORE_STORE_FAILED : str
+            Error message for when the server couldn't open the score store, so it carries on without saving scores.
+
+            Arguments:
+
+            1. Why it couldn't be opened
+        RELOAD_FAILED : str
+            Error message for when files changed while the program was running couldn't be reloaded, so the program carries on with the files it had.
+
+            Arguments:
+
+            1. Why reloading failed
     '''
 
     PROGRAM_ABENDED : str = 'Program abended.'
     FILE_NOT_FOUND : str = 'File "{}" not found.'
     FILE_INCOMPLETE : str = 'File "{}" incomplete.'
     FILE_CORRUPTED : str = 'File "{}" corrupted.'
+    FILE_INVALID : str = 'File "{}" invalid:\n{}'
+    MORE_PROBLEMS : str = '...and {} more problems.'
+    KEY_MISSING : str = '{}: "{}" is missing.'
+    KEY_UNEXPECTED : str = '{}: "{}" is not expected.'
+    WRONG_TYPE : str = '{} should be {}, not {}.'
+    NOT_A_CHOICE : str = '{} should be one of {}, not {}.'
+    TOO_MANY_ITEMS : str = '{}: "{}" has {} items, more than the {} a compiled question bank can store.'
+    COMPILE_FAILED : str = 'Compiled question bank "{}" could not be written: {}'
+    SCORE_STORE_FAILED : str = 'Scores will not be saved, since the score store could not be opened: {}'
+    RELOAD_FAILED : str = 'Kept the loaded files, since reloading them failed: {}'
 
 def abend(error_message):
     '''
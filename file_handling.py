@@ -1,16 +1,50 @@
+import heapq
+import io
 import json
+import math
 import os
+import random
 import re as regex
+import tempfile
+from array import array
+from contextlib import contextmanager
+from typing import Callable, Iterable, TypeVar
+try:
+    import fcntl
+except ImportError:
+    # Not available on Windows, where score files aren't locked (so only one process should use them at a time).
+    fcntl = None
 
 from error_handling import *
-from question import Question
+from question import Question, QuestionPool, question_from_json
 from config import Config
 from display_text import DisplayText
 from prompts import Prompts
+from text_table import TextSnapshot
+import compiled_bank
+import bundle as bundles
+import question_shards
+import parallel_parsing
+import question_stats
+import schema
+from profiling import profiler
 
-class KeyMissingError(Exception):
+CONFIG_FILE_PATH = "data/config.json"
+# A cache of the parsed config, display text and prompt files (see `load_startup_files`).
+BUNDLE_FILE_PATH = "data/startup.bundle"
+# A record of the question files found valid, so that they aren't validated again until they change (see `schema.is_verified`).
+VALIDATION_CACHE_FILE_PATH = "data/validation.cache"
+# Any number of timestamps, each followed by a newline. Timestamps start with "YYYY-MM-DD HH:MM:SS".
+TIME_STAMPS_PATTERN = regex.compile(r"(?:\d{4}-\d{2}-\d{2}[^\S\n]\d{2}:\d{2}:\d{2}[^\n]*\n)*")
+# A "YYYY-MM-DD HH:MM:SS" timestamp followed by a newline, with every digit replaced by 0 (see `validate_scores`).
+TIME_STAMP_SHAPE = '0000-00-00 00:00:00\n'
+ZERO_DIGITS = str.maketrans('0123456789', '0000000000')
+
+T = TypeVar('T')
+
+class FileIncompleteError(ValueError):
     '''
-    An exception to be raised when an essential key is missing from a dictionary.
+    An exception to be raised when a file is correctly formatted but doesn't contain anything to load (e.g. a question file containing an empty array).
     '''
     def __init__(self, *args: object) -> None:
         super().__init__(*args)
@@ -34,7 +68,9 @@ def load_file(file_path:str) -> str:
     except FileNotFoundError:
         abend(ErrorMessages.FILE_NOT_FOUND.format(os.path.abspath(file_path)))
     else:
-        return ''.join(file.readlines())
+        contents = ''.join(file.readlines())
+        profiler.count('bytes_read', file.buffer.tell())
+        return contents
     finally:
         file.close()
 
@@ -59,49 +95,293 @@ def load_config_file(file_path:str) -> Config:
     file_contents = load_file(file_path)
 
     try:
-        settings = Config(*tuple(json.loads(file_contents).values()))
-    except TypeError:
-        abend(ErrorMessages.FILE_INCOMPLETE.format(os.path.abspath(file_path)))
+        values = json.loads(file_contents)
     except ValueError:
         abend(ErrorMessages.FILE_CORRUPTED.format(os.path.abspath(file_path)))
-    else:
-        return settings
 
-    abend("Unhandled exception.") # DEBUG
+    return build_config(file_path, values)
+
+def build_config(file_path:str, values:dict) -> Config:
+    '''
+    Build the config settings from the parsed config file, by key (so the order of the settings doesn't matter).
+
+    Will abend if any settings are missing, unexpected or of the wrong type (see `schema.CONFIG_SCHEMA`), listing every problem.
+
+    Parameters:
+        file_path : str
+            Path to the configuration file (for error messages).
+        values : dict
+            The parsed contents of the config file.
+
+    Returns:
+        A new, populated instance of `Config`.
+    '''
+    problems = schema.CONFIG_SCHEMA.check(values)
+    if len(problems) > 0:
+        abend(schema.describe_problems(file_path, problems))
+    return Config(**values)
 
-def load_questions_file(file_path:str) -> list[Question]:
+@profiler.timed('questions.load')
+def load_questions_file(file_path:str, workers:int|None = 1) -> list[Question]:
     '''
     Load and parse questions file.
 
-    Will abend if the config file is:
+    Every question is checked against `schema.QUESTION_SCHEMA`, unless the file is unchanged since it was last found valid (see `schema.is_verified`). The questions share their repeated answer options and accepted answers through one `QuestionPool`.
+
+    A large file is parsed in chunks by a pool of worker processes if more than one is asked for (see `parallel_parsing.load_questions`), giving the same questions. If it can't be, it is parsed in this process, so any problems with it are reported the same way.
+
+    Will abend if the questions file is:
 
     - Not found
     - Empty
     - Corrupted
+    - Invalid (listing every problem)
 
     Parameters:
         file_path : str
             Path to the questions file.
+        workers : int | None
+            The number of worker processes to parse the file with. 1 to parse it in this process, `None` for one per CPU.
 
     Returns:
         A `list[Question]` containing the loaded questions.
     '''
+    verified = schema.is_verified(VALIDATION_CACHE_FILE_PATH, file_path, schema.QUESTION_SCHEMA)
+    try:
+        # Fingerprint before reading, so a change made while reading isn't recorded as valid.
+        fingerprint = bundles.fingerprint(file_path)
+    except FileNotFoundError:
+        abend(ErrorMessages.FILE_NOT_FOUND.format(os.path.abspath(file_path)))
+
+    if workers is None:
+        workers = os.cpu_count() or 1
+    if workers > 1:
+        questions = parallel_parsing.load_questions(file_path, workers, not verified)
+        if questions is not None:
+            if not verified:
+                schema.record_verified(VALIDATION_CACHE_FILE_PATH, file_path, schema.QUESTION_SCHEMA, fingerprint)
+            return questions
 
     file_contents = load_file(file_path)
 
-    questions:list[Question] = []
+    try:
+        elements = json.loads(file_contents)
+    except ValueError:
+        abend(ErrorMessages.FILE_CORRUPTED.format(os.path.abspath(file_path)))
+    if not isinstance(elements, list):
+        abend(ErrorMessages.FILE_CORRUPTED.format(os.path.abspath(file_path)))
+    if len(elements) == 0:
+        abend(ErrorMessages.FILE_INCOMPLETE.format(os.path.abspath(file_path)))
+
+    if not verified:
+        problems = [problem for index, question in enumerate(elements) for problem in schema.QUESTION_SCHEMA.check_element(question, index)]
+        if len(problems) > 0:
+            abend(schema.describe_problems(file_path, problems))
+        schema.record_verified(VALIDATION_CACHE_FILE_PATH, file_path, schema.QUESTION_SCHEMA, fingerprint)
 
+    pool = QuestionPool()
+    questions = [question_from_json(question, pool) for question in elements]
+    profiler.count('questions_created', len(questions))
+    profiler.count('distinct_answer_strings', len(pool))
+    return questions
+
+def iter_json_array(file_path:str, chunk_size:int = 1 << 16, start:int|None = None, with_offsets:bool = False):
+    '''
+    Incrementally parse a file containing a JSON array, yielding its elements one at a time.
+
+    Only one chunk of the file (plus any element that spans the chunk boundary) is held in memory at once.
+
+    Parameters:
+        file_path : str
+            The path to the file to parse.
+        chunk_size : int
+            The number of characters to read from the file at a time.
+        start : int | None
+            The position (in bytes) of an element of the array to start parsing from, as given by `with_offsets`. `None` to parse the whole array.
+        with_offsets : bool
+            Whether to yield the position (in bytes) of each element along with it.
+
+    Raises:
+        FileNotFoundError
+            If the file does not exist.
+        ValueError
+            If the file does not contain a correctly formatted JSON array.
+
+    Returns:
+        A generator of the decoded array elements (or of `(position, element)` tuples if `with_offsets` is true), in file order.
+    '''
+    WHITESPACE = ' \t\n\r'
+    # Characters that can carry on a number, so a number followed only by these may have been cut short.
+    NUMBER_CHARACTERS = '0123456789.eE+-'
+
+    decoder = json.JSONDecoder()
+    # Read UTF-8 without newline translation, so that character positions can be converted to byte positions.
+    file = io.TextIOWrapper(open(file_path, 'rb'), encoding='utf-8', newline='')
     try:
-        for question in list(json.loads(file_contents)):
-            questions.append(Question(*question.values()))
+        if start is not None:
+            file.buffer.seek(start)
+        buffer = ''
+        position = 0
+        end_of_file = False
+        expecting = '[' if start is None else 'element'
 
-        if len(questions) == 0:
-            abend(ErrorMessages.FILE_INCOMPLETE.format(os.path.abspath(file_path)))
+        # The byte position of `buffer[counted]` is `buffer_start + counted_bytes` (only tracked if `with_offsets` is true).
+        buffer_start = start or 0
+        counted = 0
+        counted_bytes = 0
+
+        while True:
+            # Skip whitespace, topping up the buffer whenever it runs dry.
+            while True:
+                while position < len(buffer) and buffer[position] in WHITESPACE:
+                    position += 1
+                if position < len(buffer) or end_of_file:
+                    break
+                if with_offsets:
+                    buffer_start += counted_bytes + len(buffer[counted:].encode('utf-8'))
+                    counted = counted_bytes = 0
+                buffer = file.read(chunk_size)
+                position = 0
+                end_of_file = len(buffer) == 0
+
+            if position == len(buffer):
+                raise ValueError('Unexpected end of JSON array.')
+
+            character = buffer[position]
+
+            if expecting == '[':
+                if character != '[':
+                    raise ValueError('Expected a JSON array.')
+                position += 1
+                expecting = 'element or ]'
+            elif character == ']' and expecting != 'element':
+                return
+            elif expecting == ', or ]':
+                if character != ',':
+                    raise ValueError('Expected "," or "]".')
+                position += 1
+                expecting = 'element'
+            else:
+                try:
+                    element, end = decoder.raw_decode(buffer, position)
+                    # A value that runs up to the end of the buffer may have been cut short. A number may also have been decoded from only the start of one cut short (e.g. "1" from "1.").
+                    rest = end
+                    if isinstance(element, (int, float)) and not isinstance(element, bool):
+                        while rest < len(buffer) and buffer[rest] in NUMBER_CHARACTERS:
+                            rest += 1
+                    complete = rest < len(buffer) or end_of_file
+                except json.JSONDecodeError:
+                    if end_of_file:
+                        raise
+                    complete = False
+
+                if not complete:
+                    more = file.read(chunk_size)
+                    end_of_file = len(more) == 0
+                    if with_offsets:
+                        buffer_start += counted_bytes + len(buffer[counted:position].encode('utf-8'))
+                        counted = counted_bytes = 0
+                    buffer = buffer[position:] + more
+                    position = 0
+                    continue
+
+                if with_offsets:
+                    counted_bytes += len(buffer[counted:position].encode('utf-8'))
+                    counted = position
+                    yield buffer_start + counted_bytes, element
+                else:
+                    yield element
+                position = end
+                expecting = ', or ]'
+
+                # Drop the consumed part of the buffer once it gets large.
+                if position >= chunk_size:
+                    if with_offsets:
+                        buffer_start += counted_bytes + len(buffer[counted:position].encode('utf-8'))
+                        counted = counted_bytes = 0
+                    buffer = buffer[position:]
+                    position = 0
+    finally:
+        profiler.count('bytes_read', file.buffer.tell() - (start or 0))
+        file.close()
 
-    except KeyMissingError | ValueError:
+@profiler.timed('questions.sample')
+def sample_questions_file(file_path:str, number_of_questions:int, seed:int|None = None, weight:Callable[[dict], float]|None = None) -> list[Question]:
+    '''
+    Draw a random sample of questions from the questions file without loading the whole file.
+
+    The file is streamed through `iter_json_array` and the sample is drawn by reservoir sampling, so only `number_of_questions` questions are ever held at once and a `Question` is only created for the ones that are kept. Weighted samples give each question a random rank of `log(u) / weight` and keep the highest ranks in a heap (Efraimidis and Spirakis' weighted reservoir sampling), so each question is drawn in proportion to its weight among those not yet drawn.
+
+    Every question is checked against `schema.QUESTION_SCHEMA` on the way past, unless the file is unchanged since it was last found valid (see `schema.is_verified`).
+
+    Will abend if the questions file is:
+
+    - Not found
+    - Empty
+    - Corrupted
+    - Invalid (listing every problem)
+
+    Parameters:
+        file_path : str
+            Path to the questions file.
+        number_of_questions : int
+            The maximum number of questions to draw.
+        seed : int | None
+            Seed for the random draw, so that it can be reproduced. `None` for a different draw every time.
+        weight : Callable[[dict], float] | None
+            Gives the weight (greater than 0) of each question, as parsed from the question file. `None` to draw every question with equal probability.
+
+    Returns:
+        A `list[Question]` containing the drawn questions in random order. Will be shorter than `number_of_questions` if the file doesn't contain enough questions.
+    '''
+    generator = random.Random(seed)
+    reservoir:list[dict] = []
+    ranked:list[tuple[float, int, dict]] = []
+    problems:list[str] = []
+
+    verified = schema.is_verified(VALIDATION_CACHE_FILE_PATH, file_path, schema.QUESTION_SCHEMA)
+    try:
+        # Fingerprint before reading, so a change made while reading isn't recorded as valid.
+        fingerprint = bundles.fingerprint(file_path)
+        for index, question in enumerate(iter_json_array(file_path)):
+            if not verified:
+                problems.extend(schema.QUESTION_SCHEMA.check_element(question, index))
+                # Keep looking for problems, but stop drawing questions once there are any.
+                if len(problems) > 0:
+                    continue
+            if weight is not None:
+                rank = (math.log(1.0 - generator.random()) / weight(question), index, question)
+                if len(ranked) < number_of_questions:
+                    heapq.heappush(ranked, rank)
+                elif rank > ranked[0]:
+                    heapq.heapreplace(ranked, rank)
+            elif index < number_of_questions:
+                reservoir.append(question)
+            else:
+                replace = generator.randrange(index + 1)
+                if replace < number_of_questions:
+                    reservoir[replace] = question
+    except FileNotFoundError:
+        abend(ErrorMessages.FILE_NOT_FOUND.format(os.path.abspath(file_path)))
+    except ValueError:
         abend(ErrorMessages.FILE_CORRUPTED.format(os.path.abspath(file_path)))
-    else:
-        return questions
+
+    if len(problems) > 0:
+        abend(schema.describe_problems(file_path, problems))
+    if weight is not None:
+        reservoir = [question for _, _, question in ranked]
+    if len(reservoir) == 0:
+        abend(ErrorMessages.FILE_INCOMPLETE.format(os.path.abspath(file_path)))
+    if not verified:
+        schema.record_verified(VALIDATION_CACHE_FILE_PATH, file_path, schema.QUESTION_SCHEMA, fingerprint)
+
+    questions = [question_from_json(question) for question in reservoir]
+    profiler.count('questions_parsed', index + 1)
+    profiler.count('questions_created', len(questions))
+
+    # The reservoir keeps early questions in file order, so shuffle the (small) sample itself.
+    generator.shuffle(questions)
+    return questions
 
 def load_data_class(file_path:str, the_class):
     '''
@@ -113,7 +393,7 @@ def load_data_class(file_path:str, the_class):
         file_path : str
             The path to the file containing the values for `the_class`.
         the_class : class
-            The class to load the values into. It must have a `set_values` method.
+            The class to load the values into. It must be a `TextTable`.
     '''
     file_contents = load_file(file_path)
 
@@ -122,52 +402,611 @@ def load_data_class(file_path:str, the_class):
     except ValueError:
         abend(ErrorMessages.FILE_CORRUPTED.format(os.path.abspath(file_path)))
 
+    set_data_class_values(file_path, the_class, values)
+
+def set_data_class_values(file_path:str, the_class, values:dict):
+    '''
+    Load parsed values into a non-instance class of constants. The values are only set when they are first used.
+
+    Will abend if any values are missing, unexpected or of the wrong type (see `schema.text_table_schema`), listing every problem.
+
+    Parameters:
+        file_path : str
+            The path to the file the values came from (for error messages).
+        the_class : class
+            The class to load the values into. It must be a `TextTable`.
+        values : dict
+            The values, keyed by constant name.
+    '''
+    problems = schema.text_table_schema(the_class).check(values)
+    if len(problems) > 0:
+        abend(schema.describe_problems(file_path, problems))
+    the_class.set_lazy_values(values)
+
+def read_source_file(file_path:str, sources:dict[str, tuple[int, int, bytes]]):
+    '''
+    Load and parse a JSON file, recording its fingerprint for the startup bundle.
+
+    Will abend if the file is not found or corrupted.
+
+    Parameters:
+        file_path : str
+            The path to the file.
+        sources : dict[str, tuple[int, int, bytes]]
+            The file's modification time, size and SHA-256 digest are added to this, keyed by `file_path`.
+
+    Returns:
+        The parsed contents of the file.
+    '''
     try:
-        the_class.set_values(the_class, *values.values())
-    except IndexError:
-        abend(ErrorMessages.FILE_INCOMPLETE.format(os.path.abspath(file_path)))
+        # Fingerprint before reading, so a change made while reading makes the bundle stale rather than wrong.
+        mtime_ns, size = bundles.fingerprint(file_path)
+        file = open(file_path, 'rb')
+    except FileNotFoundError:
+        abend(ErrorMessages.FILE_NOT_FOUND.format(os.path.abspath(file_path)))
+    try:
+        contents = file.read()
+    finally:
+        file.close()
 
-def load_score_file(file_path:str) -> dict[str, dict[str, int]]:
+    profiler.count('bytes_read', len(contents))
+    sources[file_path] = (mtime_ns, size, bundles.hash_contents(contents))
+
+    try:
+        return json.loads(contents)
+    except ValueError:
+        abend(ErrorMessages.FILE_CORRUPTED.format(os.path.abspath(file_path)))
+
+def startup_schemas() -> list[str]:
     '''
-    Load and parse score file.
+    Returns:
+        The fingerprints of the schemas the config, display text and prompt files are checked against, so that a startup bundle saved before any of them changed isn't trusted.
+    '''
+    return [schema.CONFIG_SCHEMA.get_fingerprint, schema.text_table_schema(DisplayText).get_fingerprint, schema.text_table_schema(Prompts).get_fingerprint]
+
+@profiler.timed('startup.load')
+def load_startup_files() -> Config:
+    '''
+    Load the config settings, display text and prompts.
+
+    A warm start reads them all from the startup bundle (one file, no JSON parsing), without checking them against their schemas again: a bundle is only saved once its values have been checked, and is ignored if the schemas have changed since. If the bundle is missing or any of the files have changed since it was saved, they are parsed and checked, and a new bundle is saved.
+
+    Will abend if the files can't be loaded properly.
+
+    Returns:
+        The loaded settings.
+    '''
+    bundle = bundles.load_bundle(BUNDLE_FILE_PATH)
+
+    if bundle is not None and CONFIG_FILE_PATH in bundle['sources'] and bundle.get('schemas') == startup_schemas():
+        profiler.count('startup_bundle_hits')
+        settings = Config(**bundle['config'])
+        DisplayText.set_lazy_values(bundle['display_text'])
+        Prompts.set_lazy_values(bundle['prompts'])
+        return settings
+
+    profiler.count('startup_bundle_misses')
+    sources:dict[str, tuple[int, int, bytes]] = {}
+    config_values = read_source_file(CONFIG_FILE_PATH, sources)
+    settings = build_config(CONFIG_FILE_PATH, config_values)
+    display_text_values = read_source_file(settings.get_display_text_file_path, sources)
+    set_data_class_values(settings.get_display_text_file_path, DisplayText, display_text_values)
+    prompt_values = read_source_file(settings.get_prompt_file_path, sources)
+    set_data_class_values(settings.get_prompt_file_path, Prompts, prompt_values)
+
+    bundles.save_bundle(BUNDLE_FILE_PATH, sources, {'schemas' : startup_schemas(), 'config' : config_values, 'display_text' : display_text_values, 'prompts' : prompt_values})
+
+    return settings
 
+def score_journal_path(file_path:str) -> str:
+    '''
     Parameters:
         file_path : str
             The path to the score file.
 
+    Returns:
+        The path to the journal of scores saved since the score file was last compacted.
+    '''
+    return file_path + '.journal'
+
+def score_lock_path(file_path:str) -> str:
+    '''
+    Parameters:
+        file_path : str
+            The path to the score file.
+
+    Returns:
+        The path to the file locked by processes using the score file (see `lock_score_file`).
+    '''
+    return file_path + '.lock'
+
+@contextmanager
+def lock_score_file(file_path:str, exclusive:bool = False):
+    '''
+    Hold an advisory lock on a score file (and its journal) for the duration of a `with` block.
+
+    Loading and appending to the journal only need a shared lock, so any number of processes can save scores at once. Replacing the score file or moving the journal aside needs an exclusive lock, so nobody sees a score file without the journal that goes with it.
+
+    Locks are not re-entrant: don't lock a score file again inside the `with` block.
+
+    Parameters:
+        file_path : str
+            The path to the score file.
+        exclusive : bool
+            Whether to take an exclusive lock rather than a shared one.
+    '''
+    if fcntl is None:
+        yield
+        return
+    lock = os.open(score_lock_path(file_path), os.O_RDWR | os.O_CREAT, 0o644)
+    try:
+        with profiler.span('scores.lock'):
+            fcntl.flock(lock, fcntl.LOCK_EX if exclusive else fcntl.LOCK_SH)
+        yield
+    finally:
+        # Closing the file releases the lock.
+        os.close(lock)
+
+def file_identity(file_path:str) -> tuple[int, int, int]|None:
+    '''
+    Parameters:
+        file_path : str
+            The path to the file.
+
+    Returns:
+        The file's inode, modification time (in nanoseconds) and size, which change whenever the file is replaced, or `None` if the file does not exist.
+    '''
+    try:
+        stat = os.stat(file_path)
+    except FileNotFoundError:
+        return None
+    return stat.st_ino, stat.st_mtime_ns, stat.st_size
+
+def write_temporary_file(file_path:str, contents:bytes) -> str:
+    '''
+    Write `contents` to a new temporary file next to `file_path`, and flush it to disk, ready to be moved into place with `os.replace`.
+
+    Parameters:
+        file_path : str
+            The path to the file the temporary file will replace.
+        contents : bytes
+            The contents to write.
+
+    Returns:
+        The path to the temporary file.
+    '''
+    directory, name = os.path.split(os.path.abspath(file_path))
+    descriptor, temporary_path = tempfile.mkstemp(prefix=name + '.', suffix='.tmp', dir=directory)
+    file = os.fdopen(descriptor, 'wb')
+    try:
+        file.write(contents)
+        file.flush()
+        os.fsync(file.fileno())
+    except BaseException:
+        file.close()
+        os.remove(temporary_path)
+        raise
+    file.close()
+    profiler.count('bytes_written', len(contents))
+    return temporary_path
+
+def sync_directory(file_path:str):
+    '''
+    Flush the directory containing `file_path` to disk, so that a file moved into it survives a crash.
+
+    Parameters:
+        file_path : str
+            The path to a file in the directory.
+    '''
+    if not hasattr(os, 'O_DIRECTORY'):
+        return
+    directory = os.open(os.path.dirname(os.path.abspath(file_path)), os.O_RDONLY | os.O_DIRECTORY)
+    try:
+        os.fsync(directory)
+    finally:
+        os.close(directory)
+
+def replace_score_file(file_path:str, contents:bytes, create:bool = False) -> bool:
+    '''
+    Atomically replace a score file and discard its journal.
+
+    The new contents are written to a temporary file and flushed to disk before the exclusive lock is taken, so other processes are only held up for the rename. A crash leaves either the old score file or the new one, never a half-written one.
+
+    Parameters:
+        file_path : str
+            The path to the score file.
+        contents : bytes
+            The new contents of the score file.
+        create : bool
+            Whether to only write the score file if neither it nor its journal exist yet.
+
+    Returns:
+        Whether the score file was written.
+    '''
+    journal_paths = [score_journal_path(file_path) + '.compacting', score_journal_path(file_path)]
+    temporary_path = write_temporary_file(file_path, contents)
+    try:
+        with lock_score_file(file_path, exclusive=True):
+            if create and any(os.path.exists(path) for path in [file_path] + journal_paths):
+                return False
+            os.replace(temporary_path, file_path)
+            sync_directory(file_path)
+            for journal_path in journal_paths:
+                if os.path.exists(journal_path):
+                    os.remove(journal_path)
+        return True
+    finally:
+        if os.path.exists(temporary_path):
+            os.remove(temporary_path)
+
+def compact_journal(file_path:str, merge:Callable[[str], tuple[bytes, T]]) -> T|None:
+    '''
+    Fold a score file's journal into the score file, so that later loads have fewer records to read. Works for any score file format.
+
+    The journal is moved aside (under an exclusive lock) before it is read, so scores saved while compacting go into a new journal and are not lost. The score file and the moved journal are then read and merged under a shared lock, and the result written to a temporary file, without holding up anyone saving scores. Finally, under an exclusive lock, the temporary file is moved into place and the moved journal removed, but only if the score file hasn't been replaced meanwhile; if it has, the merge is retried. If another process finished the compaction first, this one gives up.
+
+    A journal that was moved aside but not yet folded in is still read by loads, and is picked up by the next compaction.
+
+    Parameters:
+        file_path : str
+            Path to the score file.
+        merge : Callable[[str], tuple[bytes, T]]
+            Called with the path of the moved journal to read the score file and the journal, returning the new contents of the score file and a value to return.
+
     Raises:
         ValueError
-            If the scores file is formatted incorrectly.
+            If the score file or journal is formatted incorrectly.
 
     Returns:
-        The correctly loaded score dictionary, or an empty dictionary if the score file was not found.
+        The value returned by `merge` for the contents that were moved into place, or `None` if there was nothing to compact (or another process compacted it).
+    '''
+    journal_path = score_journal_path(file_path)
+    compacting_path = journal_path + '.compacting'
+
+    with lock_score_file(file_path, exclusive=True):
+        if not os.path.exists(compacting_path):
+            try:
+                os.replace(journal_path, compacting_path)
+            except FileNotFoundError:
+                return None
+
+    while True:
+        with lock_score_file(file_path):
+            if not os.path.exists(compacting_path):
+                return None
+            identity = file_identity(file_path)
+            contents, result = merge(compacting_path)
+        temporary_path = write_temporary_file(file_path, contents)
+        try:
+            with lock_score_file(file_path, exclusive=True):
+                if not os.path.exists(compacting_path):
+                    return None
+                if file_identity(file_path) == identity:
+                    os.replace(temporary_path, file_path)
+                    sync_directory(file_path)
+                    os.remove(compacting_path)
+                    return result
+            profiler.count('scores_compaction_retries')
+        finally:
+            if os.path.exists(temporary_path):
+                os.remove(temporary_path)
+
+def encode_score_record(name:str, time_stamp:str, score:int) -> bytes:
+    '''
+    Encode a saved score as one journal record.
+
+    Records are a single line of tab-separated fields: the timestamp, the score (3 digits), and the name (as a JSON string, so it can't contain a tab or a newline).
+
+    Parameters:
+        name : str
+            The user's name.
+        time_stamp : str
+            When the score was achieved.
+        score : int
+            The score.
+
+    Returns:
+        The encoded record, including its trailing newline.
+    '''
+    return f'{time_stamp}\t{score:03d}\t{json.dumps(name)}\n'.encode('utf-8')
+
+def decode_score_record(record:str) -> tuple[str, str, int]:
+    '''
+    Decode one journal record.
+
+    Parameters:
+        record : str
+            The record, without its trailing newline.
+
+    Raises:
+        ValueError
+            If the record is formatted incorrectly.
+
+    Returns:
+        A tuple containing the name, timestamp and score.
+    '''
+    time_stamp, score, name = record.split('\t', 2)
+    name = json.loads(name)
+    if not isinstance(name, str):
+        raise ValueError
+    return name, time_stamp, int(score)
+
+def append_score_record(file_path:str, name:str, time_stamp:str, score:int) -> int:
+    '''
+    Append a score to the score journal.
+
+    The record is written with a single `O_APPEND` write and then flushed to disk, so concurrent writers can't interleave or overwrite each other's records. A shared lock is held, so the journal can't be moved aside mid-write (see `compact_journal`).
+
+    Parameters:
+        file_path : str
+            The path to the score file.
+        name : str
+            The user's name.
+        time_stamp : str
+            When the score was achieved.
+        score : int
+            The score.
+
+    Returns:
+        The size of the journal in bytes after the append.
+    '''
+    record = encode_score_record(name, time_stamp, score)
+    with lock_score_file(file_path):
+        journal = os.open(score_journal_path(file_path), os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+        try:
+            os.write(journal, record)
+            profiler.count('bytes_written', len(record))
+            os.fsync(journal)
+            return os.fstat(journal).st_size
+        finally:
+            os.close(journal)
+
+def append_score_records(file_path:str, records:list[tuple[str, str, int]]) -> int:
+    '''
+    Append many scores to the score journal with a single write.
+
+    Parameters:
+        file_path : str
+            The path to the score file.
+        records : list[tuple[str, str, int]]
+            The names, timestamps and scores to append.
+
+    Returns:
+        The size of the journal in bytes after the append.
+    '''
+    data = memoryview(b''.join(encode_score_record(name, time_stamp, score) for name, time_stamp, score in records))
+    with lock_score_file(file_path):
+        journal = os.open(score_journal_path(file_path), os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+        try:
+            profiler.count('bytes_written', len(data))
+            while len(data) > 0:
+                data = data[os.write(journal, data):]
+            os.fsync(journal)
+            return os.fstat(journal).st_size
+        finally:
+            os.close(journal)
+
+def load_score_journal(journal_path:str) -> list[tuple[str, str, int]]:
+    '''
+    Load the records from a score journal.
+
+    A final record without a trailing newline was cut short by a crash mid-write, and is ignored.
+
+    Parameters:
+        journal_path : str
+            The path to the journal.
+
+    Raises:
+        ValueError
+            If a record is formatted incorrectly.
+
+    Returns:
+        The records in the order they were saved, or an empty list if the journal was not found.
+    '''
+    try:
+        file = open(journal_path, 'r', encoding='utf-8')
+    except FileNotFoundError:
+        return []
+    try:
+        contents = file.read()
+        profiler.count('bytes_read', file.buffer.tell())
+    finally:
+        file.close()
+
+    records = contents.split('\n')
+    # The last item is either empty (the journal ends with a newline) or an incomplete record.
+    return [decode_score_record(record) for record in records[:-1]]
+
+def score_verified_path(file_path:str) -> str:
+    '''
+    Parameters:
+        file_path : str
+            The path to the score file.
+
+    Returns:
+        The path to the record of the last score file contents that were known to be valid.
+    '''
+    return file_path + '.verified'
+
+def validate_scores(time_stamps:list[str], scores:Iterable[int]):
+    '''
+    Check a batch of saved scores.
+
+    Every check is done in bulk rather than score by score: the scores are packed into an unsigned byte array and range-checked with a single `max`, and the timestamps are joined and checked all at once. Timestamps in the usual "YYYY-MM-DD HH:MM:SS" form are checked by zeroing every digit and comparing the result with one string of the expected shape; only if that fails is the (much slower) regular expression used.
+
+    Parameters:
+        time_stamps : list[str]
+            The timestamps of the scores.
+        scores : Iterable[int]
+            The scores.
+
+    Raises:
+        ValueError
+            If a timestamp is formatted incorrectly, or a score isn't a whole number from 0 to 100.
     '''
-    
-    file = open(file_path, 'r')
     try:
-        contents = dict[str, dict[str, int]](json.load(file))
+        packed = array('B', scores)
+    except (TypeError, OverflowError):
+        raise ValueError
+    if len(packed) > 0 and max(packed) > 100:
+        raise ValueError
+
+    if len(time_stamps) > 0:
+        joined = '\n'.join(time_stamps) + '\n'
+        if joined.translate(ZERO_DIGITS) != TIME_STAMP_SHAPE * len(time_stamps) and TIME_STAMPS_PATTERN.fullmatch(joined) is None:
+            raise ValueError
+
+    profiler.count('scores_validated', len(packed))
+
+def load_score_snapshot(file_path:str) -> dict[str, dict[str, int]]:
+    '''
+    Load and validate the score file (without its journal).
+
+    The score file is only validated if it has changed since it was last known to be valid (see `save_score_verified`). The modification time and size are checked first, so an unchanged file isn't even hashed.
+
+    Parameters:
+        file_path : str
+            The path to the score file.
+
+    Raises:
+        ValueError
+            If the score file is formatted incorrectly.
+
+    Returns:
+        The scores in the score file, or an empty dictionary if the score file was not found.
+    '''
+    try:
+        file = open(file_path, 'rb')
     except FileNotFoundError:
         # It doesn't matter if the file does not exist yet: it will be created next time the score is saved.
         return {}
+    try:
+        mtime_ns, size = bundles.fingerprint(file_path)
+        contents = file.read()
+    finally:
+        file.close()
+    profiler.count('bytes_read', len(contents))
+
+    scores = json.loads(contents)
+    if not isinstance(scores, dict) or not all(isinstance(user_scores, dict) for user_scores in scores.values()):
+        raise ValueError
+
+    verified = load_score_verified(file_path)
+    if verified is not None and verified[:2] == (mtime_ns, size):
+        return scores
+    digest = bundles.hash_contents(contents)
+    if verified is None or verified[2] != digest:
+        with profiler.span('scores.validate'):
+            validate_scores([time_stamp for user_scores in scores.values() for time_stamp in user_scores], (score for user_scores in scores.values() for score in user_scores.values()))
+    save_score_verified(file_path, mtime_ns, size, digest)
+    return scores
+
+def load_score_verified(file_path:str) -> tuple[int, int, bytes]|None:
+    '''
+    Parameters:
+        file_path : str
+            The path to the score file.
 
+    Returns:
+        The modification time, size and SHA-256 digest the score file had when it was last known to be valid, or `None` if that isn't known.
+    '''
+    try:
+        file = open(score_verified_path(file_path), 'r')
+    except FileNotFoundError:
+        return None
+    try:
+        verified = json.load(file)
+        return verified['mtime_ns'], verified['size'], bytes.fromhex(verified['sha256'])
+    except (ValueError, TypeError, KeyError):
+        return None
     finally:
         file.close()
 
-    TIME_STAMP_PATTERN = r"\d{4}-\d{2}-\d{2}\s\d{2}:\d{2}:\d{2}"
-    pattern = regex.compile(TIME_STAMP_PATTERN)
+def save_score_verified(file_path:str, mtime_ns:int, size:int, digest:bytes):
+    '''
+    Record that the score file is valid, so that later loads can skip validating it. Failing to record it is not an error: the next load just validates the file again.
 
-    for score_dict in contents.values():
-        for time_stamp, score in score_dict.items():
-            if pattern.match(time_stamp) is None:
-                raise ValueError
-            if score not in range(0, 101):
-                raise ValueError
+    Parameters:
+        file_path : str
+            The path to the score file.
+        mtime_ns : int
+            The score file's modification time (in nanoseconds).
+        size : int
+            The score file's size.
+        digest : bytes
+            The SHA-256 digest of the score file's contents.
+    '''
+    try:
+        file = open(score_verified_path(file_path), 'w')
+        try:
+            json.dump({'mtime_ns' : mtime_ns, 'size' : size, 'sha256' : digest.hex()}, file)
+        finally:
+            file.close()
+    except OSError:
+        pass
+
+def encode_score_snapshot(scores:dict[str, dict[str, int]]) -> bytes:
+    '''
+    Parameters:
+        scores : dict[str, dict[str, int]]
+            The scores to encode.
+
+    Returns:
+        The contents of a score file holding `scores`.
+    '''
+    return json.dumps(scores).encode('utf-8')
+
+def verify_score_snapshot(file_path:str, contents:bytes):
+    '''
+    Record that a score file just written with `contents` (which must already be valid) is valid.
+
+    Parameters:
+        file_path : str
+            The path to the score file.
+        contents : bytes
+            The contents the score file was written with.
+    '''
+    try:
+        mtime_ns, size = bundles.fingerprint(file_path)
+    except FileNotFoundError:
+        return
+    save_score_verified(file_path, mtime_ns, size, bundles.hash_contents(contents))
+
+@profiler.timed('scores.load')
+def load_score_file(file_path:str) -> dict[str, dict[str, int]]:
+    '''
+    Load and parse score file.
+
+    The score file is a snapshot of all scores up to the last compaction; any scores saved since then are read from the score journal and added to it. The snapshot is only validated if it has changed since it was last known to be valid, so usually only the journal's scores are. A shared lock is held, so the snapshot and journal can't be compacted mid-load.
+
+    Parameters:
+        file_path : str
+            The path to the score file.
+
+    Raises:
+        ValueError
+            If the scores file is formatted incorrectly.
+
+    Returns:
+        The correctly loaded score dictionary, or an empty dictionary if the score file was not found.
+    '''
+    with lock_score_file(file_path):
+        contents = load_score_snapshot(file_path)
+
+        # A journal left over from an interrupted compaction comes before the current one.
+        journal_paths = [score_journal_path(file_path) + '.compacting', score_journal_path(file_path)]
+        for journal_path in journal_paths:
+            records = load_score_journal(journal_path)
+            validate_scores([time_stamp for _, time_stamp, _ in records], (score for _, _, score in records))
+            for name, time_stamp, score in records:
+                contents.setdefault(name, {})[time_stamp] = score
 
     return contents
 
+@profiler.timed('scores.save')
 def save_score_file(file_path : str, scores:dict[str, dict[str, int]]):
     '''
-    Save `scores` to the score file. Overwrites curent file contents.
+    Save `scores` to the score file. Atomically replaces the current file contents, and discards the score journal (see `replace_score_file`).
 
     Parameters:
         file_path : str
@@ -175,12 +1014,188 @@ def save_score_file(file_path : str, scores:dict[str, dict[str, int]]):
         scores : dict[str, dict[str, int]]
             The scores to save tp the file.
     '''
-    file = open(file_path, 'w')
+    contents = encode_score_snapshot(scores)
+    replace_score_file(file_path, contents)
+    verify_score_snapshot(file_path, contents)
+
+@profiler.timed('scores.compact')
+def compact_score_file(file_path:str):
+    '''
+    Fold the score journal into the score file (see `compact_journal`).
+
+    Parameters:
+        file_path : str
+            Path to the score file.
+
+    Raises:
+        ValueError
+            If the score file or journal is formatted incorrectly.
+    '''
+    def merge(compacting_path:str) -> tuple[bytes, bytes]:
+        scores = load_score_snapshot(file_path)
+        records = load_score_journal(compacting_path)
+        validate_scores([time_stamp for _, time_stamp, _ in records], (score for _, _, score in records))
+        for name, time_stamp, score in records:
+            scores.setdefault(name, {})[time_stamp] = score
+        contents = encode_score_snapshot(scores)
+        return contents, contents
+
+    contents = compact_journal(file_path, merge)
+    if contents is not None:
+        verify_score_snapshot(file_path, contents)
+
+def load_question_bank(settings:Config):
+    '''
+    Load every question, for long-running processes that draw many quizzes from the same bank.
+
+    Will abend if the question file can't be loaded properly.
+
+    Parameters:
+        settings : Config
+            The loaded config settings.
+
+    Returns:
+        The memory-mapped compiled bank if one is configured, or else a `list[Question]` of every question in the question file (or in every shard of a sharded question bank).
+    '''
+    if os.path.isdir(settings.get_question_file_path):
+        try:
+            pool = QuestionPool()
+            questions = [question_from_json(question, pool) for question in question_shards.open_sharded_bank(settings.get_question_file_path).iter_questions()]
+        except FileNotFoundError:
+            abend(ErrorMessages.FILE_NOT_FOUND.format(os.path.abspath(settings.get_question_file_path)))
+        except ValueError:
+            abend(ErrorMessages.FILE_CORRUPTED.format(os.path.abspath(settings.get_question_file_path)))
+        profiler.count('questions_created', len(questions))
+        return questions
+    if settings.get_compiled_question_file_path is None:
+        return load_questions_file(settings.get_question_file_path, settings.get_question_load_workers)
+    return compiled_bank.open_compiled_bank(settings.get_question_file_path, settings.get_compiled_question_file_path)
+
+@profiler.timed('reload.question_bank')
+def read_question_bank(settings:Config):
+    '''
+    Load every question again, for reloading the question bank while quizzes are being played (see `load_question_bank`).
+
+    Raises instead of abending, so that a long-running process can keep the bank it already has. The question file is parsed incrementally (with `iter_json_array`), so that a thread reloading it never holds the GIL for long enough to stall the threads serving quizzes.
+
+    Parameters:
+        settings : Config
+            The loaded config settings.
+
+    Raises:
+        FileNotFoundError
+            If the question file does not exist.
+        SchemaError
+            If any questions don't match `schema.QUESTION_SCHEMA` (with every problem found).
+        FileIncompleteError
+            If there are no questions.
+        ValueError
+            If the question file is formatted incorrectly.
+        CompileFailedError
+            If the compiled bank needed recompiling, but couldn't be written.
+
+    Returns:
+        The memory-mapped compiled bank if one is configured (recompiled if the question file has changed), or else a `list[Question]` of every question in the question file (or in every shard of a sharded question bank).
+    '''
+    file_path = settings.get_question_file_path
+    if os.path.isdir(file_path):
+        pool = QuestionPool()
+        questions = [question_from_json(question, pool) for question in question_shards.index_sharded_bank(file_path).iter_questions()]
+    elif settings.get_compiled_question_file_path is not None:
+        try:
+            bank = compiled_bank.CompiledBank(settings.get_compiled_question_file_path)
+        except (compiled_bank.CompiledBankError, FileNotFoundError):
+            bank = None
+        if bank is None or not bank.is_up_to_date(file_path):
+            if bank is not None:
+                bank.close()
+            # Sessions still using the old bank keep their own mapping of it: the new one replaces the file, rather than being written over it.
+            compiled_bank.compile_bank(file_path, settings.get_compiled_question_file_path)
+            bank = compiled_bank.CompiledBank(settings.get_compiled_question_file_path)
+        if len(bank) == 0:
+            bank.close()
+            raise FileIncompleteError(file_path)
+        return bank
+    else:
+        verified = schema.is_verified(VALIDATION_CACHE_FILE_PATH, file_path, schema.QUESTION_SCHEMA)
+        # Fingerprint before reading, so a change made while reading isn't recorded as valid.
+        fingerprint = bundles.fingerprint(file_path)
+        workers = settings.get_question_load_workers
+        if workers is None:
+            workers = os.cpu_count() or 1
+        questions = parallel_parsing.load_questions(file_path, workers, not verified) if workers > 1 else None
+        if questions is None:
+            elements = list(iter_json_array(file_path))
+            if not verified:
+                problems = [problem for index, question in enumerate(elements) for problem in schema.QUESTION_SCHEMA.check_element(question, index)]
+                if len(problems) > 0:
+                    raise schema.SchemaError(*problems)
+            pool = QuestionPool()
+            questions = [question_from_json(question, pool) for question in elements]
+        if not verified:
+            schema.record_verified(VALIDATION_CACHE_FILE_PATH, file_path, schema.QUESTION_SCHEMA, fingerprint)
+
+    if len(questions) == 0:
+        raise FileIncompleteError(file_path)
+    profiler.count('questions_created', len(questions))
+    return questions
+
+def read_text_table(file_path:str, the_class) -> TextSnapshot:
+    '''
+    Load a text table file again, for reloading it while quizzes are being played (see `load_data_class`).
+
+    Raises instead of abending, and doesn't change `the_class`, so that quizzes already being played can keep the text they started with.
+
+    Parameters:
+        file_path : str
+            The path to the file containing the values for `the_class`.
+        the_class : class
+            The class the values are for. It must be a `TextTable`.
+
+    Raises:
+        FileNotFoundError
+            If the file does not exist.
+        SchemaError
+            If any values are missing, unexpected or of the wrong type (with every problem found).
+        ValueError
+            If the file is formatted incorrectly.
+
+    Returns:
+        The loaded values.
+    '''
+    file = open(file_path, 'r', encoding='utf-8')
     try:
-        json.dump(scores, file)
+        values = json.load(file)
     finally:
         file.close()
 
+    problems = schema.text_table_schema(the_class).check(values)
+    if len(problems) > 0:
+        raise schema.SchemaError(*problems)
+    return TextSnapshot(values)
+
+def describe_load_error(file_path:str, error:Exception) -> str:
+    '''
+    Parameters:
+        file_path : str
+            The path to the file that couldn't be loaded.
+        error : Exception
+            The error raised by `read_question_bank` or `read_text_table`.
+
+    Returns:
+        The error message that loading the file would have abended with.
+    '''
+    if isinstance(error, compiled_bank.CompileFailedError):
+        return ErrorMessages.COMPILE_FAILED.format(os.path.abspath(error.args[0]), error.args[1])
+    if isinstance(error, FileNotFoundError):
+        return ErrorMessages.FILE_NOT_FOUND.format(os.path.abspath(file_path))
+    if isinstance(error, schema.SchemaError):
+        return schema.describe_problems(file_path, list(error.args))
+    if isinstance(error, FileIncompleteError):
+        return ErrorMessages.FILE_INCOMPLETE.format(os.path.abspath(file_path))
+    return ErrorMessages.FILE_CORRUPTED.format(os.path.abspath(file_path))
+
+@profiler.timed('startup.essential_files')
 def load_essential_files() -> tuple[Config, list[Question]]:
     '''
     Load essential files and dataclasses.
@@ -188,17 +1203,57 @@ def load_essential_files() -> tuple[Config, list[Question]]:
     Will abend if the files can't be loaded properly.
 
     Returns:
-        A tuple containing the loaded settings and questions.
+        A tuple containing the loaded settings and the questions drawn for this quiz (see `draw_questions`).
     '''
 
-    CONFIG_FILE_PATH = "data/config.json"
+    settings:Config = load_startup_files()
+    return settings, draw_questions(settings)
 
-    settings:Config = load_config_file(CONFIG_FILE_PATH)
-    questions:list[Question] = load_questions_file(settings.get_question_file_path)
-    load_data_class(settings.get_display_text_file_path, DisplayText)
-    load_data_class(settings.get_prompt_file_path, Prompts)
+def draw_questions(settings:Config) -> list[Question]:
+    '''
+    Draw the questions for a quiz.
+
+    Will abend if the question file can't be loaded properly.
+
+    Parameters:
+        settings : Config
+            The loaded config settings. The number of questions is reduced if there aren't enough questions, or set to the number drawn if category quotas are configured.
+
+    Returns:
+        The (randomly ordered) questions drawn for this quiz. If the question file is a sharded question bank, only the shards that questions are drawn from are read (see `question_shards.ShardedBank`), using any category quotas. Otherwise, if a compiled question file is configured, the questions are a lazy `QuestionSelection` that decodes each question when it is reached. If a target difficulty is configured, questions near it are more likely to be drawn (see `question_stats.QuestionSelector`), except from sharded question banks.
+    '''
+    if os.path.isdir(settings.get_question_file_path):
+        bank = question_shards.open_sharded_bank(settings.get_question_file_path)
+        try:
+            questions:list[Question] = bank.sample(settings.get_number_of_questions, settings.get_category_quotas, settings.get_question_seed)
+        except FileNotFoundError:
+            abend(ErrorMessages.FILE_NOT_FOUND.format(os.path.abspath(settings.get_question_file_path)))
+        except ValueError:
+            abend(ErrorMessages.FILE_CORRUPTED.format(os.path.abspath(settings.get_question_file_path)))
+
+        # The quotas may not match any categories in the bank.
+        if len(questions) == 0:
+            abend(ErrorMessages.FILE_INCOMPLETE.format(os.path.abspath(settings.get_question_file_path)))
+        # No more than `number_of_questions` are drawn without quotas, so this only ever reduces it in that case.
+        settings.set_number_of_questions = len(questions)
+        return questions
+
+    stats = None
+    if settings.get_target_difficulty is not None and settings.get_question_stats_path is not None:
+        stats = question_stats.load_question_stats(settings.get_question_stats_path)
+
+    if settings.get_compiled_question_file_path is None:
+        weight = None if stats is None else question_stats.question_weights(stats, settings.get_target_difficulty)
+        questions = sample_questions_file(settings.get_question_file_path, settings.get_number_of_questions, settings.get_question_seed, weight)
+    else:
+        bank = compiled_bank.open_compiled_bank(settings.get_question_file_path, settings.get_compiled_question_file_path)
+        if stats is None:
+            questions = bank.sample(settings.get_number_of_questions, settings.get_question_seed)
+        else:
+            selector = question_stats.QuestionSelector(bank.get_keys, stats, settings.get_target_difficulty)
+            questions = bank.select(selector.sample(settings.get_number_of_questions, random.Random(settings.get_question_seed)))
 
     # Ensure number of questions doesn't exceed number of available questions.
     settings.set_number_of_questions = min(len(questions), settings.get_number_of_questions)
 
-    return settings, questions
+    return questions
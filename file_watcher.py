@@ -0,0 +1,108 @@
+import hashlib
+import os
+
+import bundle as bundles
+import compiled_bank
+import question_shards
+from profiling import profiler
+
+def path_fingerprint(path:str) -> tuple|None:
+    '''
+    Parameters:
+        path : str
+            The path to a file, or to a sharded question bank (a directory of shards).
+
+    Returns:
+        The file's modification time and size (or the name, modification time and size of every shard), which change whenever it is written to, or `None` if it does not exist.
+    '''
+    try:
+        if os.path.isdir(path):
+            return tuple((file_name, *bundles.fingerprint(os.path.join(path, file_name))) for file_name in question_shards.list_shards(path))
+        return bundles.fingerprint(path)
+    except FileNotFoundError:
+        return None
+
+def path_digest(path:str) -> bytes|None:
+    '''
+    Parameters:
+        path : str
+            The path to a file, or to a sharded question bank.
+
+    Returns:
+        The SHA-256 digest of the file's contents (or of the name and digest of every shard), or `None` if it does not exist.
+    '''
+    try:
+        if os.path.isdir(path):
+            digest = hashlib.sha256()
+            for file_name in question_shards.list_shards(path):
+                digest.update(file_name.encode('utf-8') + b'\0' + compiled_bank.hash_file(os.path.join(path, file_name)))
+            return digest.digest()
+        return compiled_bank.hash_file(path)
+    except FileNotFoundError:
+        return None
+
+class FileWatcher:
+    '''
+    Watches files for changes by polling their modification times and sizes (with `stat`, so it works on any file system).
+
+    A change is debounced: it is only reported once the file has stayed the same for a whole poll, so a file that is still being written isn't reloaded half-written, and a burst of writes is reloaded once. A file whose modification time changes without its contents changing (e.g. it was saved without any edits) is never reported.
+
+    Polling does blocking file I/O, so it should be done off the event loop.
+
+    Attributes:
+        __paths : list[str]
+            The files (or sharded question banks) being watched.
+        __loaded : dict[str, tuple | None]
+            The fingerprint (see `path_fingerprint`) of each file as it was last loaded.
+        __digests : dict[str, bytes | None]
+            The digest (see `path_digest`) of each file as it was last loaded, or `None` if it isn't known yet (it is worked out on the first poll, so that watching a large file doesn't slow down starting up).
+        __pending : dict[str, tuple | None]
+            The new fingerprint of each file that has changed, waiting to stay the same for a whole poll.
+    '''
+
+    def __init__(self, paths:list[str]):
+        self.__paths = list(dict.fromkeys(paths))
+        self.__loaded = {path : path_fingerprint(path) for path in self.__paths}
+        self.__digests:dict[str, bytes|None] = {path : None for path in self.__paths}
+        self.__pending:dict[str, tuple|None] = {}
+
+    @property
+    def get_paths(self) -> list[str]:
+        return self.__paths
+
+    @profiler.timed('watcher.poll')
+    def poll(self) -> list[str]:
+        '''
+        Check every file for changes.
+
+        Returns:
+            The files whose contents have changed since they were last loaded, and have stayed the same since the last poll. They are assumed to be reloaded: each change is only reported once.
+        '''
+        changed:list[str] = []
+        for path in self.__paths:
+            fingerprint = path_fingerprint(path)
+
+            if fingerprint == self.__loaded[path]:
+                self.__pending.pop(path, None)
+                if self.__digests[path] is None and fingerprint is not None:
+                    digest = path_digest(path)
+                    # Only trust the digest if the file didn't change while it was hashed.
+                    if path_fingerprint(path) == fingerprint:
+                        self.__digests[path] = digest
+                continue
+
+            if path not in self.__pending or self.__pending[path] != fingerprint:
+                # Changed since the last poll (so it may still be being written): wait for it to settle.
+                self.__pending[path] = fingerprint
+                continue
+
+            del self.__pending[path]
+            self.__loaded[path] = fingerprint
+            digest = path_digest(path)
+            if digest is not None and digest == self.__digests[path]:
+                # Touched, but not changed.
+                continue
+            self.__digests[path] = digest
+            changed.append(path)
+
+        return changed
@@ -1,9 +1,24 @@
-from random import shuffle
+import argparse
+import asyncio
+import datetime
+import os
 import file_handling as files
+import compiled_bank
+import score_store
+import sessions
+import regrade
+import question_stats
+import schema
+from duplicates import DuplicateFinder
+from question import question_key
+from checkpoint import Checkpoint, CheckpointState, load_checkpoint
+from server import QuizServer
 from scores import save_and_view_scores
 from quiz import Quiz
+from profiling import profiler
 from display_text import DisplayText
 from prompts import Prompts
+from error_handling import *
 
 def get_user_name() -> str:
     '''
@@ -19,19 +34,253 @@ def get_user_name() -> str:
         elif len(name.strip()) > 0:
             return name
 
-#---------------#
-# PROGRAM START #
-#---------------#
+def parse_arguments() -> argparse.Namespace:
+    '''
+    Parse the command-line arguments.
+
+    Returns:
+        The parsed arguments. `command` is `None` when the quiz should be run.
+    '''
+    parser = argparse.ArgumentParser(description='Run the quiz.')
+    parser.add_argument('--profile', nargs='?', const='profile.json', metavar='REPORT', help='Time loading and each phase of the quiz, and write a JSON report (to "profile.json" if no path is given) when the program ends. Can also be turned on with `profile_report_path` in the config file.')
+    parser.add_argument('--profile-calls', action='store_true', help='Also profile every function call (with cProfile) for the report. Slows the program down.')
+    parser.add_argument('--profile-memory', action='store_true', help='Also trace memory allocations (with tracemalloc) for the report. Slows the program down.')
+    parser.add_argument('--resume', action='store_true', help='Resume the quiz that was interrupted last time (see `checkpoint_path` in the config file), instead of starting a new one.')
+    commands = parser.add_subparsers(dest='command')
+
+    compile_bank = commands.add_parser('compile-bank', help='Compile the question file into the binary bank format.')
+    compile_bank.add_argument('output', nargs='?', help='Where to write the compiled bank (defaults to `compiled_question_file_path` in the config file, or the question file path with a ".qbank" extension).')
 
-settings, questions = files.load_essential_files()
+    regrade = commands.add_parser('regrade', help='Re-grade every saved session in the session log against the current question file.')
+    regrade.add_argument('--session-log', help='The session log to re-grade (defaults to `session_log_path` in the config file).')
+    regrade.add_argument('--workers', type=int, help='The number of worker processes (defaults to one per CPU).')
+    regrade.add_argument('--chunk-size', type=int, default=1000, help='The number of sessions sent to a worker at a time.')
+    regrade.add_argument('--batch-size', type=int, default=10000, help='The number of new scores saved at a time.')
 
-print(DisplayText.WELCOME)
-name = get_user_name()
+    serve = commands.add_parser('serve', help='Host quizzes for many players over TCP (line-based JSON).')
+    serve.add_argument('--host', default='127.0.0.1', help='The address to listen on.')
+    serve.add_argument('--port', type=int, default=8023, help='The port to listen on.')
 
-shuffle(questions)
-quiz = Quiz(questions[:settings.get_number_of_questions], settings.get_multiple_choice, settings.get_select_using_index, settings.get_number_of_attempts)
-quiz.start()
+    return parser.parse_args()
+
+def start_profiling(arguments:argparse.Namespace):
+    '''
+    Start profiling if it was asked for on the command line.
+
+    Parameters:
+        arguments : argparse.Namespace
+            The parsed arguments.
+    '''
+    if arguments.profile is not None or arguments.profile_calls or arguments.profile_memory:
+        profiler.enable(arguments.profile or 'profile.json', arguments.profile_calls, arguments.profile_memory)
+
+def start_configured_profiling(settings):
+    '''
+    Start profiling if it was turned on in the config file (and wasn't already on the command line).
+
+    Parameters:
+        settings : Config
+            The loaded config settings.
+    '''
+    if settings.get_profile_report_path is not None:
+        profiler.enable(settings.get_profile_report_path)
+
+def run_compile_bank(output:str|None):
+    '''
+    Compile the configured question file into the binary bank format, leaving out exact duplicate questions and listing any conflicting copies and near duplicates for someone to check.
+
+    Parameters:
+        output : str | None
+            Where to write the compiled bank. `None` to use the configured path.
+    '''
+    settings = files.load_config_file(files.CONFIG_FILE_PATH)
+    start_configured_profiling(settings)
+    if output is None:
+        output = settings.get_compiled_question_file_path
+    if output is None:
+        output = os.path.splitext(settings.get_question_file_path)[0] + '.qbank'
+
+    duplicates = DuplicateFinder()
+    try:
+        count = compiled_bank.compile_bank(settings.get_question_file_path, output, duplicates)
+    except compiled_bank.CompileFailedError as error:
+        abend(ErrorMessages.COMPILE_FAILED.format(os.path.abspath(output), error.args[1]))
+    except FileNotFoundError:
+        abend(ErrorMessages.FILE_NOT_FOUND.format(os.path.abspath(settings.get_question_file_path)))
+    except schema.SchemaError as error:
+        abend(schema.describe_problems(settings.get_question_file_path, list(error.args)))
+    except ValueError:
+        abend(ErrorMessages.FILE_CORRUPTED.format(os.path.abspath(settings.get_question_file_path)))
+    print(f'Compiled {count} questions to "{output}".')
+
+    if len(duplicates.get_exact_duplicates) > 0:
+        print(f'Left out {len(duplicates.get_exact_duplicates)} exact duplicate questions.')
+    conflicts = duplicates.get_conflicts
+    if len(conflicts) > 0:
+        print(f'Found {len(conflicts)} questions with the same text as an earlier question, but a different answer, answer options or aliases (both were kept):')
+        for index, original in conflicts[:schema.MAX_LISTED_PROBLEMS]:
+            print(f'Question {index + 1} conflicts with question {original + 1}.')
+        if len(conflicts) > schema.MAX_LISTED_PROBLEMS:
+            print(ErrorMessages.MORE_PROBLEMS.format(len(conflicts) - schema.MAX_LISTED_PROBLEMS))
+    near_duplicates = duplicates.get_near_duplicates
+    if len(near_duplicates) > 0:
+        print(f'Found {len(near_duplicates)} near duplicate questions:')
+        for index, original, similarity in near_duplicates[:schema.MAX_LISTED_PROBLEMS]:
+            print(f'Question {index + 1} is {similarity:.0%} similar to question {original + 1}.')
+        if len(near_duplicates) > schema.MAX_LISTED_PROBLEMS:
+            print(ErrorMessages.MORE_PROBLEMS.format(len(near_duplicates) - schema.MAX_LISTED_PROBLEMS))
+
+def open_score_store(settings) -> score_store.ScoreStore:
+    '''
+    Open the configured score store.
+
+    Will abend if the configured score backend doesn't exist.
+
+    Parameters:
+        settings : Config
+            The loaded config settings.
+
+    Returns:
+        The opened store.
+    '''
+    try:
+        return score_store.open_score_store(settings.get_score_backend, settings.get_score_file_path, settings.get_score_database_path, settings.get_score_journal_compaction_size, settings.get_score_history_path)
+    except ValueError:
+        abend(ErrorMessages.FILE_CORRUPTED.format(os.path.abspath(files.CONFIG_FILE_PATH)))
+
+def run_regrade(arguments:argparse.Namespace):
+    '''
+    Re-grade every saved session in the session log against the current question file, and report the throughput.
+
+    Parameters:
+        arguments : argparse.Namespace
+            The parsed `regrade` arguments.
+    '''
+    settings = files.load_config_file(files.CONFIG_FILE_PATH)
+    start_configured_profiling(settings)
+    session_log_path = arguments.session_log or settings.get_session_log_path
+    if session_log_path is None:
+        abend(ErrorMessages.FILE_INCOMPLETE.format(os.path.abspath(files.CONFIG_FILE_PATH)))
+
+    store = open_score_store(settings)
+    try:
+        sessions_read, scores_saved, seconds = regrade.regrade(session_log_path, settings.get_question_file_path, store, arguments.workers, arguments.chunk_size, arguments.batch_size)
+    except FileNotFoundError as error:
+        abend(ErrorMessages.FILE_NOT_FOUND.format(os.path.abspath(error.filename)))
+    except schema.SchemaError as error:
+        abend(schema.describe_problems(settings.get_question_file_path, list(error.args)))
+    except ValueError:
+        abend(ErrorMessages.FILE_CORRUPTED.format(os.path.abspath(settings.get_question_file_path)))
+    finally:
+        store.close()
+
+    print(f'Re-graded {sessions_read} sessions ({scores_saved} scores saved) in {seconds:.2f}s: {sessions_read / max(seconds, 1e-9):.0f} sessions/s.')
+
+def run_server(host:str, port:int):
+    '''
+    Load the question bank and text tables once, then host quizzes until interrupted.
+
+    Parameters:
+        host : str
+            The address to listen on.
+        port : int
+            The port to listen on.
+    '''
+    settings = files.load_startup_files()
+    start_configured_profiling(settings)
+    bank = files.load_question_bank(settings)
+
+    try:
+        asyncio.run(QuizServer(settings, bank).serve(host, port))
+    except KeyboardInterrupt:
+        pass
+
+def load_interrupted_quiz(settings) -> CheckpointState|None:
+    '''
+    Load the checkpoint of the quiz that was interrupted last time.
+
+    Parameters:
+        settings : Config
+            The loaded config settings.
+
+    Returns:
+        The interrupted quiz, or `None` if there isn't one (or its checkpoint is corrupted).
+    '''
+    if settings.get_checkpoint_path is None:
+        return None
+    try:
+        return load_checkpoint(settings.get_checkpoint_path)
+    except ValueError:
+        print(ErrorMessages.FILE_CORRUPTED.format(os.path.abspath(settings.get_checkpoint_path)))
+        return None
+
+def run_quiz(resume:bool = False):
+    '''
+    Run the quiz for one player, then let them save and view their scores.
+
+    Parameters:
+        resume : bool
+            Whether to resume the quiz that was interrupted last time (if there is one) rather than start a new one.
+    '''
+    settings = files.load_startup_files()
+    start_configured_profiling(settings)
+    interrupted = load_interrupted_quiz(settings) if resume else None
+    checkpoint = None if settings.get_checkpoint_path is None else Checkpoint(settings.get_checkpoint_path)
+
+    print(DisplayText.WELCOME)
+    if interrupted is None:
+        if resume:
+            print(DisplayText.NO_QUIZ_TO_RESUME)
+        questions = files.draw_questions(settings)
+        name = get_user_name()
+        quiz = Quiz(questions, settings.get_multiple_choice, settings.get_select_using_index, settings.get_number_of_attempts, settings.get_max_typo_distance, checkpoint)
+        if checkpoint is not None:
+            checkpoint.start(name, quiz.get_engine, questions)
+    else:
+        # The quiz carries on with the rules it was started with.
+        name = interrupted.get_name
+        engine = interrupted.get_engine
+        quiz = Quiz(interrupted.get_questions, engine.get_multiple_choice, engine.get_select_using_index, engine.get_max_number_of_attempts, engine.get_max_typo_distance, checkpoint)
+        quiz.restore(interrupted.get_answered)
+        checkpoint.resume()
+        print(DisplayText.RESUMING_QUIZ.format(name, len(interrupted.get_answered), len(interrupted.get_questions)))
+
+    quiz.start()
+
+    time_stamp = DisplayText.TIME_STAMP.format(datetime.datetime.now())
+    store = open_score_store(settings)
+    try:
+        saved = save_and_view_scores(name, store, quiz.get_final_score, settings.get_score_table_size, time_stamp)
+    finally:
+        store.close()
+
+    # The quiz is over (and its score saved), so there is nothing left to resume.
+    if checkpoint is not None:
+        checkpoint.discard()
+
+    if settings.get_session_log_path is not None:
+        sessions.append_session(settings.get_session_log_path, name, time_stamp, saved, quiz.get_engine, quiz.get_answer_log)
+
+    if settings.get_question_stats_path is not None:
+        question_stats.record_question_outcomes(settings.get_question_stats_path, [(question_key(question.get_question), question_stats.attempts_used(points, correct, quiz.get_engine.get_max_number_of_attempts), correct) for question, points, correct in quiz.get_outcomes])
+
+    print(DisplayText.GOODBYE)
+
+#---------------#
+# PROGRAM START #
+#---------------#
 
-save_and_view_scores(name, settings.get_score_file_path, quiz.get_final_score)
+arguments = parse_arguments()
+start_profiling(arguments)
 
-print(DisplayText.GOODBYE)
+try:
+    if arguments.command == 'compile-bank':
+        run_compile_bank(arguments.output)
+    elif arguments.command == 'regrade':
+        run_regrade(arguments)
+    elif arguments.command == 'serve':
+        run_server(arguments.host, arguments.port)
+    else:
+        run_quiz(arguments.resume)
+finally:
+    profiler.finish()
@@ -0,0 +1,215 @@
+import json
+import marshal
+import os
+import re as regex
+from concurrent.futures import ProcessPoolExecutor, wait
+from multiprocessing import resource_tracker, shared_memory
+
+import schema
+from question import Question, QuestionPool, question_from_json
+from profiling import profiler
+
+# Question files smaller than this are parsed in one process: starting the workers would take longer than they save.
+MIN_PARALLEL_FILE_SIZE = 4 << 20
+# Each worker is given this many chunks on average, so that a slow chunk doesn't leave the other workers idle.
+CHUNKS_PER_WORKER = 4
+# The end of one question and the start of the next (see `find_chunk_starts` for when it isn't).
+QUESTION_BOUNDARY = regex.compile(rb'\}\s*,\s*\{')
+# The start of the question file, up to the start of its first question.
+ARRAY_START = regex.compile(rb'\s*\[\s*\{')
+# The number of bytes to read at a time when looking for the start of a chunk.
+SEARCH_SIZE = 1 << 16
+
+def find_chunk_starts(file_path:str, number_of_chunks:int) -> list[int]|None:
+    '''
+    Split a question file into chunks of about the same size, each starting at the start of a question, without parsing it.
+
+    The start of a question is found by looking for `}, {` after where the chunk would ideally start. That can also appear inside a string, so the chunk starts aren't trusted until every chunk has been parsed: each chunk is parsed from a question's start (the first chunk's is the start of the array), so if it parses, it ends where the next question starts, and the next chunk really does start at the start of a question.
+
+    Parameters:
+        file_path : str
+            The path to the question file.
+        number_of_chunks : int
+            The number of chunks to split the file into. There may be fewer, if the questions are large.
+
+    Raises:
+        FileNotFoundError
+            If the question file does not exist.
+
+    Returns:
+        The position (in bytes) of the start of each chunk, in order, or `None` if the file doesn't start like an array of objects.
+    '''
+    size = os.path.getsize(file_path)
+    file = open(file_path, 'rb')
+    try:
+        match = ARRAY_START.match(file.read(SEARCH_SIZE))
+        if match is None:
+            return None
+        starts = [match.end() - 1]
+
+        for chunk in range(1, number_of_chunks):
+            position = max(size * chunk // number_of_chunks, starts[-1] + 1)
+            file.seek(position)
+            window = b''
+            while True:
+                data = file.read(SEARCH_SIZE)
+                if len(data) == 0:
+                    return starts
+                # Search the end of the last read again, in case a boundary spans the two reads.
+                search_from = max(0, len(window) - SEARCH_SIZE)
+                window += data
+                match = QUESTION_BOUNDARY.search(window, search_from)
+                if match is not None:
+                    starts.append(position + match.end() - 1)
+                    break
+    finally:
+        file.close()
+    return starts
+
+def parse_chunk(file_path:str, start:int, end:int|None, validate:bool) -> tuple[str, int]|None:
+    '''
+    Parse (and check) the questions in a chunk of a question file (in a worker process), and leave them in shared memory for the parent process to read, as `marshal`led tuples of each question's parts (see `read_chunk`).
+
+    Each question's parts are built the same way as the parent process would build them (with `question_from_json`), so the parent only has to copy them into `Question`s, without normalising any answers.
+
+    Parameters:
+        file_path : str
+            The path to the question file.
+        start : int
+            The position (in bytes) of the first question in the chunk.
+        end : int | None
+            The position (in bytes) of the first question in the next chunk. `None` for the last chunk.
+        validate : bool
+            Whether to check every question against `schema.QUESTION_SCHEMA`.
+
+    Returns:
+        The name and size of the shared memory the questions are in, or `None` if the chunk couldn't be parsed, or any of its questions are invalid.
+    '''
+    file = open(file_path, 'rb')
+    try:
+        file.seek(start)
+        contents = file.read() if end is None else file.read(end - start)
+    finally:
+        file.close()
+
+    if end is None:
+        contents = b'[' + contents
+    else:
+        contents = contents.rstrip()
+        if not contents.endswith(b','):
+            return None
+        contents = b'[' + contents[:-1] + b']'
+    try:
+        elements = json.loads(contents)
+    except ValueError:
+        return None
+
+    if validate:
+        for index, question in enumerate(elements):
+            if len(schema.QUESTION_SCHEMA.check_element(question, index)) > 0:
+                return None
+
+    # Sharing repeated strings within the chunk also makes `marshal` store them once.
+    pool = QuestionPool()
+    questions = [question_from_json(question, pool) for question in elements]
+    contents = marshal.dumps([(question.get_question, question.get_answer, question.get_answer_options, question.get_aliases, question.get_accepted_answers) for question in questions])
+
+    memory = shared_memory.SharedMemory(create=True, size=max(1, len(contents)))
+    memory.buf[:len(contents)] = contents
+    memory.close()
+    return memory.name, len(contents)
+
+def read_chunk(name:str, size:int) -> list[tuple]:
+    '''
+    Read a chunk's questions from shared memory (see `parse_chunk`), and free it.
+
+    Parameters:
+        name : str
+            The name of the shared memory.
+        size : int
+            The number of bytes in it used.
+
+    Returns:
+        The question, answer, answer options, aliases and accepted answers of each question in the chunk.
+    '''
+    memory = shared_memory.SharedMemory(name=name)
+    try:
+        with memory.buf[:size] as contents:
+            return marshal.loads(contents)
+    finally:
+        memory.close()
+        memory.unlink()
+
+def discard_chunk(name:str):
+    '''
+    Free the shared memory of a chunk that won't be read.
+
+    Parameters:
+        name : str
+            The name of the shared memory.
+    '''
+    try:
+        memory = shared_memory.SharedMemory(name=name)
+    except FileNotFoundError:
+        return
+    memory.close()
+    memory.unlink()
+
+@profiler.timed('questions.load_parallel')
+def load_questions(file_path:str, workers:int, validate:bool) -> list[Question]|None:
+    '''
+    Load every question in a question file, parsing it in chunks in a pool of worker processes (see `parse_chunk`).
+
+    The questions are the same, in the same order, as loading the file in one process would give. If the file is small, or can't be parsed or checked in chunks (e.g. it is corrupted, has invalid questions, or a question contains `}, {` just where a chunk would start), `None` is returned so that it can be loaded in one process instead, which finds any problems with the file the same way it always has.
+
+    Parameters:
+        file_path : str
+            The path to the question file.
+        workers : int
+            The number of worker processes.
+        validate : bool
+            Whether to check every question against `schema.QUESTION_SCHEMA`.
+
+    Raises:
+        FileNotFoundError
+            If the question file does not exist.
+
+    Returns:
+        Every question in the file, sharing their repeated parts through one `QuestionPool`, or `None` if the file should be loaded in one process.
+
+    Calls:
+        parse_chunk
+    '''
+    if os.path.getsize(file_path) < MIN_PARALLEL_FILE_SIZE:
+        return None
+    starts = find_chunk_starts(file_path, workers * CHUNKS_PER_WORKER)
+    if starts is None:
+        return None
+
+    # The workers share this process's resource tracker, which only frees the chunks' shared memory if this process exits without unlinking it, rather than whenever a worker exits.
+    resource_tracker.ensure_running()
+    executor = ProcessPoolExecutor(workers)
+    try:
+        futures = [executor.submit(parse_chunk, file_path, start, end, validate) for start, end in zip(starts, [*starts[1:], None])]
+        # Wait for every chunk, so that none of their shared memory is left behind if any of them fail.
+        wait(futures)
+    finally:
+        executor.shutdown(cancel_futures=True)
+    results = [future.result() if not future.cancelled() and future.exception() is None else None for future in futures]
+
+    unread = [result for result in results if result is not None]
+    try:
+        if len(unread) < len(results):
+            return None
+        pool = QuestionPool()
+        questions:list[Question] = []
+        while len(unread) > 0:
+            name, size = unread.pop(0)
+            questions.extend([Question(question, answer, answer_options, aliases, pool, accepted_answers) for question, answer, answer_options, aliases, accepted_answers in read_chunk(name, size)])
+    finally:
+        for name, _ in unread:
+            discard_chunk(name)
+
+    profiler.count('question_chunks', len(results))
+    profiler.count('questions_created', len(questions))
+    return questions
@@ -0,0 +1,184 @@
+import cProfile
+import datetime
+import functools
+import json
+import os
+import pstats
+import time
+import tracemalloc
+from contextlib import contextmanager
+
+class Profiler:
+    '''
+    Collects timing spans and counters from the loaders and quiz phases, and optionally a `cProfile` and `tracemalloc` capture, for a machine-readable report.
+
+    While disabled (the default), spans and counters cost one attribute check each.
+
+    Attributes:
+        __enabled : bool
+            Whether anything is being collected.
+        __report_path : str | None
+            Where `finish` writes the report.
+        __started : float
+            When collection started (`time.perf_counter`).
+        __spans : dict[str, dict[str, float]]
+            The number of times each span ran, and its total and longest durations in seconds, keyed by span name.
+        __counters : dict[str, int]
+            Counters (e.g. bytes read), keyed by name.
+        __python_profile : cProfile.Profile | None
+            The `cProfile` capture, if one was requested.
+        __memory : bool
+            Whether `tracemalloc` is capturing allocations.
+    '''
+
+    def __init__(self):
+        self.__enabled = False
+        self.__report_path:str|None = None
+        self.__started = 0.0
+        self.__spans:dict[str, dict[str, float]] = {}
+        self.__counters:dict[str, int] = {}
+        self.__python_profile:cProfile.Profile|None = None
+        self.__memory = False
+
+    @property
+    def get_enabled(self) -> bool:
+        return self.__enabled
+
+    def enable(self, report_path:str, python_profile:bool = False, memory:bool = False):
+        '''
+        Start collecting.
+
+        Parameters:
+            report_path : str
+                Where `finish` writes the report. Ignored if the profiler was already enabled with a report path.
+            python_profile : bool
+                Whether to capture a `cProfile` profile of every function call.
+            memory : bool
+                Whether to capture memory allocations with `tracemalloc`.
+        '''
+        if not self.__enabled:
+            self.__enabled = True
+            self.__started = time.perf_counter()
+        if self.__report_path is None:
+            self.__report_path = report_path
+        if python_profile and self.__python_profile is None:
+            self.__python_profile = cProfile.Profile()
+            self.__python_profile.enable()
+        if memory and not self.__memory:
+            self.__memory = True
+            tracemalloc.start()
+
+    @contextmanager
+    def span(self, name:str):
+        '''
+        Time the body of a `with` statement.
+
+        Parameters:
+            name : str
+                The name to record the time under. Spans with the same name are added together.
+        '''
+        if not self.__enabled:
+            yield
+            return
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            duration = time.perf_counter() - start
+            totals = self.__spans.setdefault(name, {'count' : 0, 'total_seconds' : 0.0, 'max_seconds' : 0.0})
+            totals['count'] += 1
+            totals['total_seconds'] += duration
+            totals['max_seconds'] = max(totals['max_seconds'], duration)
+
+    def timed(self, name:str):
+        '''
+        A decorator that times every call of a function as a span (see `span`).
+
+        Parameters:
+            name : str
+                The name to record the time under.
+        '''
+        def decorator(function):
+            @functools.wraps(function)
+            def wrapper(*args, **kwargs):
+                if not self.__enabled:
+                    return function(*args, **kwargs)
+                with self.span(name):
+                    return function(*args, **kwargs)
+            return wrapper
+        return decorator
+
+    def count(self, name:str, amount:int = 1):
+        '''
+        Add to a counter.
+
+        Parameters:
+            name : str
+                The counter's name.
+            amount : int
+                How much to add.
+        '''
+        if self.__enabled:
+            self.__counters[name] = self.__counters.get(name, 0) + amount
+
+    def report(self, top:int = 30) -> dict:
+        '''
+        Parameters:
+            top : int
+                The number of functions (by cumulative time) and allocation sites (by size) to include from the `cProfile` and `tracemalloc` captures.
+
+        Returns:
+            Everything collected so far, as JSON-serialisable values.
+        '''
+        report = {
+            'generated_at' : datetime.datetime.now().isoformat(timespec='seconds')
+            ,'pid' : os.getpid()
+            ,'wall_seconds' : time.perf_counter() - self.__started if self.__enabled else 0.0
+            ,'spans' : self.__spans
+            ,'counters' : self.__counters
+        }
+
+        if self.__python_profile is not None:
+            self.__python_profile.disable()
+            stats = pstats.Stats(self.__python_profile)
+            functions = []
+            for (file_name, line, function_name), (_, calls, total_time, cumulative_time, _) in stats.stats.items():
+                functions.append({'function' : f'{file_name}:{line}({function_name})', 'calls' : calls, 'total_seconds' : total_time, 'cumulative_seconds' : cumulative_time})
+            functions.sort(key=lambda function: function['cumulative_seconds'], reverse=True)
+            report['python_profile'] = functions[:top]
+            self.__python_profile.enable()
+
+        if self.__memory:
+            current, peak = tracemalloc.get_traced_memory()
+            snapshot = tracemalloc.take_snapshot()
+            report['memory'] = {
+                'current_bytes' : current
+                ,'peak_bytes' : peak
+                ,'top_allocations' : [{'location' : str(statistic.traceback), 'bytes' : statistic.size, 'blocks' : statistic.count} for statistic in snapshot.statistics('lineno')[:top]]
+            }
+
+        return report
+
+    def write_report(self, report_path:str):
+        '''
+        Write the report (see `report`) to a JSON file.
+
+        Parameters:
+            report_path : str
+                The path to write the report to.
+        '''
+        file = open(report_path, 'w')
+        try:
+            json.dump(self.report(), file, indent=4)
+        finally:
+            file.close()
+
+    def finish(self):
+        '''
+        Write the report to the report path given to `enable`, if the profiler is enabled.
+        '''
+        if self.__enabled and self.__report_path is not None:
+            self.write_report(self.__report_path)
+
+# The profiler shared by every module.
+profiler = Profiler()
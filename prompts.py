@@ -1,4 +1,6 @@
-class Prompts:
+from text_table import TextTable
+
+class Prompts(metaclass=TextTable):
     '''
     A class containing all prompts.
 
@@ -30,6 +32,10 @@ class Prompts:
             1. The valid options.
         YES_OR_NO : str
             Prompt the user to enter "Y" or "N".
+        MORE_SCORES : str
+            Ask the user whether they want to see the next page of scores.
+        VIEW_LEADERBOARD : str
+            Ask the user whether they want to view the best scores from all users.
     '''
 
     NAME : str
@@ -41,14 +47,5 @@ class Prompts:
     VALID_INDEX : str
     VALID_OPTION : str
     YES_OR_NO : str
-
-    def set_values(self, name:str, answer_typed:str, answer_by_index:str, save_score:str, view_scores:str, overwrite_corrupted_scores:str, valid_index:str, valid_option:str, yes_or_no:str):
-        self.NAME = name
-        self.ANSWER_TYPED = answer_typed
-        self.ANSWER_BY_INDEX = answer_by_index
-        self.SAVE_SCORE = save_score
-        self.VIEW_SCORES = view_scores
-        self.OVERWRITE_CORRUPTED_SCORES = overwrite_corrupted_scores
-        self.VALID_INDEX = valid_index
-        self.VALID_OPTION = valid_option
-        self.YES_OR_NO = yes_or_no
+    MORE_SCORES : str
+    VIEW_LEADERBOARD : str
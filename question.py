@@ -1,25 +1,185 @@
+import hashlib
+import re as regex
+import sys
+import unicodedata
+
+# Runs of anything other than letters and digits (punctuation, symbols, whitespace and underscores).
+SEPARATORS = regex.compile(r'[\W_]+')
+
+def question_key(question:str) -> int:
+    '''
+    Identify a question by its text, so that statistics about it (see `question_stats`) survive the question file being edited or reordered.
+
+    Parameters:
+        question : str
+            The question's text.
+
+    Returns:
+        A 64-bit hash of the question's text.
+    '''
+    return int.from_bytes(hashlib.blake2b(question.encode('utf-8'), digest_size=8).digest(), 'little')
+
+def normalise_answer(answer:str) -> str:
+    '''
+    Normalise an answer so that typed answers can be compared without worrying about case, Unicode forms, punctuation or spacing.
+
+    Parameters:
+        answer : str
+            The answer to normalise.
+
+    Returns:
+        The answer in NFKC form, case-folded, with every run of punctuation and whitespace collapsed to a single space.
+    '''
+    return SEPARATORS.sub(' ', unicodedata.normalize('NFKC', answer).casefold()).strip()
+
+def within_edit_distance(a:str, b:str, max_distance:int) -> bool:
+    '''
+    Check whether two strings are within `max_distance` single-character insertions, deletions or substitutions of each other.
+
+    Only the diagonal band of the edit-distance table that can stay within `max_distance` is calculated, and the check stops as soon as the whole band goes over it.
+
+    Parameters:
+        a : str
+        b : str
+        max_distance : int
+            The maximum number of edits.
+
+    Returns:
+        `True` if the Levenshtein distance between `a` and `b` is at most `max_distance`.
+        `False` otherwise.
+    '''
+    if abs(len(a) - len(b)) > max_distance:
+        return False
+    if a == b:
+        return True
+    if max_distance <= 0:
+        return False
+
+    over = max_distance + 1
+    previous = [j if j <= max_distance else over for j in range(len(b) + 1)]
+    for i in range(1, len(a) + 1):
+        start = max(1, i - max_distance)
+        end = min(len(b), i + max_distance)
+        current = [over] * (len(b) + 1)
+        current[0] = i if i <= max_distance else over
+        best = current[0]
+        for j in range(start, end + 1):
+            cost = 0 if a[i - 1] == b[j - 1] else 1
+            distance = min(previous[j - 1] + cost, previous[j] + 1, current[j - 1] + 1, over)
+            current[j] = distance
+            best = min(best, distance)
+        if best > max_distance:
+            return False
+        previous = current
+
+    return previous[len(b)] <= max_distance
+
+class QuestionPool:
+    '''
+    Shares the parts of questions that repeat across a question bank, so that a bank merged from several question files, which repeats the same answer options thousands of times, stores each distinct answer option (and normalises each distinct answer) once.
+
+    A pool only needs to live as long as the bank is being loaded: the questions keep the shared parts alive.
+
+    Attributes:
+        __strings : dict[str, str]
+            Every distinct answer, answer option and alias, keyed by itself.
+        __accepted_answers : dict[str | tuple[str, tuple[str, ...]], frozenset[str]]
+            The normalised forms (see `normalise_answer`) of every distinct answer and its aliases, so that each is only normalised once.
+    '''
+
+    __slots__ = ('__strings', '__accepted_answers')
+
+    def __init__(self):
+        self.__strings:dict[str, str] = {}
+        self.__accepted_answers:dict[str|tuple[str, tuple[str, ...]], frozenset[str]] = {}
+
+    def __len__(self) -> int:
+        return len(self.__strings)
+
+    def intern(self, text:str) -> str:
+        '''
+        Parameters:
+            text : str
+                An answer, answer option or alias.
+
+        Returns:
+            The pool's copy of the text.
+        '''
+        return self.__strings.setdefault(text, text)
+
+    def answer_options(self, answer_options:list[str]) -> tuple[str, ...]:
+        '''
+        Parameters:
+            answer_options : list[str]
+                A question's answer options.
+
+        Returns:
+            The answer options, as the pool's copies.
+        '''
+        strings = self.__strings
+        return tuple([strings.setdefault(answer_option, answer_option) for answer_option in answer_options])
+
+    def accepted_answers(self, answer:str, aliases:tuple[str, ...], accepted_answers:frozenset[str]|None = None) -> frozenset[str]:
+        '''
+        Parameters:
+            answer : str
+                A question's answer.
+            aliases : tuple[str, ...]
+                Its aliases.
+            accepted_answers : frozenset[str] | None
+                Their normalised forms, if they have already been worked out.
+
+        Returns:
+            The normalised forms (see `normalise_answer`) of the answer and its aliases.
+        '''
+        # Most questions have no aliases, and a string is cheaper to hash than a tuple.
+        key = (answer, aliases) if len(aliases) > 0 else answer
+        shared = self.__accepted_answers.get(key)
+        if shared is None:
+            if accepted_answers is None:
+                accepted_answers = frozenset(normalise_answer(accepted) for accepted in (answer, *aliases))
+            shared = self.__accepted_answers[key] = accepted_answers
+        return shared
+
 class Question:
     '''
     A class to store details of a question.
 
+    Questions are immutable (and have no per-instance `__dict__`), so one loaded bank can be shared by any number of quizzes: each quiz shuffles its own order of the answer options rather than the question's. Answers and answer options are interned (in the bank's `QuestionPool`, if it was loaded with one), so answer options repeated across the bank are only stored once.
+
     Attributes:
         __question : str
             The question.
-        __answer_options : list[str]
+        __answer_options : tuple[str, ...]
             All the multiple-choice answers to the question (correct *and* incorrect).
         __answer : str
             The correct answer to the question.
+        __aliases : tuple[str, ...]
+            Other typed answers that are also accepted as correct.
+        __accepted_answers : frozenset[str]
+            The normalised forms (see `normalise_answer`) of the answer and its aliases, worked out once when the question is loaded (possibly by the worker process that parsed it, see `parallel_parsing`).
     '''
-    
-    def __init__(self, question:str, answer:str, answer_options:list[str]):
+
+    __slots__ = ('__question', '__answer', '__answer_options', '__aliases', '__accepted_answers')
+
+    def __init__(self, question:str, answer:str, answer_options:list[str], aliases:list[str]|None = None, pool:QuestionPool|None = None, accepted_answers:frozenset[str]|None = None):
         self.__question = question
-        self.__answer = answer
-        self.__answer_options = answer_options
-    
+        if pool is None:
+            self.__answer = sys.intern(answer)
+            self.__answer_options = tuple(sys.intern(answer_option) for answer_option in answer_options)
+            self.__aliases = () if aliases is None else tuple(aliases)
+            self.__accepted_answers = accepted_answers if accepted_answers is not None else frozenset(normalise_answer(accepted) for accepted in (answer, *self.__aliases))
+        else:
+            self.__answer = pool.intern(answer)
+            self.__answer_options = pool.answer_options(answer_options)
+            self.__aliases = () if aliases is None else tuple(pool.intern(alias) for alias in aliases)
+            self.__accepted_answers = pool.accepted_answers(self.__answer, self.__aliases, accepted_answers)
+
     def __str__(self):
         answer_options = '\n* '.join(self.__answer_options)
         return f'''Question: {self.__question}
 Answer: {self.__answer}
+Aliases: {', '.join(self.__aliases)}
 Answer Options:
 * {answer_options}'''
 
@@ -32,3 +192,45 @@ Answer Options:
     @property
     def get_answer_options(self):
         return self.__answer_options
+    @property
+    def get_aliases(self):
+        return self.__aliases
+    @property
+    def get_accepted_answers(self):
+        return self.__accepted_answers
+
+    def accepts(self, typed_answer:str, max_distance:int = 0) -> bool:
+        '''
+        Check whether a typed answer is correct.
+
+        Parameters:
+            typed_answer : str
+                The answer the user typed in.
+            max_distance : int
+                The number of typos (see `within_edit_distance`) to allow. 0 to only accept exact matches (after normalising).
+
+        Returns:
+            `True` if the normalised answer is the normalised correct answer or one of its aliases, or is within `max_distance` edits of one of them.
+            `False` otherwise.
+        '''
+        typed_answer = normalise_answer(typed_answer)
+        if typed_answer in self.__accepted_answers:
+            return True
+        if max_distance <= 0:
+            return False
+        return any(within_edit_distance(typed_answer, accepted, max_distance) for accepted in self.__accepted_answers)
+
+def question_from_json(values:dict, pool:QuestionPool|None = None) -> Question:
+    '''
+    Create a question from its entry in a question file, by key (so the order of the keys doesn't matter).
+
+    Parameters:
+        values : dict
+            The question as parsed from the question file. It should already have been checked against `schema.QUESTION_SCHEMA`.
+        pool : QuestionPool | None
+            The pool to share the question's parts with the rest of its bank through. `None` to only intern its answer and answer options.
+
+    Returns:
+        The question.
+    '''
+    return Question(values['question'], values['answer'], values['answer_options'], values.get('aliases'), pool)
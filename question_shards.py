@@ -0,0 +1,407 @@
+import bisect
+import json
+import os
+import random
+
+from error_handling import *
+from question import Question, question_from_json
+import file_handling as files
+import schema
+from profiling import profiler
+
+# A sharded question bank is a directory of question files ("shards"), each a JSON array in the same format as a
+# single question file. A shard's category is its file name up to the first ".", so "geography.json" and
+# "geography.2.json" are both geography shards. The directory's manifest lists every shard:
+#
+#   {"version": 2, "index_interval": 256, "shards": [
+#       {"file": "geography.json", "category": "geography", "count": 1234, "size": 567890, "mtime_ns": ..., "offsets": [...]}
+#   ]}
+#
+# where `offsets` is the byte position of every `index_interval`-th question in the shard, so that any question can be
+# reached by parsing at most `index_interval` questions, while keeping the manifest small.
+MANIFEST_FILE_NAME = 'manifest.json'
+MANIFEST_VERSION = 2
+INDEX_INTERVAL = 256
+
+def shard_category(file_name:str) -> str:
+    '''
+    Parameters:
+        file_name : str
+            The file name of a shard.
+
+    Returns:
+        The category of the questions in the shard.
+    '''
+    return file_name.split('.', 1)[0]
+
+def list_shards(directory:str) -> list[str]:
+    '''
+    Parameters:
+        directory : str
+            The path to the sharded question bank.
+
+    Raises:
+        FileNotFoundError
+            If the directory does not exist.
+
+    Returns:
+        The file names of every shard in the bank, in order.
+    '''
+    return sorted(file_name for file_name in os.listdir(directory) if file_name.endswith('.json') and file_name != MANIFEST_FILE_NAME)
+
+class Shard:
+    '''
+    A manifest's entry for one shard of a sharded question bank.
+
+    Attributes:
+        __file_name : str
+            The file name of the shard, within the bank's directory.
+        __category : str
+            The category of the questions in the shard.
+        __count : int
+            The number of questions in the shard.
+        __size : int
+            The size of the shard when it was indexed.
+        __mtime_ns : int
+            The modification time of the shard when it was indexed.
+        __offsets : list[int]
+            The position (in bytes) of every `INDEX_INTERVAL`-th question in the shard.
+    '''
+
+    def __init__(self, file_name:str, category:str, count:int, size:int, mtime_ns:int, offsets:list[int]):
+        self.__file_name = file_name
+        self.__category = category
+        self.__count = count
+        self.__size = size
+        self.__mtime_ns = mtime_ns
+        self.__offsets = offsets
+
+    @property
+    def get_file_name(self) -> str:
+        return self.__file_name
+    @property
+    def get_category(self) -> str:
+        return self.__category
+    @property
+    def get_count(self) -> int:
+        return self.__count
+    @property
+    def get_offsets(self) -> list[int]:
+        return self.__offsets
+
+    def is_up_to_date(self, stat:os.stat_result) -> bool:
+        '''
+        Parameters:
+            stat : os.stat_result
+                The shard's current status.
+
+        Returns:
+            `True` if the shard's size and modification time are unchanged since it was indexed.
+            `False` otherwise.
+        '''
+        return stat.st_size == self.__size and stat.st_mtime_ns == self.__mtime_ns
+
+    def encode(self) -> dict:
+        '''
+        Returns:
+            The shard's entry in the manifest.
+        '''
+        return {
+            'file' : self.__file_name
+            ,'category' : self.__category
+            ,'count' : self.__count
+            ,'size' : self.__size
+            ,'mtime_ns' : self.__mtime_ns
+            ,'offsets' : self.__offsets
+        }
+
+@profiler.timed('shards.index')
+def index_shard(directory:str, file_name:str) -> Shard:
+    '''
+    Count the questions in a shard and find the positions to index, checking every question against `schema.QUESTION_SCHEMA` on the way (so questions drawn from an indexed shard don't need checking).
+
+    Parameters:
+        directory : str
+            The path to the sharded question bank.
+        file_name : str
+            The file name of the shard.
+
+    Raises:
+        FileNotFoundError
+            If the shard does not exist.
+        SchemaError
+            If any questions don't match `schema.QUESTION_SCHEMA` (with every problem found, prefixed with the shard's file name).
+        ValueError
+            If the shard is formatted incorrectly.
+
+    Returns:
+        The shard's manifest entry.
+    '''
+    file_path = os.path.join(directory, file_name)
+    stat = os.stat(file_path)
+    count = 0
+    offsets:list[int] = []
+    problems:list[str] = []
+    for position, question in files.iter_json_array(file_path, with_offsets=True):
+        problems.extend(f'{file_name}: {problem}' for problem in schema.QUESTION_SCHEMA.check_element(question, count))
+        if count % INDEX_INTERVAL == 0:
+            offsets.append(position)
+        count += 1
+    if len(problems) > 0:
+        raise schema.SchemaError(*problems)
+    return Shard(file_name, shard_category(file_name), count, stat.st_size, stat.st_mtime_ns, offsets)
+
+def load_manifest(directory:str) -> dict[str, Shard]:
+    '''
+    Load a sharded question bank's manifest.
+
+    Parameters:
+        directory : str
+            The path to the sharded question bank.
+
+    Returns:
+        The manifest entry of each shard, by file name. Empty if the manifest is missing, corrupted or was written with a different `INDEX_INTERVAL`.
+    '''
+    try:
+        file = open(os.path.join(directory, MANIFEST_FILE_NAME), 'rb')
+    except FileNotFoundError:
+        return {}
+    try:
+        contents = file.read()
+        profiler.count('bytes_read', len(contents))
+    finally:
+        file.close()
+
+    try:
+        manifest = json.loads(contents)
+        if manifest['version'] != MANIFEST_VERSION or manifest['index_interval'] != INDEX_INTERVAL:
+            return {}
+        return {entry['file'] : Shard(entry['file'], entry['category'], entry['count'], entry['size'], entry['mtime_ns'], entry['offsets']) for entry in manifest['shards']}
+    except (ValueError, KeyError, TypeError):
+        return {}
+
+def save_manifest(directory:str, shards:list[Shard]):
+    '''
+    Replace a sharded question bank's manifest.
+
+    Parameters:
+        directory : str
+            The path to the sharded question bank.
+        shards : list[Shard]
+            The manifest entry of every shard, in order.
+
+    Raises:
+        OSError
+            If the manifest can't be written (e.g. the directory is read-only).
+    '''
+    manifest = {'version' : MANIFEST_VERSION, 'index_interval' : INDEX_INTERVAL, 'shards' : [shard.encode() for shard in shards]}
+    file_path = os.path.join(directory, MANIFEST_FILE_NAME)
+    temporary_path = files.write_temporary_file(file_path, json.dumps(manifest, separators=(',', ':')).encode('utf-8'))
+    os.replace(temporary_path, file_path)
+
+class ShardedBank:
+    '''
+    A sharded question bank, read through its manifest.
+
+    Only the manifest is read when the bank is opened. Drawing questions only opens the shards they are drawn from, and only parses the questions between each drawn question and the indexed position before it.
+
+    Attributes:
+        __directory : str
+            The path to the bank's directory.
+        __shards : list[Shard]
+            The manifest entry of every shard, in order.
+    '''
+
+    def __init__(self, directory:str, shards:list[Shard]):
+        self.__directory = directory
+        self.__shards = shards
+
+    def __len__(self) -> int:
+        return sum(shard.get_count for shard in self.__shards)
+
+    @property
+    def get_categories(self) -> dict[str, int]:
+        '''
+        The number of questions in each category.
+        '''
+        categories:dict[str, int] = {}
+        for shard in self.__shards:
+            categories[shard.get_category] = categories.get(shard.get_category, 0) + shard.get_count
+        return categories
+
+    def read(self, shard:Shard, indices:list[int]) -> dict[int, dict]:
+        '''
+        Read some of the questions in a shard.
+
+        Parameters:
+            shard : Shard
+                The shard to read from.
+            indices : list[int]
+                The indices of the questions to read, within the shard.
+
+        Raises:
+            FileNotFoundError
+                If the shard no longer exists.
+            ValueError
+                If the shard is formatted incorrectly.
+
+        Returns:
+            Each question as parsed from the shard, by index.
+        '''
+        file_path = os.path.join(self.__directory, shard.get_file_name)
+        questions:dict[int, dict] = {}
+        pending = sorted(set(indices))
+        while len(pending) > 0:
+            # Parse from the indexed position before the first pending question, picking up any later pending questions on the way.
+            block = pending[0] // INDEX_INTERVAL
+            index = block * INDEX_INTERVAL
+            elements = files.iter_json_array(file_path, start=shard.get_offsets[block])
+            try:
+                for question in elements:
+                    if index == pending[0]:
+                        questions[index] = question
+                        pending.pop(0)
+                        if len(pending) == 0 or pending[0] // INDEX_INTERVAL != block:
+                            break
+                    index += 1
+                else:
+                    raise ValueError('Shard has fewer questions than its manifest says.')
+            finally:
+                elements.close()
+            profiler.count('questions_parsed', index + 1 - block * INDEX_INTERVAL)
+        return questions
+
+    @profiler.timed('shards.sample')
+    def sample(self, number_of_questions:int, category_quotas:dict[str, int]|None = None, seed:int|None = None) -> list[Question]:
+        '''
+        Draw a random sample of questions.
+
+        Parameters:
+            number_of_questions : int
+                The maximum number of questions to draw (only used if `category_quotas` is `None`).
+            category_quotas : dict[str, int] | None
+                The maximum number of questions to draw from each category. `None` to draw from every category.
+            seed : int | None
+                Seed for the random draw, so that it can be reproduced. `None` for a different draw every time.
+
+        Raises:
+            FileNotFoundError
+                If a drawn-from shard no longer exists.
+            ValueError
+                If a drawn-from shard is formatted incorrectly.
+
+        Returns:
+            The drawn questions, in random order.
+        '''
+        generator = random.Random(seed)
+        if category_quotas is None:
+            draws = [(list(range(len(self.__shards))), number_of_questions)]
+        else:
+            draws = [([number for number, shard in enumerate(self.__shards) if shard.get_category == category], quota) for category, quota in category_quotas.items()]
+
+        # Draw indices into each group of shards as if they were one list, then sort them out into their shards.
+        drawn:dict[int, list[int]] = {}
+        for group, quota in draws:
+            starts = [0]
+            for number in group:
+                starts.append(starts[-1] + self.__shards[number].get_count)
+            for index in generator.sample(range(starts[-1]), min(max(0, quota), starts[-1])):
+                position = bisect.bisect_right(starts, index) - 1
+                drawn.setdefault(group[position], []).append(index - starts[position])
+
+        questions:list[Question] = []
+        for shard, indices in drawn.items():
+            questions.extend(question_from_json(question) for question in self.read(self.__shards[shard], indices).values())
+        profiler.count('questions_created', len(questions))
+
+        generator.shuffle(questions)
+        return questions
+
+    def iter_questions(self):
+        '''
+        Returns:
+            A generator of every question in the bank, as parsed from the shards, in order.
+        '''
+        for shard in self.__shards:
+            yield from files.iter_json_array(os.path.join(self.__directory, shard.get_file_name))
+
+def index_sharded_bank(directory:str) -> ShardedBank:
+    '''
+    Open a sharded question bank, re-indexing any shards that are new or have changed since the manifest was written.
+
+    The manifest is rewritten if anything changed. If it can't be (e.g. the directory is read-only), the bank is still opened, and the shards are re-indexed again next time.
+
+    Parameters:
+        directory : str
+            The path to the sharded question bank.
+
+    Raises:
+        FileNotFoundError
+            If the directory does not exist.
+        SchemaError
+            If any questions in the re-indexed shards don't match `schema.QUESTION_SCHEMA` (with every problem found).
+        ValueError
+            If a re-indexed shard is formatted incorrectly.
+
+    Returns:
+        The opened bank.
+
+    Calls:
+        index_shard
+    '''
+    manifest = load_manifest(directory)
+    shards:list[Shard] = []
+    changed = False
+    problems:list[str] = []
+    for file_name in list_shards(directory):
+        shard = manifest.pop(file_name, None)
+        if shard is None or not shard.is_up_to_date(os.stat(os.path.join(directory, file_name))):
+            try:
+                shard = index_shard(directory, file_name)
+            except schema.SchemaError as error:
+                # Carry on to find the problems in the other shards too.
+                problems.extend(error.args)
+                continue
+            changed = True
+        shards.append(shard)
+    if len(problems) > 0:
+        raise schema.SchemaError(*problems)
+
+    # Shards that were removed are left in `manifest`.
+    if changed or len(manifest) > 0:
+        try:
+            save_manifest(directory, shards)
+        except OSError:
+            pass
+    return ShardedBank(directory, shards)
+
+def open_sharded_bank(directory:str) -> ShardedBank:
+    '''
+    Open a sharded question bank (see `index_sharded_bank`).
+
+    Will abend if the bank is:
+
+    - Not found
+    - Empty
+    - Corrupted
+    - Invalid (listing every problem)
+
+    Parameters:
+        directory : str
+            The path to the sharded question bank.
+
+    Returns:
+        The opened bank.
+    '''
+    try:
+        bank = index_sharded_bank(directory)
+    except FileNotFoundError:
+        abend(ErrorMessages.FILE_NOT_FOUND.format(os.path.abspath(directory)))
+    except schema.SchemaError as error:
+        abend(schema.describe_problems(directory, list(error.args)))
+    except ValueError:
+        abend(ErrorMessages.FILE_CORRUPTED.format(os.path.abspath(directory)))
+
+    if len(bank) == 0:
+        abend(ErrorMessages.FILE_INCOMPLETE.format(os.path.abspath(directory)))
+    return bank
@@ -0,0 +1,554 @@
+import math
+import os
+import random
+import struct
+import sys
+from array import array
+from typing import Iterable, Sequence
+
+import file_handling as files
+from question import question_key
+from profiling import profiler
+
+# File layout (all integers little-endian):
+#
+#   Header   MAGIC, version, number of questions
+#   Columns  One u64 per question for each of: key, attempts, first-try correct answers, attempts used
+MAGIC = b'QSTS'
+VERSION = 1
+HEADER = struct.Struct('<4sHI')
+COLUMN_ITEM_SIZE = 8
+# Journal records: question key, attempts used, whether the question was answered correctly.
+OUTCOME = struct.Struct('<QB?')
+# The size (in bytes) the outcome journal can grow to before it is folded into the statistics file.
+JOURNAL_COMPACTION_SIZE = 65536
+# Every question starts as if it had been answered correctly first time once in two attempts, so that one lucky or unlucky answer doesn't decide how difficult it is.
+PRIOR_FIRST_TRY_CORRECT = 1
+PRIOR_ATTEMPTS = 2
+UNASKED_DIFFICULTY = 1 - PRIOR_FIRST_TRY_CORRECT / PRIOR_ATTEMPTS
+# How quickly a question's weight falls off as its difficulty gets further from the target difficulty.
+DIFFICULTY_SPREAD = 0.15
+# The weight of the questions furthest from the target difficulty, so that every question can still be drawn.
+MINIMUM_WEIGHT = 0.01
+
+def attempts_used(points:int, correct:bool, max_number_of_attempts:int) -> int:
+    '''
+    Work out how many attempts a question took from the points it earned (see `QuizEngine.grade_question`): every incorrect answer costs a point.
+
+    Parameters:
+        points : int
+            The points earned for the question.
+        correct : bool
+            Whether the question was answered correctly.
+        max_number_of_attempts : int
+            The maximum number of attempts the quiz allows.
+
+    Returns:
+        The number of answers given.
+    '''
+    return max_number_of_attempts - points + (1 if correct else 0)
+
+def difficulty_weight(difficulty:float, target_difficulty:float) -> float:
+    '''
+    Parameters:
+        difficulty : float
+            A question's difficulty (see `QuestionStats.get_difficulty`).
+        target_difficulty : float
+            The difficulty questions should be drawn around.
+
+    Returns:
+        The question's weight when drawing questions: 1 (plus `MINIMUM_WEIGHT`) at the target difficulty, falling away on a bell curve either side of it.
+    '''
+    return MINIMUM_WEIGHT + math.exp(-0.5 * ((difficulty - target_difficulty) / DIFFICULTY_SPREAD) ** 2)
+
+class QuestionStats:
+    '''
+    How every question that has been asked has gone, kept in columns (one array per statistic) so that a million questions take a few tens of megabytes.
+
+    Attributes:
+        __index : dict[int, int]
+            The position of each question's statistics in the columns, keyed by question key (see `question.question_key`).
+        __keys : array
+            Each question's key (`array('Q')`).
+        __attempts : array
+            The number of times each question has been asked (`array('Q')`).
+        __first_try_correct : array
+            The number of times each question was answered correctly first time (`array('Q')`).
+        __attempts_used : array
+            The total number of answers given to each question (`array('Q')`).
+    '''
+
+    def __init__(self):
+        self.__index:dict[int, int] = {}
+        self.__keys = array('Q')
+        self.__attempts = array('Q')
+        self.__first_try_correct = array('Q')
+        self.__attempts_used = array('Q')
+
+    def __len__(self) -> int:
+        return len(self.__keys)
+
+    def __contains__(self, key:int) -> bool:
+        return key in self.__index
+
+    def get_attempts(self, key:int) -> int:
+        '''
+        Parameters:
+            key : int
+                The question's key.
+
+        Returns:
+            The number of times the question has been asked.
+        '''
+        position = self.__index.get(key)
+        return 0 if position is None else self.__attempts[position]
+
+    def get_first_try_rate(self, key:int) -> float|None:
+        '''
+        Parameters:
+            key : int
+                The question's key.
+
+        Returns:
+            The fraction of times the question was answered correctly first time, or `None` if it has never been asked.
+        '''
+        position = self.__index.get(key)
+        if position is None or self.__attempts[position] == 0:
+            return None
+        return self.__first_try_correct[position] / self.__attempts[position]
+
+    def get_average_attempts(self, key:int) -> float|None:
+        '''
+        Parameters:
+            key : int
+                The question's key.
+
+        Returns:
+            The average number of answers given to the question, or `None` if it has never been asked.
+        '''
+        position = self.__index.get(key)
+        if position is None or self.__attempts[position] == 0:
+            return None
+        return self.__attempts_used[position] / self.__attempts[position]
+
+    def get_difficulty(self, key:int) -> float:
+        '''
+        Parameters:
+            key : int
+                The question's key.
+
+        Returns:
+            How difficult the question is, from 0 (always answered correctly first time) to 1 (never). Questions that have been asked a few times are pulled towards 0.5 (see `PRIOR_FIRST_TRY_CORRECT`), and questions that have never been asked are 0.5.
+        '''
+        position = self.__index.get(key)
+        if position is None:
+            return UNASKED_DIFFICULTY
+        return 1 - (self.__first_try_correct[position] + PRIOR_FIRST_TRY_CORRECT) / (self.__attempts[position] + PRIOR_ATTEMPTS)
+
+    def add(self, key:int, attempts_used:int, correct:bool):
+        '''
+        Record how one asking of a question went.
+
+        Parameters:
+            key : int
+                The question's key.
+            attempts_used : int
+                The number of answers given.
+            correct : bool
+                Whether the question was answered correctly.
+        '''
+        position = self.__index.get(key)
+        if position is None:
+            position = self.__index[key] = len(self.__keys)
+            self.__keys.append(key)
+            self.__attempts.append(0)
+            self.__first_try_correct.append(0)
+            self.__attempts_used.append(0)
+        self.__attempts[position] += 1
+        self.__first_try_correct[position] += correct and attempts_used == 1
+        self.__attempts_used[position] += attempts_used
+
+    def add_outcomes(self, outcomes:Iterable[tuple[int, int, bool]]):
+        '''
+        Parameters:
+            outcomes : Iterable[tuple[int, int, bool]]
+                The key, attempts used and correctness of each asking of a question (see `add`).
+        '''
+        for key, attempts_used, correct in outcomes:
+            self.add(key, attempts_used, correct)
+
+    def encode(self) -> bytes:
+        '''
+        Returns:
+            The contents of a statistics file holding these statistics.
+        '''
+        columns = [self.__keys, self.__attempts, self.__first_try_correct, self.__attempts_used]
+        if sys.byteorder != 'little':
+            columns = [array('Q', column) for column in columns]
+            for column in columns:
+                column.byteswap()
+        return HEADER.pack(MAGIC, VERSION, len(self.__keys)) + b''.join(column.tobytes() for column in columns)
+
+    @classmethod
+    def decode(cls, contents:bytes) -> 'QuestionStats':
+        '''
+        Parameters:
+            contents : bytes
+                The contents of a statistics file.
+
+        Raises:
+            ValueError
+                If the contents are not a statistics file.
+
+        Returns:
+            The decoded statistics.
+        '''
+        try:
+            magic, version, count = HEADER.unpack_from(contents)
+        except struct.error:
+            raise ValueError
+        if magic != MAGIC or version != VERSION or len(contents) != HEADER.size + 4 * count * COLUMN_ITEM_SIZE:
+            raise ValueError
+
+        stats = cls()
+        columns = []
+        for column_number in range(4):
+            start = HEADER.size + column_number * count * COLUMN_ITEM_SIZE
+            column = array('Q')
+            column.frombytes(contents[start:start + count * COLUMN_ITEM_SIZE])
+            if sys.byteorder != 'little':
+                column.byteswap()
+            columns.append(column)
+        stats.__keys, stats.__attempts, stats.__first_try_correct, stats.__attempts_used = columns
+        stats.__index = {key : position for position, key in enumerate(stats.__keys)}
+        if len(stats.__index) != count:
+            raise ValueError
+        return stats
+
+class WeightedSampler:
+    '''
+    Draws indices at random in proportion to their weights, using a Fenwick (binary indexed) tree of the weights: building it takes O(n), and each draw or weight change takes O(log n), however many indices there are.
+
+    Attributes:
+        __weights : array
+            The weight of each index (`array('d')`).
+        __tree : array
+            The Fenwick tree (`array('d')`, 1-based): each node holds the total weight of the `i & -i` indices ending at it.
+        __drawable : int
+            The number of indices with any weight.
+    '''
+
+    def __init__(self, weights:Iterable[float]):
+        self.__weights = array('d', weights)
+        self.__drawable = len(self.__weights) - self.__weights.count(0.0)
+        tree = array('d', [0.0]) + self.__weights
+        size = len(self.__weights)
+        for i in range(1, size + 1):
+            parent = i + (i & -i)
+            if parent <= size:
+                tree[parent] += tree[i]
+        self.__tree = tree
+
+    def __len__(self) -> int:
+        return len(self.__weights)
+
+    @property
+    def get_total(self) -> float:
+        '''
+        The total weight of every index.
+        '''
+        total = 0.0
+        i = len(self.__weights)
+        while i > 0:
+            total += self.__tree[i]
+            i -= i & -i
+        return total
+
+    def get_weight(self, index:int) -> float:
+        return self.__weights[index]
+
+    def set_weight(self, index:int, weight:float):
+        '''
+        Parameters:
+            index : int
+                The index to change the weight of.
+            weight : float
+                The new weight (not negative).
+        '''
+        change = weight - self.__weights[index]
+        self.__drawable += (weight != 0) - (self.__weights[index] != 0)
+        self.__weights[index] = weight
+        i = index + 1
+        size = len(self.__weights)
+        while i <= size:
+            self.__tree[i] += change
+            i += i & -i
+
+    def draw(self, generator:random.Random) -> int:
+        '''
+        Parameters:
+            generator : random.Random
+                Where the randomness comes from.
+
+        Raises:
+            ValueError
+                If every weight is 0.
+
+        Returns:
+            An index, drawn in proportion to its weight.
+        '''
+        if self.__drawable == 0:
+            raise ValueError('Nothing left to draw.')
+        remaining = generator.random() * self.get_total
+
+        # Walk down the tree, skipping every subtree whose total weight is at most what's left.
+        position = 0
+        step = 1 << len(self.__weights).bit_length()
+        while step > 0:
+            child = position + step
+            if child <= len(self.__weights) and self.__tree[child] <= remaining:
+                position = child
+                remaining -= self.__tree[child]
+            step >>= 1
+
+        # Rounding can leave `remaining` just past an index with any weight, so fall back to the nearest one.
+        if position < len(self.__weights) and self.__weights[position] > 0:
+            return position
+        for distance in range(1, len(self.__weights) + 1):
+            for candidate in (position - distance, position + distance):
+                if 0 <= candidate < len(self.__weights) and self.__weights[candidate] > 0:
+                    return candidate
+
+    def sample(self, number:int, generator:random.Random) -> list[int]:
+        '''
+        Draw distinct indices, each in proportion to its weight among the indices not yet drawn. The weights are unchanged afterwards.
+
+        Parameters:
+            number : int
+                The maximum number of indices to draw.
+            generator : random.Random
+                Where the randomness comes from.
+
+        Returns:
+            The drawn indices, in the order they were drawn. Shorter than `number` if fewer indices have any weight.
+        '''
+        drawn:list[tuple[int, float]] = []
+        try:
+            while len(drawn) < number:
+                index = self.draw(generator)
+                drawn.append((index, self.__weights[index]))
+                self.set_weight(index, 0.0)
+        except ValueError:
+            pass
+        finally:
+            for index, weight in drawn:
+                self.set_weight(index, weight)
+        return [index for index, _ in drawn]
+
+class QuestionSelector:
+    '''
+    Draws questions from a bank with a preference for questions near a target difficulty.
+
+    Questions that have never been asked all have the same weight, so building a selector for a million questions only looks each question up in the statistics once.
+
+    Attributes:
+        __keys : Sequence[int]
+            The key of every question in the bank, in order.
+        __stats : QuestionStats
+            How every question has gone so far.
+        __target_difficulty : float
+            The difficulty questions are drawn around.
+        __sampler : WeightedSampler
+            Every question's weight.
+    '''
+
+    def __init__(self, keys:Sequence[int], stats:QuestionStats, target_difficulty:float):
+        self.__keys = keys
+        self.__stats = stats
+        self.__target_difficulty = target_difficulty
+
+        unasked_weight = difficulty_weight(UNASKED_DIFFICULTY, target_difficulty)
+        if len(stats) == 0:
+            weights = array('d', [unasked_weight]) * len(keys)
+        else:
+            weights = array('d', [difficulty_weight(stats.get_difficulty(key), target_difficulty) if key in stats else unasked_weight for key in keys])
+        self.__sampler = WeightedSampler(weights)
+
+    def __len__(self) -> int:
+        return len(self.__keys)
+
+    @property
+    def get_stats(self) -> QuestionStats:
+        return self.__stats
+
+    @profiler.timed('questions.select')
+    def sample(self, number_of_questions:int, generator:random.Random) -> list[int]:
+        '''
+        Parameters:
+            number_of_questions : int
+                The maximum number of questions to draw.
+            generator : random.Random
+                Where the randomness comes from.
+
+        Returns:
+            The indices of the drawn questions, in random order.
+        '''
+        return self.__sampler.sample(number_of_questions, generator)
+
+    def add_outcomes(self, outcomes:Iterable[tuple[int, int, bool]]):
+        '''
+        Record how questions went, and update their weights.
+
+        Parameters:
+            outcomes : Iterable[tuple[int, int, bool]]
+                The index (in the bank), attempts used and correctness of each asking of a question.
+        '''
+        for index, attempts_used, correct in outcomes:
+            key = self.__keys[index]
+            self.__stats.add(key, attempts_used, correct)
+            self.__sampler.set_weight(index, difficulty_weight(self.__stats.get_difficulty(key), self.__target_difficulty))
+
+def question_weights(stats:QuestionStats, target_difficulty:float):
+    '''
+    Parameters:
+        stats : QuestionStats
+            How every question has gone so far.
+        target_difficulty : float
+            The difficulty questions should be drawn around.
+
+    Returns:
+        A function giving the weight (see `difficulty_weight`) of a question from the question file (as parsed, before it becomes a `Question`), for drawing questions without loading the whole file (see `file_handling.sample_questions_file`).
+    '''
+    unasked_weight = difficulty_weight(UNASKED_DIFFICULTY, target_difficulty)
+
+    def weight(question:dict) -> float:
+        if len(stats) == 0:
+            return unasked_weight
+        text = question.get('question') if isinstance(question, dict) else None
+        if not isinstance(text, str):
+            return unasked_weight
+        key = question_key(text)
+        return difficulty_weight(stats.get_difficulty(key), target_difficulty) if key in stats else unasked_weight
+
+    return weight
+
+def load_stats_journal(journal_path:str) -> list[tuple[int, int, bool]]:
+    '''
+    Load the outcomes from an outcome journal. A final record cut short by a crash mid-write is ignored.
+
+    Parameters:
+        journal_path : str
+            The path to the journal.
+
+    Returns:
+        The key, attempts used and correctness of each outcome, or an empty list if the journal was not found.
+    '''
+    try:
+        file = open(journal_path, 'rb')
+    except FileNotFoundError:
+        return []
+    try:
+        contents = file.read()
+    finally:
+        file.close()
+    profiler.count('bytes_read', len(contents))
+    return list(OUTCOME.iter_unpack(contents[:len(contents) - len(contents) % OUTCOME.size]))
+
+def load_stats_snapshot(file_path:str) -> QuestionStats:
+    '''
+    Load a statistics file (without its journal).
+
+    Parameters:
+        file_path : str
+            The path to the statistics file.
+
+    Raises:
+        ValueError
+            If the statistics file is formatted incorrectly.
+
+    Returns:
+        The loaded statistics, which are empty if the file was not found.
+    '''
+    try:
+        file = open(file_path, 'rb')
+    except FileNotFoundError:
+        return QuestionStats()
+    try:
+        contents = file.read()
+    finally:
+        file.close()
+    profiler.count('bytes_read', len(contents))
+    return QuestionStats.decode(contents)
+
+@profiler.timed('questions.load_stats')
+def load_question_stats(file_path:str) -> QuestionStats:
+    '''
+    Load the question statistics file and its journal of outcomes recorded since it was last compacted.
+
+    Statistics only affect which questions are drawn, so a corrupted statistics file is treated as empty rather than stopping the quiz.
+
+    Parameters:
+        file_path : str
+            The path to the statistics file.
+
+    Returns:
+        The loaded statistics.
+    '''
+    with files.lock_score_file(file_path):
+        try:
+            stats = load_stats_snapshot(file_path)
+        except ValueError:
+            stats = QuestionStats()
+        # A journal left over from an interrupted compaction comes before the current one.
+        for journal_path in [files.score_journal_path(file_path) + '.compacting', files.score_journal_path(file_path)]:
+            stats.add_outcomes(load_stats_journal(journal_path))
+    return stats
+
+def compact_question_stats(file_path:str):
+    '''
+    Fold the outcome journal into the statistics file (see `file_handling.compact_journal`).
+
+    Parameters:
+        file_path : str
+            The path to the statistics file.
+    '''
+    def merge(compacting_path:str) -> tuple[bytes, None]:
+        try:
+            stats = load_stats_snapshot(file_path)
+        except ValueError:
+            stats = QuestionStats()
+        stats.add_outcomes(load_stats_journal(compacting_path))
+        return stats.encode(), None
+
+    files.compact_journal(file_path, merge)
+
+@profiler.timed('questions.record_outcomes')
+def record_question_outcomes(file_path:str, outcomes:list[tuple[int, int, bool]]):
+    '''
+    Append a batch of outcomes to the outcome journal with a single write, compacting it if it has grown too big.
+
+    Outcomes are only collected while a quiz is being played, and recorded together afterwards, so answering questions never waits on the disk. Statistics are not worth stopping the quiz over, so failing to record them is not an error.
+
+    Parameters:
+        file_path : str
+            The path to the statistics file.
+        outcomes : list[tuple[int, int, bool]]
+            The key, attempts used and correctness of each asking of a question.
+    '''
+    if len(outcomes) == 0:
+        return
+    data = memoryview(b''.join(OUTCOME.pack(key, attempts_used, correct) for key, attempts_used, correct in outcomes))
+    try:
+        with files.lock_score_file(file_path):
+            journal = os.open(files.score_journal_path(file_path), os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+            try:
+                profiler.count('bytes_written', len(data))
+                while len(data) > 0:
+                    data = data[os.write(journal, data):]
+                journal_size = os.fstat(journal).st_size
+            finally:
+                os.close(journal)
+        if journal_size > JOURNAL_COMPACTION_SIZE:
+            compact_question_stats(file_path)
+    except OSError:
+        pass
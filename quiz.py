@@ -1,21 +1,33 @@
-from random import shuffle
 from display_text import DisplayText
 from prompts import Prompts
 from question import Question
 from results import Results
+from engine import QuestionAttempt, QuizEngine, QuizProgress
+from checkpoint import Checkpoint
+from rendering import Screen, question_lines
+from profiling import profiler
 
 class Quiz:
-    def __init__(self, questions:list[Question], multiple_choice:bool, select_using_index:bool, max_number_of_attempts:int) -> None:
+    '''
+    The interactive front end for a `QuizEngine`: asks the questions in the terminal and feeds the user's answers to the engine. The quiz's state (and how each question is laid out) is shared with the server's sessions, through `QuizProgress`.
+    '''
+
+    def __init__(self, questions:list[Question], multiple_choice:bool, select_using_index:bool, max_number_of_attempts:int, max_typo_distance:int = 0, checkpoint:Checkpoint|None = None, screen:Screen|None = None) -> None:
         self.__questions = questions
-        self.__results = Results()
+        self.__engine = QuizEngine(multiple_choice, select_using_index, max_number_of_attempts, max_typo_distance)
+        self.__progress = QuizProgress(self.__engine, questions)
         self.__multiple_choice = multiple_choice
         self.__select_using_index = select_using_index
         self.__max_number_of_attempts = max_number_of_attempts
         self.__final_score = None
+        # Where each answered question is recorded, so the quiz can be resumed. `None` to not checkpoint.
+        self.__checkpoint = checkpoint
+        # Where the quiz is displayed: each screen is written in one go when the user is asked for an answer.
+        self.__screen = Screen() if screen is None else screen
 
     def __str__(self) -> str:
         return f'''questions: {self.__questions}
-results: {self.__results}
+results: {self.__progress.get_results}
 multiple_choice: {self.__multiple_choice}
 select_using_index: {self.__select_using_index}
 max_number_of_attempts: {self.__max_number_of_attempts}
@@ -24,10 +36,29 @@ final_score: {self.__final_score}'''
     @property
     def get_final_score(self) -> int:
         return self.__final_score
+    @property
+    def get_engine(self) -> QuizEngine:
+        return self.__engine
+    @property
+    def get_results(self) -> Results:
+        return self.__progress.get_results
+    @property
+    def get_answer_log(self) -> list[tuple[str, list[str]]]:
+        '''
+        Every question asked so far, with the text of every answer the user gave to it.
+        '''
+        return self.__progress.get_answer_log
+    @property
+    def get_outcomes(self) -> list[tuple[Question, int, bool]]:
+        '''
+        Every question asked so far, with the points earned for it and whether it was answered correctly, to be recorded in the question statistics once the quiz is over.
+        '''
+        return self.__progress.get_outcomes
 
+    @profiler.timed('quiz.run')
     def start(self):
         '''
-        Do the quiz, displaying the results at the end.
+        Do the quiz (carrying on from the first unanswered question, if it was resumed), displaying the results at the end.
         
         Returns:
             The final (adjusted) score.
@@ -35,130 +66,94 @@ final_score: {self.__final_score}'''
         Calls:
             do_question
         '''
-        for q in range(len(self.__questions)):
-            print(DisplayText.QUESTION.format(q + 1, len(self.__questions), self.__questions[q].get_question))
-            self.do_question(self.__questions[q])
-
-        self.__final_score = self.__results.calculate_adjusted_score()
-        print(DisplayText.RESULTS.format(self.__results.get_questions_correct, len(self.__questions), self.__results.get_score, self.__results.get_max_score, self.__final_score))
-
-    def do_question(self, question:Question):
+        try:
+            while not self.__progress.get_finished:
+                self.do_question()
+
+            results = self.__progress.results_values()
+            self.__final_score = results[-1]
+            self.__screen.write(DisplayText.RESULTS, *results)
+        finally:
+            # Show whatever is left, even if the quiz was interrupted.
+            self.__screen.flush()
+
+    @profiler.timed('quiz.question')
+    def do_question(self):
         '''
-        Display a question, get the user's response, and tell them whether they were correct.
-
-        Parameters:
-            question : Question
-                The question to ask the user.
+        Display the next question, get the user's response, and tell them whether they were correct.
 
         Calls:
-            print_answer_options
             get_answer
         '''
-        attempts = self.__max_number_of_attempts
-
-        if self.__multiple_choice:
-            shuffle(question.get_answer_options)
-            # Ensure number of attempts does not exceed the number of incorrect answer options.
-            attempts = min(self.__max_number_of_attempts, len(question.get_answer_options) - 1)
-            self.print_answer_options(question.get_answer_options)
+        number = self.__progress.get_next_question
+        attempt = self.__progress.start_question()
+        for template, values in question_lines(DisplayText, Prompts, self.__progress, attempt):
+            self.__screen.write(template, *values)
 
-        self.__results.increase_max_score_by(attempts)
+        self.get_answer(attempt)
+        self.__progress.finish_question(attempt)
+        if self.__checkpoint is not None:
+            self.__checkpoint.record(number, attempt.get_question, attempt.get_option_order, len(attempt.get_answers), attempt.get_points, attempt.get_correct, attempt.get_answers)
 
-        points, correct = self.get_answer(question)
+        if attempt.get_correct:
+            self.__screen.write(DisplayText.CORRECT, attempt.get_points)
+        self.__screen.write(DisplayText.CURRENT_SCORE, self.__progress.get_results.get_score)
 
-        if correct:
-            print(DisplayText.CORRECT.format(points))
-            self.__results.increase_score_by(points)
-            self.__results.increment_questions_correct()
-
-        print(DisplayText.CURRENT_SCORE.format(self.__results.get_score))
-
-    def print_answer_options(self, answer_options:list[str]):
+    def restore(self, answered:list[tuple[list[int], int, int, bool, list[str]]]):
         '''
-        Print the answer options for a multiple-choice question.
+        Restore the state of a resumed quiz from its checkpoint, as if its answered questions had just been asked, without asking them again. `start` then carries on from the first unanswered question.
 
         Parameters:
-            answer_options : list[str]
-                All the answer options (including correct) for the question.
+            answered : list[tuple[list[int], int, int, bool, list[str]]]
+                The questions answered so far (see `CheckpointState.get_answered`), in order.
         '''
-        for o in range(len(answer_options)):
-            if self.__select_using_index:
-                print(DisplayText.INDEXED_ANSWER_OPTION.format(o + 1, answer_options[o]))
-            else:
-                print(DisplayText.ANSWER_OPTION.format(answer_options[o]))
-
-        if self.__select_using_index:
-            print(Prompts.ANSWER_BY_INDEX)
-        else:
-            print(Prompts.ANSWER_TYPED)
+        self.__progress.restore(answered)
 
-    def get_answer(self, question:Question) -> tuple[int, bool]:
+    def get_answer(self, attempt:QuestionAttempt):
         '''
-        User types in/selects an answer.
+        User types in/selects an answer, as many times as the engine allows.
 
         Parameters:
-            question : Question
-                The question to ask.
-
-        Returns:
-            `tuple[int, bool]`
-                The `int` is the number of points the user earned for this question.
-                The `bool` is whether or not the user entered the correct answer.
+            attempt : QuestionAttempt
+                The question being answered.
 
         Calls:
             select_answer_using_index
             type_answer
         '''
-        attempt = 1
-        correct = False
-        points = self.__max_number_of_attempts
-
-        while not correct and (attempt <= self.__max_number_of_attempts):
-
+        while not attempt.get_finished:
             if self.__multiple_choice and self.__select_using_index:
-                correct = self.select_answer_using_index(question)
+                answer = self.select_answer_using_index(attempt)
             else:
-                correct = self.type_answer(question)
-
-            if not correct:
-                points -= 1
-                print(DisplayText.INCORRECT.format(self.__max_number_of_attempts - attempt))
-
-            attempt += 1
-
-        return points, correct
+                answer = self.type_answer()
+            if not attempt.submit(answer):
+                self.__screen.write(DisplayText.INCORRECT, attempt.get_attempts_remaining)
 
-    def select_answer_using_index(self, question:Question) -> bool:
+    def select_answer_using_index(self, attempt:QuestionAttempt) -> int:
         '''
         Prompt the user to enter a valid index.
 
         Parameters:
-            question : Question
+            attempt : QuestionAttempt
+                The question being answered.
 
         Returns:
-            `True` if the user entered the correct answer.
-            `False` otherwise.
+            The index (into `Question.get_answer_options`) of the answer option the user selected.
         '''
         while True:
             try:
-                choice = int(input()) - 1
-                if choice not in range(len(question.get_answer_options)):
-                    raise ValueError
+                choice = attempt.select(int(self.__screen.ask()))
             except ValueError:
-                print(Prompts.VALID_INDEX.format(1, len(question.get_answer_options)))
-            else:
-                return question.get_answer_options[choice] == question.get_answer
+                choice = None
+            if choice is not None:
+                return choice
+            self.__screen.write(Prompts.VALID_INDEX, 1, len(attempt.get_option_order))
 
-    def type_answer(self, question:Question) -> bool:
+    def type_answer(self) -> str:
         '''
         Prompt the user to type in the answer.
 
-        Parameters:
-            question : Question
-
         Returns:
-            `True` if the user typed in the correct answer (has to be exactly correct, non-case-sensitive).
-            `False` otherwise.
+            The answer the user typed in.
         '''
-        answer = input(Prompts.ANSWER_TYPED + "\n")
-        return answer.lower() == question.get_answer.lower()
+        return self.__screen.ask(Prompts.ANSWER_TYPED + "\n")
@@ -0,0 +1,152 @@
+import os
+import time
+from concurrent.futures import FIRST_COMPLETED, Future, ProcessPoolExecutor, wait
+
+import bundle as bundles
+import file_handling as files
+import question_shards
+import schema
+import sessions
+from question import Question, question_from_json
+from score_store import ScoreStore
+from profiling import profiler
+
+# The answer key each worker process grades against (see `load_answer_key`).
+answer_key:dict[str, Question] = {}
+
+def load_answer_key(question_file_path:str):
+    '''
+    Load the current questions into this process's answer key. Run once in each worker process when it starts.
+
+    The questions are checked against `schema.QUESTION_SCHEMA` the first time (see `schema.is_verified`), so the worker processes don't check them again.
+
+    Parameters:
+        question_file_path : str
+            The path to the question file, or to a sharded question bank.
+
+    Raises:
+        FileNotFoundError
+            If the question file does not exist.
+        SchemaError
+            If any questions don't match `schema.QUESTION_SCHEMA` (with every problem found).
+        ValueError
+            If the question file is corrupted.
+    '''
+    global answer_key
+    answer_key = {}
+    if os.path.isdir(question_file_path):
+        # Shards are checked when they are indexed.
+        verified = True
+        questions = question_shards.index_sharded_bank(question_file_path).iter_questions()
+    else:
+        verified = schema.is_verified(files.VALIDATION_CACHE_FILE_PATH, question_file_path, schema.QUESTION_SCHEMA)
+        fingerprint = bundles.fingerprint(question_file_path)
+        questions = files.iter_json_array(question_file_path)
+
+    problems:list[str] = []
+    for index, question in enumerate(questions):
+        if not verified:
+            problems.extend(schema.QUESTION_SCHEMA.check_element(question, index))
+            if len(problems) > 0:
+                continue
+        question = question_from_json(question)
+        answer_key[question.get_question] = question
+
+    if len(problems) > 0:
+        raise schema.SchemaError(*problems)
+    if not verified:
+        schema.record_verified(files.VALIDATION_CACHE_FILE_PATH, question_file_path, schema.QUESTION_SCHEMA, fingerprint)
+
+def grade_chunk(chunk:list[str]) -> tuple[list[tuple[str, str, int]], int]:
+    '''
+    Re-grade a chunk of recorded sessions against this process's answer key.
+
+    Parameters:
+        chunk : list[str]
+            The encoded sessions.
+
+    Returns:
+        A tuple containing the name, timestamp and new score of each session that could be re-graded, and the number of sessions in the chunk.
+    '''
+    graded = []
+    for line in chunk:
+        result = sessions.grade_session(line, answer_key)
+        if result is not None:
+            graded.append(result)
+    return graded, len(chunk)
+
+@profiler.timed('regrade.run')
+def regrade(session_log_path:str, question_file_path:str, store:ScoreStore, workers:int|None = None, chunk_size:int = 1000, batch_size:int = 10000) -> tuple[int, int, float]:
+    '''
+    Re-grade every saved session in the session log against the current question file, and save the new scores.
+
+    Chunks of sessions are graded in a pool of worker processes. Only a few chunks per worker are read ahead at a time, so memory use doesn't depend on the size of the log. New scores are saved to `store` in batches of `batch_size`.
+
+    Parameters:
+        session_log_path : str
+            The path to the session log.
+        question_file_path : str
+            The path to the (corrected) question file.
+        store : ScoreStore
+            Where the new scores are saved.
+        workers : int | None
+            The number of worker processes. `None` for one per CPU.
+        chunk_size : int
+            The number of sessions sent to a worker at a time.
+        batch_size : int
+            The number of scores saved to `store` at a time.
+
+    Raises:
+        FileNotFoundError
+            If the session log or question file does not exist.
+        ValueError
+            If the question file is corrupted.
+
+    Returns:
+        A tuple containing the number of sessions read, the number of scores saved, and the time taken in seconds.
+
+    Calls:
+        grade_chunk
+    '''
+    if workers is None:
+        workers = os.cpu_count() or 1
+    max_in_flight = 2 * workers
+
+    start_time = time.perf_counter()
+    sessions_read = 0
+    scores_saved = 0
+    batch:list[tuple[str, str, int]] = []
+
+    def collect(future:Future):
+        nonlocal sessions_read, scores_saved, batch
+        graded, count = future.result()
+        sessions_read += count
+        batch.extend(graded)
+        if len(batch) >= batch_size:
+            store.add_scores(batch)
+            scores_saved += len(batch)
+            batch = []
+
+    # Fail before starting the workers if the question file can't be read.
+    load_answer_key(question_file_path)
+
+    executor = ProcessPoolExecutor(workers, initializer=load_answer_key, initargs=(question_file_path,))
+    try:
+        in_flight:set[Future] = set()
+        for chunk in sessions.iter_session_chunks(session_log_path, chunk_size):
+            if len(in_flight) >= max_in_flight:
+                done, in_flight = wait(in_flight, return_when=FIRST_COMPLETED)
+                for future in done:
+                    collect(future)
+            in_flight.add(executor.submit(grade_chunk, chunk))
+
+        for future in in_flight:
+            collect(future)
+    finally:
+        executor.shutdown(cancel_futures=True)
+
+    if len(batch) > 0:
+        store.add_scores(batch)
+        scores_saved += len(batch)
+
+    return sessions_read, scores_saved, time.perf_counter() - start_time
@@ -0,0 +1,157 @@
+import string
+import sys
+from typing import Callable
+
+from engine import QuestionAttempt, QuizProgress
+from profiling import profiler
+
+def compile_template(template:str) -> Callable[..., str]:
+    '''
+    Parse a display text or prompt once, so that it is checked when it is compiled and doesn't need checking each time it is used.
+
+    Templates without replacement fields (most of them) compile to their final text, ignoring any values passed for them as `str.format` does (so a display text or prompt edited to leave out its value still works). The rest compile to their bound `str.format`, since its parser (written in C) is faster than filling in a parsed template in Python.
+
+    Parameters:
+        template : str
+            The display text or prompt.
+
+    Raises:
+        ValueError
+            If the template is formatted incorrectly.
+
+    Returns:
+        A function taking the values of the replacement fields, in order, and returning the filled-in text.
+    '''
+    if all(field_name is None for _, field_name, _, _ in string.Formatter().parse(template)):
+        # Doubled braces still need undoing.
+        text = template.format()
+        return lambda *_: text
+    return template.format
+
+def question_lines(display_text, prompts, progress:QuizProgress, attempt:QuestionAttempt) -> list[tuple[str, tuple]]:
+    '''
+    Lay out the screen a question is asked with, the same way for every front end.
+
+    Parameters:
+        display_text
+            The display text (`DisplayText`, or a snapshot of it).
+        prompts
+            The prompts (`Prompts`, or a snapshot of them).
+        progress : QuizProgress
+            The quiz the question is in.
+        attempt : QuestionAttempt
+            The question, just started with `QuizProgress.start_question`.
+
+    Returns:
+        Each line's template and the values of its replacement fields: the question, then (for multiple choice) its answer options in the order they are displayed and the prompt to choose one.
+    '''
+    engine = progress.get_engine
+    lines:list[tuple[str, tuple]] = [(display_text.QUESTION, (progress.get_next_question + 1, len(progress.get_questions), attempt.get_question.get_question))]
+    if engine.get_multiple_choice:
+        for o, answer_option in enumerate(attempt.get_displayed_options):
+            if engine.get_select_using_index:
+                lines.append((display_text.INDEXED_ANSWER_OPTION, (o + 1, answer_option)))
+            else:
+                lines.append((display_text.ANSWER_OPTION, (answer_option,)))
+        lines.append((prompts.ANSWER_BY_INDEX if engine.get_select_using_index else prompts.ANSWER_TYPED, ()))
+    return lines
+
+class Screen:
+    '''
+    The quiz's terminal output, collected into a buffer and written all at once when the user is asked for input, so that each screen (a question, its answer options and the prompt, say) takes a single write however slow the connection is.
+
+    If the output isn't a terminal (e.g. it is piped to a file), the written screens aren't flushed, so the output stream buffers them into large blocks. If the input isn't a terminal, answers are read straight from it, instead of with `input` (which flushes the output every time).
+
+    Attributes:
+        __output
+            The stream to write to.
+        __input
+            The stream to read answers from.
+        __interactive : bool
+            Whether the output is a terminal, so each screen has to be flushed for the user to see it.
+        __buffer : list[str]
+            The text written since the last screen.
+        __templates : dict[str, Callable[..., str]]
+            Every template rendered so far, compiled (see `compile_template`), keyed by its text.
+    '''
+
+    def __init__(self, output = None, input = None):
+        self.__output = sys.stdout if output is None else output
+        self.__input = sys.stdin if input is None else input
+        self.__interactive = self.__output.isatty()
+        self.__buffer:list[str] = []
+        self.__templates:dict[str, Callable[..., str]] = {}
+
+    @property
+    def get_interactive(self) -> bool:
+        return self.__interactive
+
+    def render(self, template:str, *arguments) -> str:
+        '''
+        Fill in a display text or prompt, compiling it only the first time it is used.
+
+        Parameters:
+            template : str
+                The display text or prompt.
+            *arguments
+                The values of its replacement fields, in order. Without any, the text is used as it is (as `print` would print it).
+
+        Returns:
+            The filled-in text.
+        '''
+        if len(arguments) == 0:
+            return template
+        compiled = self.__templates.get(template)
+        if compiled is None:
+            compiled = self.__templates[template] = compile_template(template)
+        return compiled(*arguments)
+
+    def write(self, template:str, *arguments):
+        '''
+        Add a line to the screen, as `print` would print it (see `render`).
+
+        Parameters:
+            template : str
+                The display text or prompt.
+            *arguments
+                The values of its replacement fields, in order.
+        '''
+        self.__buffer.append(self.render(template, *arguments))
+        self.__buffer.append('\n')
+
+    def flush(self):
+        '''
+        Write the screen in a single write.
+        '''
+        if len(self.__buffer) == 0:
+            return
+        text = ''.join(self.__buffer)
+        self.__buffer.clear()
+        self.__output.write(text)
+        if self.__interactive:
+            self.__output.flush()
+        profiler.count('screen_writes')
+
+    def ask(self, prompt:str = '') -> str:
+        '''
+        Write the screen, ending with a prompt, and read the user's answer.
+
+        Parameters:
+            prompt : str
+                The text to end the screen with (not followed by a new line).
+
+        Raises:
+            EOFError
+                If there is no more input.
+
+        Returns:
+            The line the user entered, without its new line.
+        '''
+        self.__buffer.append(prompt)
+        self.flush()
+        if self.__input.isatty():
+            return input()
+        line = self.__input.readline()
+        if line == '':
+            raise EOFError
+        return line[:-1] if line.endswith('\n') else line
@@ -17,6 +17,8 @@ class Results:
         calculate_adjusted_score(self)
     '''
 
+    __slots__ = ('__max_score', '__score', '__questions_correct')
+
     def __init__(self, max_score:int = 0, score:int = 0, questions_correct:int = 0) -> None:
         self.__max_score = max_score
         self.__score = score
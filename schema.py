@@ -0,0 +1,345 @@
+import hashlib
+import marshal
+import os
+
+from error_handling import *
+import bundle as bundles
+import compiled_bank
+import file_handling as files
+
+# Bump whenever the validation cache's format changes, so that old caches are ignored.
+VALIDATION_CACHE_VERSION = 1
+# The most problems listed when a file is invalid (a broken question file could have millions).
+MAX_LISTED_PROBLEMS = 20
+
+TYPE_NAMES = {str : 'a string', int : 'an integer', float : 'a number', bool : 'true or false', list : 'a list', dict : 'an object', type(None) : 'null'}
+
+class SchemaError(ValueError):
+    '''
+    An exception to be raised when parsed JSON doesn't match its schema. Its arguments are every problem found.
+    '''
+    def __init__(self, *args: object) -> None:
+        super().__init__(*args)
+
+def type_name(value) -> str:
+    '''
+    Parameters:
+        value
+            A parsed JSON value.
+
+    Returns:
+        The name of the value's JSON type.
+    '''
+    return TYPE_NAMES.get(type(value), type(value).__name__)
+
+def has_type(value, types:tuple[type, ...]) -> bool:
+    '''
+    Check whether a parsed JSON value is one of some types, as JSON sees them: `true` and `false` are not integers, and integers are numbers.
+
+    Parameters:
+        value
+            A parsed JSON value.
+        types : tuple[type, ...]
+            The allowed types.
+
+    Returns:
+        `True` if the value is one of the types.
+        `False` otherwise.
+    '''
+    if isinstance(value, bool):
+        return bool in types
+    return isinstance(value, types) or (isinstance(value, int) and float in types)
+
+class Field:
+    '''
+    A key expected in a JSON object.
+
+    Attributes:
+        __name : str
+            The key.
+        __types : tuple[type, ...]
+            The types its value can be (`type(None)` for `null`).
+        __required : bool
+            Whether the key has to be there.
+        __items : tuple[type, ...] | None
+            The types the items of a list (or the values of an object) can be. `None` to not check them.
+        __choices : tuple | None
+            The only values allowed. `None` to allow any value of the right type.
+    '''
+
+    def __init__(self, name:str, types:tuple[type, ...], required:bool = True, items:tuple[type, ...]|None = None, choices:tuple|None = None):
+        self.__name = name
+        self.__types = types
+        self.__required = required
+        self.__items = items
+        self.__choices = choices
+
+    @property
+    def get_name(self) -> str:
+        return self.__name
+    @property
+    def get_required(self) -> bool:
+        return self.__required
+
+    def describe(self) -> tuple:
+        '''
+        Returns:
+            Everything the field checks, for fingerprinting its schema.
+        '''
+        return (self.__name, [t.__name__ for t in self.__types], self.__required, None if self.__items is None else [t.__name__ for t in self.__items], self.__choices)
+
+    def check(self, value, where:str) -> list[str]:
+        '''
+        Parameters:
+            value
+                The key's value.
+            where : str
+                The object the key is in, to describe problems with.
+
+        Returns:
+            Every problem with the value.
+        '''
+        where = f'{where}: "{self.__name}"'
+        if not has_type(value, self.__types):
+            return [ErrorMessages.WRONG_TYPE.format(where, ' or '.join(TYPE_NAMES[t] for t in self.__types), type_name(value))]
+        if self.__choices is not None and value not in self.__choices:
+            return [ErrorMessages.NOT_A_CHOICE.format(where, ', '.join(f'"{choice}"' for choice in self.__choices), f'"{value}"')]
+
+        problems:list[str] = []
+        if self.__items is not None and isinstance(value, (list, dict)):
+            items = value.items() if isinstance(value, dict) else enumerate(value)
+            for index, item in items:
+                if not has_type(item, self.__items):
+                    problems.append(ErrorMessages.WRONG_TYPE.format(f'{where}[{index}]', ' or '.join(TYPE_NAMES[t] for t in self.__items), type_name(item)))
+        return problems
+
+class Schema:
+    '''
+    The keys expected in a JSON object, and the types of their values.
+
+    Attributes:
+        __name : str
+            What the objects are called, to describe problems with.
+        __fields : dict[str, Field]
+            Every key expected, by name.
+        __fingerprint : str
+            Changes whenever the schema does, so that files checked against an older schema are checked again.
+    '''
+
+    def __init__(self, name:str, fields:list[Field]):
+        self.__name = name
+        self.__fields = {field.get_name : field for field in fields}
+        self.__fingerprint = hashlib.sha256(repr([field.describe() for field in fields]).encode('utf-8')).hexdigest()
+
+    @property
+    def get_name(self) -> str:
+        return self.__name
+    @property
+    def get_fingerprint(self) -> str:
+        return self.__fingerprint
+
+    def check(self, values, where:str|None = None) -> list[str]:
+        '''
+        Check an object against the schema, finding every problem with it rather than stopping at the first.
+
+        Parameters:
+            values
+                The parsed object.
+            where : str | None
+                What to call the object when describing problems. `None` for the schema's name.
+
+        Returns:
+            Every problem with the object. Empty if it matches the schema.
+        '''
+        where = self.__name if where is None else where
+        if not isinstance(values, dict):
+            return [ErrorMessages.WRONG_TYPE.format(where, TYPE_NAMES[dict], type_name(values))]
+
+        problems:list[str] = []
+        for name, field in self.__fields.items():
+            if name in values:
+                problems.extend(field.check(values[name], where))
+            elif field.get_required:
+                problems.append(ErrorMessages.KEY_MISSING.format(where, name))
+        for name in values:
+            if name not in self.__fields:
+                problems.append(ErrorMessages.KEY_UNEXPECTED.format(where, name))
+        return problems
+
+    def check_element(self, values, index:int) -> list[str]:
+        '''
+        Check an element of a JSON array of objects against the schema (see `check`).
+
+        Parameters:
+            values
+                The parsed element.
+            index : int
+                The element's index in the array.
+
+        Returns:
+            Every problem with the element. Empty if it matches the schema.
+        '''
+        return self.check(values, f'{self.__name} {index + 1}')
+
+def describe_problems(file_path:str, problems:list[str]) -> str:
+    '''
+    Parameters:
+        file_path : str
+            The path to the invalid file.
+        problems : list[str]
+            Every problem found with it.
+
+    Returns:
+        An error message listing the problems (only the first `MAX_LISTED_PROBLEMS` of them, if there are more).
+    '''
+    listed = problems[:MAX_LISTED_PROBLEMS]
+    if len(problems) > len(listed):
+        listed.append(ErrorMessages.MORE_PROBLEMS.format(len(problems) - len(listed)))
+    return ErrorMessages.FILE_INVALID.format(os.path.abspath(file_path), '\n'.join(listed))
+
+CONFIG_SCHEMA = Schema('Config', [
+    Field('number_of_questions', (int,))
+    ,Field('number_of_attempts', (int,))
+    ,Field('multiple_choice', (bool,))
+    ,Field('select_using_index', (bool,))
+    ,Field('question_file_path', (str,))
+    ,Field('score_file_path', (str,))
+    ,Field('display_text_file_path', (str,))
+    ,Field('prompt_file_path', (str,))
+    ,Field('question_seed', (int, type(None)), False)
+    ,Field('compiled_question_file_path', (str, type(None)), False)
+    ,Field('score_journal_compaction_size', (int,), False)
+    ,Field('score_backend', (str,), False, choices=('json', 'sqlite', 'columnar'))
+    ,Field('score_database_path', (str,), False)
+    ,Field('score_table_size', (int,), False)
+    ,Field('session_log_path', (str, type(None)), False)
+    ,Field('max_typo_distance', (int,), False)
+    ,Field('profile_report_path', (str, type(None)), False)
+    ,Field('score_history_path', (str,), False)
+    ,Field('question_stats_path', (str, type(None)), False)
+    ,Field('target_difficulty', (float, type(None)), False)
+    ,Field('checkpoint_path', (str, type(None)), False)
+    ,Field('category_quotas', (dict, type(None)), False, items=(int,))
+    ,Field('reload_interval', (float, type(None)), False)
+    ,Field('question_load_workers', (int, type(None)), False)
+])
+
+QUESTION_SCHEMA = Schema('Question', [
+    Field('question', (str,))
+    ,Field('answer', (str,))
+    ,Field('answer_options', (list,), items=(str,))
+    ,Field('aliases', (list, type(None)), False, items=(str,))
+])
+
+def text_table_schema(the_class) -> Schema:
+    '''
+    Parameters:
+        the_class : class
+            A `TextTable` (like `DisplayText` or `Prompts`).
+
+    Returns:
+        The schema of the file the class's values are loaded from: every constant the class declares, as a string.
+    '''
+    return Schema(the_class.__name__, [Field(name, (str,)) for name in the_class.__annotations__])
+
+def load_validation_cache(cache_path:str) -> dict[str, tuple[int, int, bytes, str]]:
+    '''
+    Parameters:
+        cache_path : str
+            The path to the validation cache.
+
+    Returns:
+        The modification time, size, SHA-256 digest and schema fingerprint of every file known to be valid, keyed by absolute path. Empty if the cache is missing or unreadable.
+    '''
+    try:
+        file = open(cache_path, 'rb')
+    except FileNotFoundError:
+        return {}
+    try:
+        cache = marshal.load(file)
+    except (EOFError, ValueError, TypeError):
+        return {}
+    finally:
+        file.close()
+
+    if not isinstance(cache, dict) or cache.get('version') != VALIDATION_CACHE_VERSION:
+        return {}
+    return cache['files']
+
+def save_validation_cache(cache_path:str, cache:dict[str, tuple[int, int, bytes, str]]):
+    '''
+    Replace the validation cache. Failing to save it (e.g. on a read-only file system) is not an error: files are just validated again next time.
+
+    Parameters:
+        cache_path : str
+            The path to the validation cache.
+        cache : dict[str, tuple[int, int, bytes, str]]
+            The modification time, size, SHA-256 digest and schema fingerprint of every file known to be valid, keyed by absolute path.
+    '''
+    try:
+        temporary_path = files.write_temporary_file(cache_path, marshal.dumps({'version' : VALIDATION_CACHE_VERSION, 'files' : cache}))
+        os.replace(temporary_path, cache_path)
+    except OSError:
+        pass
+
+def is_verified(cache_path:str, file_path:str, schema:Schema) -> bool:
+    '''
+    Check whether a file was found valid against a schema, and hasn't changed since.
+
+    Only the file's modification time and size are checked, unless its modification time has changed but not its size, when it is hashed to see whether its contents have really changed (and its new modification time is recorded if they haven't). So on a warm start, checking a file costs one `stat`, however large it is.
+
+    Parameters:
+        cache_path : str
+            The path to the validation cache.
+        file_path : str
+            The path to the file.
+        schema : Schema
+            The schema the file (or each element of it) has to match.
+
+    Returns:
+        `True` if the file was recorded as valid (see `record_verified`) and is unchanged.
+        `False` otherwise.
+    '''
+    cache = load_validation_cache(cache_path)
+    entry = cache.get(os.path.abspath(file_path))
+    if entry is None or entry[3] != schema.get_fingerprint:
+        return False
+    mtime_ns, size, digest, _ = entry
+    try:
+        fingerprint = bundles.fingerprint(file_path)
+        if fingerprint == (mtime_ns, size):
+            return True
+        if fingerprint[1] != size or compiled_bank.hash_file(file_path) != digest:
+            return False
+    except FileNotFoundError:
+        return False
+
+    cache[os.path.abspath(file_path)] = (*fingerprint, digest, schema.get_fingerprint)
+    save_validation_cache(cache_path, cache)
+    return True
+
+def record_verified(cache_path:str, file_path:str, schema:Schema, fingerprint:tuple[int, int]):
+    '''
+    Record that a file was found valid against a schema, so that it isn't validated again until it changes.
+
+    Nothing is recorded if the file changed after it was validated.
+
+    Parameters:
+        cache_path : str
+            The path to the validation cache.
+        file_path : str
+            The path to the file.
+        schema : Schema
+            The schema the file (or each element of it) was validated against.
+        fingerprint : tuple[int, int]
+            The file's modification time and size (see `bundle.fingerprint`) from before it was read to be validated.
+    '''
+    try:
+        digest = compiled_bank.hash_file(file_path)
+        if bundles.fingerprint(file_path) != fingerprint:
+            return
+    except OSError:
+        return
+    cache = load_validation_cache(cache_path)
+    cache[os.path.abspath(file_path)] = (*fingerprint, digest, schema.get_fingerprint)
+    save_validation_cache(cache_path, cache)
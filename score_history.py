@@ -0,0 +1,495 @@
+import datetime
+import hashlib
+import heapq
+import os
+import struct
+import sys
+from array import array
+from bisect import bisect_left, bisect_right
+from typing import Iterable, Iterator
+
+import file_handling as files
+from profiling import profiler
+
+# Timestamps are stored as whole seconds since this (naive) time. The wall-clock time a score was saved at is stored as if it were UTC, so converting back never depends on the local time zone or daylight saving.
+EPOCH = datetime.datetime(1970, 1, 1)
+ONE_SECOND = datetime.timedelta(seconds=1)
+
+# File layout (all integers little-endian):
+#
+#   Header  MAGIC, version, user count, SHA-256 of everything after the header
+#   Users   One per user: u32 name length, u32 score count, UTF-8 name, then the user's timestamps
+#           (i64 epoch seconds, oldest first) followed by their scores (u8, in the same order)
+MAGIC = b'QSCH'
+VERSION = 1
+HEADER = struct.Struct('<4sHI32s')
+USER = struct.Struct('<II')
+
+def time_stamp_to_epoch(time_stamp:str) -> int:
+    '''
+    Parameters:
+        time_stamp : str
+            A timestamp starting with "YYYY-MM-DD HH:MM:SS" (anything after that is ignored).
+
+    Raises:
+        ValueError
+            If the timestamp isn't a valid date and time.
+
+    Returns:
+        The timestamp in epoch seconds.
+    '''
+    return (datetime.datetime.fromisoformat(time_stamp[:19]) - EPOCH) // ONE_SECOND
+
+def epoch_to_datetime(epoch:int) -> datetime.datetime:
+    '''
+    Parameters:
+        epoch : int
+            A timestamp in epoch seconds.
+
+    Returns:
+        The timestamp as a (naive) `datetime`, for display.
+    '''
+    return EPOCH + datetime.timedelta(seconds=epoch)
+
+def epoch_to_time_stamp(epoch:int) -> str:
+    '''
+    Parameters:
+        epoch : int
+            A timestamp in epoch seconds.
+
+    Returns:
+        The timestamp formatted as "YYYY-MM-DD HH:MM:SS", as other score stores save it.
+    '''
+    return epoch_to_datetime(epoch).isoformat(' ')
+
+def page_of_columns(times:array, scores:array, limit:int|None, cursor:tuple[int, int]|None = None) -> list[tuple[int, int]]:
+    '''
+    Select one page of one user's scores, in `user_score_order` (best score first, then oldest first), straight from their columns.
+
+    Scores are only 0 to 100, so rather than sorting, each score is looked for in turn from 100 down: its positions are found with `bytes.find`, and come out oldest first because the columns are kept in time order.
+
+    Parameters:
+        times : array
+            The user's timestamps (epoch seconds, oldest first).
+        scores : array
+            The user's scores, in the same order.
+        limit : int | None
+            The maximum number of scores on the page. `None` for all of them.
+        cursor : tuple[int, int] | None
+            The timestamp and score of the last row of the previous page. `None` for the first page.
+
+    Returns:
+        Up to `limit` tuples of timestamp and score that come after `cursor`.
+    '''
+    if limit is None:
+        limit = len(scores)
+    packed = scores.tobytes()
+
+    top = 100
+    start = 0
+    if cursor is not None:
+        cursor_time, top = cursor
+        # Scores equal to the cursor's carry on after it (timestamps are unique per user).
+        start = bisect_right(times, cursor_time)
+
+    page:list[tuple[int, int]] = []
+    for score in range(top, -1, -1):
+        position = packed.find(score, start)
+        while position != -1:
+            if len(page) == limit:
+                return page
+            page.append((times[position], score))
+            position = packed.find(score, position + 1)
+        start = 0
+    return page
+
+class ScoreHistory:
+    '''
+    Every saved score, stored in columns rather than as a dictionary per user.
+
+    Each user gets an id; their timestamps are kept in a packed array of epoch seconds (oldest first) with their scores in a parallel array of unsigned bytes, so a score takes 9 bytes instead of a timestamp string and a dictionary entry. One user's scores, or the scores in a time window, are slices of these arrays; timestamps are only formatted when they are displayed.
+
+    Attributes:
+        __user_ids : dict[str, int]
+            Every user's id, keyed by name.
+        __names : list[str]
+            Every user's name, indexed by id.
+        __times : list[array]
+            Every user's timestamps (`array('q')` of epoch seconds, oldest first), indexed by id.
+        __scores : list[array]
+            Every user's scores (`array('B')`, in the same order as their timestamps), indexed by id.
+    '''
+
+    def __init__(self):
+        self.__user_ids:dict[str, int] = {}
+        self.__names:list[str] = []
+        self.__times:list[array] = []
+        self.__scores:list[array] = []
+
+    def __len__(self) -> int:
+        return sum(len(scores) for scores in self.__scores)
+
+    @property
+    def get_names(self) -> list[str]:
+        return self.__names
+
+    def __user_id(self, name:str) -> int:
+        '''
+        Parameters:
+            name : str
+                The user's name.
+
+        Returns:
+            The user's id, adding them if they are new.
+        '''
+        user_id = self.__user_ids.get(name)
+        if user_id is None:
+            user_id = len(self.__names)
+            self.__user_ids[name] = user_id
+            self.__names.append(name)
+            self.__times.append(array('q'))
+            self.__scores.append(array('B'))
+        return user_id
+
+    def add(self, name:str, epoch:int, score:int) -> int|None:
+        '''
+        Add a score, replacing any already saved under the same name and timestamp.
+
+        Parameters:
+            name : str
+                The name to save the score under.
+            epoch : int
+                When the score was achieved (epoch seconds).
+            score : int
+                The score (0 to 100).
+
+        Raises:
+            ValueError
+                If the score isn't from 0 to 100.
+
+        Returns:
+            The score that was replaced, or `None` if the score is new.
+        '''
+        if score not in range(0, 101):
+            raise ValueError(score)
+        user_id = self.__user_id(name)
+        times = self.__times[user_id]
+        scores = self.__scores[user_id]
+
+        # Scores are nearly always newer than everything before them.
+        if len(times) == 0 or epoch > times[-1]:
+            times.append(epoch)
+            scores.append(score)
+            return None
+        position = bisect_left(times, epoch)
+        if position < len(times) and times[position] == epoch:
+            replaced = scores[position]
+            scores[position] = score
+            return replaced
+        times.insert(position, epoch)
+        scores.insert(position, score)
+        return None
+
+    def get_user_columns(self, name:str) -> tuple[array, array]:
+        '''
+        Parameters:
+            name : str
+                The user's name.
+
+        Returns:
+            The user's timestamps and scores (see `ScoreHistory`), which must not be modified. Both are empty if the user has no scores.
+        '''
+        user_id = self.__user_ids.get(name)
+        if user_id is None:
+            return array('q'), array('B')
+        return self.__times[user_id], self.__scores[user_id]
+
+    def get_user_page(self, name:str, limit:int|None, cursor:tuple[int, int]|None = None) -> list[tuple[int, int]]:
+        '''
+        See `page_of_columns`.
+        '''
+        return page_of_columns(*self.get_user_columns(name), limit, cursor)
+
+    def get_top(self, limit:int, cursor:tuple[str, int, int]|None = None) -> list[tuple[str, int, int]]:
+        '''
+        Parameters:
+            limit : int
+                The maximum number of scores to return.
+            cursor : tuple[str, int, int] | None
+                The last row of the previous page. `None` for the first page.
+
+        Returns:
+            The next best scores saved under any name (best first, then oldest first, then by name) as tuples of name, timestamp and score.
+        '''
+        candidates:list[tuple[int, int, str]] = []
+        for name in self.__names:
+            # Each user's page starts after the cursor's score and timestamp, or at that timestamp if their name comes after the cursor's.
+            user_cursor = None if cursor is None else (cursor[1] - 1 if name > cursor[0] else cursor[1], cursor[2])
+            candidates.extend((-score, epoch, name) for epoch, score in self.get_user_page(name, limit, user_cursor))
+        return [(name, epoch, -negative_score) for negative_score, epoch, name in heapq.nsmallest(limit, candidates)]
+
+    def get_between(self, start:int, end:int) -> list[tuple[str, int, int]]:
+        '''
+        Parameters:
+            start : int
+                The earliest timestamp to include (epoch seconds).
+            end : int
+                The latest timestamp to include (epoch seconds).
+
+        Returns:
+            The scores saved between `start` and `end` (inclusive) under any name, oldest first, as tuples of name, timestamp and score.
+        '''
+        rows:list[tuple[str, int, int]] = []
+        for user_id, name in enumerate(self.__names):
+            times = self.__times[user_id]
+            first = bisect_left(times, start)
+            last = bisect_right(times, end)
+            rows.extend(zip([name] * (last - first), times[first:last], self.__scores[user_id][first:last]))
+        rows.sort(key=lambda row: (row[1], row[0]))
+        return rows
+
+    def rows(self) -> Iterator[tuple[str, int, int]]:
+        '''
+        Returns:
+            A generator of every score as a tuple of name, timestamp and score.
+        '''
+        for user_id, name in enumerate(self.__names):
+            yield from zip([name] * len(self.__times[user_id]), self.__times[user_id], self.__scores[user_id])
+
+    def to_scores(self) -> dict[str, dict[str, int]]:
+        '''
+        Returns:
+            The scores in the JSON score file's format.
+        '''
+        return {name : {epoch_to_time_stamp(epoch) : score for epoch, score in zip(self.__times[user_id], self.__scores[user_id])} for user_id, name in enumerate(self.__names)}
+
+    @classmethod
+    def from_rows(cls, rows:Iterable[tuple[str, str, int]]) -> 'ScoreHistory':
+        '''
+        Parameters:
+            rows : Iterable[tuple[str, str, int]]
+                Names, timestamps (formatted, see `time_stamp_to_epoch`) and scores.
+
+        Raises:
+            ValueError
+                If a timestamp or score is invalid.
+
+        Returns:
+            A new history of the scores.
+        '''
+        history = cls()
+        history.add_rows(rows)
+        return history
+
+    def add_rows(self, rows:Iterable[tuple[str, str, int]]):
+        '''
+        Add scores with formatted timestamps (see `from_rows`).
+        '''
+        for name, time_stamp, score in rows:
+            self.add(name, time_stamp_to_epoch(time_stamp), score)
+
+    def encode(self) -> bytes:
+        '''
+        Returns:
+            The history in the score history file format.
+        '''
+        body:list[bytes] = []
+        for user_id, name in enumerate(self.__names):
+            encoded_name = name.encode('utf-8')
+            times = self.__times[user_id]
+            body.append(USER.pack(len(encoded_name), len(times)))
+            body.append(encoded_name)
+            if sys.byteorder != 'little':
+                times = array('q', times)
+                times.byteswap()
+            body.append(times.tobytes())
+            body.append(self.__scores[user_id].tobytes())
+        body_bytes = b''.join(body)
+        return HEADER.pack(MAGIC, VERSION, len(self.__names), hashlib.sha256(body_bytes).digest()) + body_bytes
+
+    @classmethod
+    def decode(cls, contents:bytes) -> 'ScoreHistory':
+        '''
+        Parameters:
+            contents : bytes
+                A history in the score history file format.
+
+        Raises:
+            ValueError
+                If the contents are not a valid history (including if their checksum doesn't match).
+
+        Returns:
+            The decoded history.
+        '''
+        if len(contents) < HEADER.size:
+            raise ValueError
+        magic, version, user_count, digest = HEADER.unpack_from(contents)
+        view = memoryview(contents)[HEADER.size:]
+        if magic != MAGIC or version != VERSION or hashlib.sha256(view).digest() != digest:
+            raise ValueError
+
+        history = cls()
+        position = 0
+        for _ in range(user_count):
+            try:
+                name_length, count = USER.unpack_from(view, position)
+            except struct.error:
+                raise ValueError
+            position += USER.size
+            end = position + name_length + count * 9
+            if end > len(view):
+                raise ValueError
+            name = str(view[position:position + name_length], 'utf-8')
+            position += name_length
+
+            times = array('q')
+            times.frombytes(view[position:position + count * 8])
+            if sys.byteorder != 'little':
+                times.byteswap()
+            position += count * 8
+            scores = array('B', view[position:end])
+            position = end
+
+            if name in history.__user_ids or (count > 0 and max(scores) > 100):
+                raise ValueError
+            user_id = history.__user_id(name)
+            history.__times[user_id] = times
+            history.__scores[user_id] = scores
+
+        if position != len(view):
+            raise ValueError
+        return history
+
+def load_score_history_snapshot(file_path:str) -> ScoreHistory:
+    '''
+    Load a score history file (without its journal).
+
+    Parameters:
+        file_path : str
+            The path to the score history file.
+
+    Raises:
+        ValueError
+            If the history is formatted incorrectly.
+
+    Returns:
+        The loaded history, which is empty if the history file was not found.
+    '''
+    try:
+        file = open(file_path, 'rb')
+    except FileNotFoundError:
+        return ScoreHistory()
+    try:
+        contents = file.read()
+    finally:
+        file.close()
+    profiler.count('bytes_read', len(contents))
+    return ScoreHistory.decode(contents)
+
+def read_snapshot_digest(file_path:str) -> bytes|None:
+    '''
+    Parameters:
+        file_path : str
+            The path to the score history file.
+
+    Returns:
+        The checksum (SHA-256 digest) recorded in the history file's header, which identifies its contents, or `None` if the file was not found or has no header.
+    '''
+    try:
+        file = open(file_path, 'rb')
+    except FileNotFoundError:
+        return None
+    try:
+        header = file.read(HEADER.size)
+    finally:
+        file.close()
+    if len(header) < HEADER.size:
+        return None
+    return HEADER.unpack(header)[3]
+
+def load_journal_into(history:ScoreHistory, journal_path:str):
+    '''
+    Add the scores from a score journal to a history.
+
+    Parameters:
+        history : ScoreHistory
+            The history to add the scores to.
+        journal_path : str
+            The path to the journal.
+
+    Raises:
+        ValueError
+            If the journal is formatted incorrectly.
+    '''
+    records = files.load_score_journal(journal_path)
+    files.validate_scores([time_stamp for _, time_stamp, _ in records], (score for _, _, score in records))
+    history.add_rows(records)
+
+@profiler.timed('scores.load')
+def load_score_history(file_path:str) -> ScoreHistory:
+    '''
+    Load a score history file and its journal.
+
+    Like the JSON score file, the history file is a snapshot of all scores up to its last compaction; scores saved since then are read from its journal (see `file_handling.append_score_record`).
+
+    Parameters:
+        file_path : str
+            The path to the score history file.
+
+    Raises:
+        ValueError
+            If the history or its journal is formatted incorrectly.
+
+    Returns:
+        The loaded history, which is empty if the history file was not found.
+    '''
+    with files.lock_score_file(file_path):
+        history = load_score_history_snapshot(file_path)
+        # A journal left over from an interrupted compaction comes before the current one.
+        for journal_path in [files.score_journal_path(file_path) + '.compacting', files.score_journal_path(file_path)]:
+            load_journal_into(history, journal_path)
+    return history
+
+def save_score_history(file_path:str, history:ScoreHistory, create:bool = False) -> bytes|None:
+    '''
+    Save a score history, atomically replacing the history file and discarding its journal (see `file_handling.replace_score_file`).
+
+    Parameters:
+        file_path : str
+            The path to the score history file.
+        history : ScoreHistory
+            The history to save.
+        create : bool
+            Whether to only save the history if there is no history file or journal yet.
+
+    Returns:
+        The checksum recorded in the new history file's header (see `read_snapshot_digest`), or `None` if `create` was set and the history file or journal already existed.
+    '''
+    contents = history.encode()
+    if not files.replace_score_file(file_path, contents, create):
+        return None
+    return HEADER.unpack_from(contents)[3]
+
+@profiler.timed('scores.compact')
+def compact_score_history(file_path:str) -> tuple[ScoreHistory, bytes]|None:
+    '''
+    Fold the journal into the score history file (see `file_handling.compact_journal`).
+
+    Parameters:
+        file_path : str
+            The path to the score history file.
+
+    Raises:
+        ValueError
+            If the history or its journal is formatted incorrectly.
+
+    Returns:
+        The new contents of the history file and its checksum, or `None` if there was nothing to compact.
+    '''
+    def merge(compacting_path:str) -> tuple[bytes, tuple[ScoreHistory, bytes]]:
+        history = load_score_history_snapshot(file_path)
+        load_journal_into(history, compacting_path)
+        contents = history.encode()
+        return contents, (history, HEADER.unpack_from(contents)[3])
+
+    return files.compact_journal(file_path, merge)
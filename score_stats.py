@@ -0,0 +1,302 @@
+import json
+import os
+from array import array
+from typing import Iterable
+
+import file_handling as files
+from profiling import profiler
+
+# The number of most recent scores the moving average is taken over.
+MOVING_AVERAGE_LENGTH = 10
+# Bump whenever the stats file format changes, so that old stats files are rebuilt.
+STATS_VERSION = 1
+
+class UserStats:
+    '''
+    Running aggregates of one user's scores, updated in constant time as each score is saved.
+
+    Attributes:
+        __count : int
+            The number of scores.
+        __total : int
+            The sum of the scores.
+        __best : int
+            The best score.
+        __recent : list[int]
+            The last `MOVING_AVERAGE_LENGTH` scores, oldest first.
+    '''
+
+    __slots__ = ('__count', '__total', '__best', '__recent')
+
+    def __init__(self, count:int = 0, total:int = 0, best:int = 0, recent:list[int]|None = None):
+        self.__count = count
+        self.__total = total
+        self.__best = best
+        self.__recent = [] if recent is None else list(recent[-MOVING_AVERAGE_LENGTH:])
+
+    def __str__(self) -> str:
+        return f'''count: {self.__count}
+mean: {self.get_mean}
+best: {self.__best}
+moving_average: {self.get_moving_average}'''
+
+    @property
+    def get_count(self) -> int:
+        return self.__count
+    @property
+    def get_total(self) -> int:
+        return self.__total
+    @property
+    def get_best(self) -> int:
+        return self.__best
+    @property
+    def get_recent(self) -> list[int]:
+        return self.__recent
+    @property
+    def get_mean(self) -> float:
+        return self.__total / self.__count if self.__count > 0 else 0.0
+    @property
+    def get_moving_average(self) -> float:
+        '''
+        The mean of the last `MOVING_AVERAGE_LENGTH` scores.
+        '''
+        return sum(self.__recent) / len(self.__recent) if len(self.__recent) > 0 else 0.0
+
+    def add(self, score:int):
+        '''
+        Parameters:
+            score : int
+                A newly saved score.
+        '''
+        self.__count += 1
+        self.__total += score
+        self.__best = max(self.__best, score)
+        self.__recent.append(score)
+        if len(self.__recent) > MOVING_AVERAGE_LENGTH:
+            del self.__recent[0]
+
+    @classmethod
+    def from_scores(cls, scores:array) -> 'UserStats':
+        '''
+        Parameters:
+            scores : array
+                All of one user's scores (`array('B')`), oldest first.
+
+        Returns:
+            The aggregates of the scores, worked out in bulk.
+        '''
+        if len(scores) == 0:
+            return cls()
+        return cls(len(scores), sum(scores), max(scores), scores[-MOVING_AVERAGE_LENGTH:].tolist())
+
+class ScoreStats:
+    '''
+    Running aggregates of every user's scores, and a histogram of every score (which can only be 0 to 100), so that "how am I doing" and "what percentile am I" are answered without reading any saved scores.
+
+    Attributes:
+        __users : dict[str, UserStats]
+            Every user's aggregates, keyed by name.
+        __histogram : array
+            The number of saved scores of each value from 0 to 100 (`array('Q')`, indexed by score).
+    '''
+
+    def __init__(self):
+        self.__users:dict[str, UserStats] = {}
+        self.__histogram = array('Q', bytes(8 * 101))
+
+    @property
+    def get_count(self) -> int:
+        return sum(self.__histogram)
+
+    def get_user(self, name:str) -> UserStats|None:
+        '''
+        Parameters:
+            name : str
+                The user's name.
+
+        Returns:
+            The user's aggregates, or `None` if they have no scores.
+        '''
+        return self.__users.get(name)
+
+    def add(self, name:str, score:int):
+        '''
+        Parameters:
+            name : str
+                The name a new score was saved under.
+            score : int
+                The score.
+        '''
+        user = self.__users.get(name)
+        if user is None:
+            user = self.__users[name] = UserStats()
+        user.add(score)
+        self.__histogram[score] += 1
+
+    def insert(self, name:str, score:int, scores:array):
+        '''
+        Update the aggregates after a score older than some of the user's saved scores was added (e.g. by merging or regrading), so that the moving average is still over their latest scores. The user's aggregates are worked out again from their scores.
+
+        Parameters:
+            name : str
+                The name the score was saved under.
+            score : int
+                The score.
+            scores : array
+                All of the user's scores (`array('B')`, with the new score), oldest first.
+        '''
+        self.__histogram[score] += 1
+        self.__users[name] = UserStats.from_scores(scores)
+
+    def replace(self, name:str, old_score:int, new_score:int, scores:array):
+        '''
+        Update the aggregates after a saved score was replaced (rather than a new one added). The user's aggregates are worked out again from their scores.
+
+        Parameters:
+            name : str
+                The name the score was saved under.
+            old_score : int
+                The score that was replaced.
+            new_score : int
+                The score it was replaced with.
+            scores : array
+                All of the user's scores (`array('B')`, with the new score), oldest first.
+        '''
+        self.__histogram[old_score] -= 1
+        self.__histogram[new_score] += 1
+        self.__users[name] = UserStats.from_scores(scores)
+
+    def get_percentile(self, score:int) -> float|None:
+        '''
+        Parameters:
+            score : int
+                The score to rank.
+
+        Returns:
+            The percentage (0 to 100) of saved scores that are lower than `score`, or `None` if no scores have been saved.
+        '''
+        count = self.get_count
+        if count == 0:
+            return None
+        return 100 * sum(self.__histogram[:max(0, min(score, 101))]) / count
+
+    @classmethod
+    def from_user_scores(cls, user_scores:Iterable[tuple[str, array]]) -> 'ScoreStats':
+        '''
+        Work out the aggregates from scratch.
+
+        Parameters:
+            user_scores : Iterable[tuple[str, array]]
+                Every user's name and scores (`array('B')`, oldest first).
+
+        Returns:
+            The aggregates.
+        '''
+        stats = cls()
+        every_score = bytearray()
+        for name, scores in user_scores:
+            if len(scores) > 0:
+                stats.__users[name] = UserStats.from_scores(scores)
+                every_score += scores
+        stats.__histogram = array('Q', [every_score.count(score) for score in range(101)])
+        return stats
+
+    def encode(self) -> dict:
+        '''
+        Returns:
+            The aggregates as JSON-serialisable values.
+        '''
+        return {
+            'histogram' : self.__histogram.tolist()
+            ,'users' : {name : [user.get_count, user.get_total, user.get_best, user.get_recent] for name, user in self.__users.items()}
+        }
+
+    @classmethod
+    def decode(cls, values:dict) -> 'ScoreStats':
+        '''
+        Parameters:
+            values : dict
+                Aggregates encoded with `encode`.
+
+        Raises:
+            ValueError
+                If the values are not valid aggregates.
+
+        Returns:
+            The decoded aggregates.
+        '''
+        stats = cls()
+        try:
+            stats.__histogram = array('Q', values['histogram'])
+            for name, (count, total, best, recent) in values['users'].items():
+                stats.__users[name] = UserStats(count, total, best, recent)
+        except (KeyError, TypeError, OverflowError):
+            raise ValueError
+        if len(stats.__histogram) != 101:
+            raise ValueError
+        return stats
+
+def score_stats_path(file_path:str) -> str:
+    '''
+    Parameters:
+        file_path : str
+            The path to the score data the stats are for.
+
+    Returns:
+        The path to the stats file.
+    '''
+    return file_path + '.stats'
+
+def load_score_stats(file_path:str, digest:bytes) -> ScoreStats|None:
+    '''
+    Load the stats saved next to some score data.
+
+    Parameters:
+        file_path : str
+            The path to the score data.
+        digest : bytes
+            The SHA-256 digest of the score data the stats must be for.
+
+    Returns:
+        The stats, or `None` if they are missing, unreadable, or for different score data (so they need rebuilding).
+    '''
+    try:
+        file = open(score_stats_path(file_path), 'r')
+    except FileNotFoundError:
+        return None
+    try:
+        values = json.load(file)
+    except ValueError:
+        return None
+    finally:
+        file.close()
+
+    if not isinstance(values, dict) or values.get('version') != STATS_VERSION or values.get('sha256') != digest.hex():
+        return None
+    try:
+        return ScoreStats.decode(values)
+    except ValueError:
+        return None
+
+@profiler.timed('scores.save_stats')
+def save_score_stats(file_path:str, stats:ScoreStats, digest:bytes):
+    '''
+    Save stats next to some score data. Failing to save them is not an error: they are rebuilt the next time they are needed.
+
+    Parameters:
+        file_path : str
+            The path to the score data.
+        stats : ScoreStats
+            The stats to save.
+        digest : bytes
+            The SHA-256 digest of the score data the stats are for.
+    '''
+    contents = json.dumps({'version' : STATS_VERSION, 'sha256' : digest.hex(), **stats.encode()}).encode('utf-8')
+    try:
+        temporary_path = files.write_temporary_file(score_stats_path(file_path), contents)
+    except OSError:
+        return
+    try:
+        os.replace(temporary_path, score_stats_path(file_path))
+    except OSError:
+        os.remove(temporary_path)
@@ -0,0 +1,622 @@
+import heapq
+import os
+import sqlite3
+from abc import ABC, abstractmethod
+from array import array
+from typing import Callable, Iterable
+
+import file_handling as files
+import score_history
+import score_stats
+from score_history import ScoreHistory, epoch_to_time_stamp, time_stamp_to_epoch
+from score_stats import ScoreStats, UserStats, MOVING_AVERAGE_LENGTH
+
+def user_score_order(row:tuple[str, int]) -> tuple:
+    '''
+    The order one user's scores are listed in: best score first, then oldest first.
+
+    Parameters:
+        row : tuple[str, int]
+            A timestamp (formatted, or in epoch seconds) and score.
+    '''
+    return (-row[1], row[0])
+
+def leaderboard_order(row:tuple[str, str, int]) -> tuple:
+    '''
+    The order scores from all users are listed in: best score first, then oldest first, then by name.
+
+    Parameters:
+        row : tuple[str, str, int]
+            A name, timestamp (formatted, or in epoch seconds) and score.
+    '''
+    return (-row[2], row[1], row[0])
+
+def page_of_scores(rows:Iterable[tuple], limit:int|None, cursor:tuple|None, order:Callable[[tuple], tuple]) -> list[tuple]:
+    '''
+    Select one page of scores without sorting (or copying) all of them.
+
+    Parameters:
+        rows : Iterable[tuple]
+            The scores to select from, in any order.
+        limit : int | None
+            The maximum number of scores on the page. `None` for all of them.
+        cursor : tuple | None
+            The last row of the previous page. `None` for the first page.
+        order : Callable[[tuple], tuple]
+            The order the rows are listed in (e.g. `user_score_order`).
+
+    Returns:
+        Up to `limit` of the rows that come after `cursor`, in order.
+    '''
+    if cursor is not None:
+        after = order(cursor)
+        rows = (row for row in rows if order(row) > after)
+    if limit is None:
+        return sorted(rows, key=order)
+    return heapq.nsmallest(limit, rows, key=order)
+
+def stats_of_history(history:ScoreHistory) -> ScoreStats:
+    '''
+    Parameters:
+        history : ScoreHistory
+            Saved scores.
+
+    Returns:
+        The aggregates of the scores, worked out from scratch.
+    '''
+    return ScoreStats.from_user_scores((name, history.get_user_columns(name)[1]) for name in history.get_names)
+
+class ScoreStore(ABC):
+    '''
+    Abstract base class for the places scores can be saved. Every store implements the methods marked `abstractmethod`; `add_scores` and `close` have defaults.
+
+    Scores are saved and identified by the name they were saved under and their timestamp (formatted with `DisplayText.TIME_STAMP`, so that timestamps sort chronologically as strings). Pages of scores for display give timestamps in epoch seconds instead (see `score_history.time_stamp_to_epoch`), so they are only formatted when they are displayed.
+
+    Attributes:
+        __path : str
+            The path to the file the scores are stored in.
+        __corrupted : bool
+            Whether the stored scores could not be read.
+    '''
+
+    def __init__(self, path:str, corrupted:bool = False):
+        self.__path = path
+        self.__corrupted = corrupted
+
+    @property
+    def get_path(self) -> str:
+        return self.__path
+    @property
+    def get_corrupted(self) -> bool:
+        return self.__corrupted
+
+    def _set_corrupted(self, corrupted:bool):
+        self.__corrupted = corrupted
+
+    @abstractmethod
+    def add_score(self, name:str, time_stamp:str, score:int):
+        '''
+        Save a score.
+
+        Parameters:
+            name : str
+                The name to save the score under.
+            time_stamp : str
+                When the score was achieved.
+            score : int
+                The score.
+        '''
+
+    def add_scores(self, rows:Iterable[tuple[str, str, int]]):
+        '''
+        Save many scores at once, replacing any already saved under the same name and timestamp.
+
+        Parameters:
+            rows : Iterable[tuple[str, str, int]]
+                The names, timestamps and scores to save.
+        '''
+        for name, time_stamp, score in rows:
+            self.add_score(name, time_stamp, score)
+
+    @abstractmethod
+    def reset(self, scores:dict[str, dict[str, int]]):
+        '''
+        Replace everything in the store (e.g. because it is corrupted) with `scores`.
+
+        Parameters:
+            scores : dict[str, dict[str, int]]
+                The scores to store instead.
+        '''
+
+    @abstractmethod
+    def get_user_scores(self, name:str) -> dict[str, int]:
+        '''
+        Parameters:
+            name : str
+                The name the scores were saved under.
+
+        Returns:
+            The user's scores keyed by timestamp, or an empty dictionary if they have none.
+        '''
+
+    @abstractmethod
+    def get_user_scores_page(self, name:str, limit:int|None, cursor:tuple[int, int]|None = None) -> list[tuple[int, int]]:
+        '''
+        Parameters:
+            name : str
+                The name the scores were saved under.
+            limit : int | None
+                The maximum number of scores to return. `None` for all of them.
+            cursor : tuple[int, int] | None
+                The last row of the previous page. `None` for the first page.
+
+        Returns:
+            The user's next best scores (in `user_score_order`) as tuples of timestamp (in epoch seconds) and score.
+        '''
+
+    @abstractmethod
+    def get_top_scores(self, limit:int, cursor:tuple[str, int, int]|None = None) -> list[tuple[str, int, int]]:
+        '''
+        Parameters:
+            limit : int
+                The maximum number of scores to return.
+            cursor : tuple[str, int, int] | None
+                The last row of the previous page. `None` for the first page.
+
+        Returns:
+            The next best scores saved under any name (in `leaderboard_order`) as tuples of name, timestamp (in epoch seconds) and score.
+        '''
+
+    @abstractmethod
+    def get_scores_between(self, start:str, end:str) -> list[tuple[str, str, int]]:
+        '''
+        Parameters:
+            start : str
+                The earliest timestamp to include.
+            end : str
+                The latest timestamp to include.
+
+        Returns:
+            The scores saved between `start` and `end` (inclusive) under any name, oldest first, as tuples of name, timestamp and score.
+        '''
+
+    @abstractmethod
+    def get_user_stats(self, name:str) -> UserStats|None:
+        '''
+        Parameters:
+            name : str
+                The name the scores were saved under.
+
+        Returns:
+            Aggregates of the user's scores (count, mean, best and moving average), or `None` if they have none.
+        '''
+
+    @abstractmethod
+    def get_percentile(self, score:int) -> float|None:
+        '''
+        Parameters:
+            score : int
+                The score to rank.
+
+        Returns:
+            The percentage (0 to 100) of saved scores under any name that are lower than `score`, or `None` if no scores have been saved.
+        '''
+
+    def close(self):
+        '''
+        Release any resources held by the store.
+        '''
+        pass
+
+class JsonScoreStore(ScoreStore):
+    '''
+    Scores kept in the JSON score file and its journal.
+
+    The whole file has to be loaded to answer any query, so it is loaded once when the store is opened.
+
+    Attributes:
+        __scores : dict[str, dict[str, int]]
+            All the saved scores.
+        __journal_compaction_size : int
+            The size (in bytes) the score journal can grow to before it is folded into the score file.
+    '''
+
+    def __init__(self, score_file_path:str, journal_compaction_size:int = 65536):
+        try:
+            self.__scores = files.load_score_file(score_file_path)
+            corrupted = False
+        except ValueError:
+            self.__scores = {}
+            corrupted = True
+        super().__init__(score_file_path, corrupted)
+        self.__journal_compaction_size = journal_compaction_size
+
+    def add_score(self, name:str, time_stamp:str, score:int):
+        self.__scores.setdefault(name, {})[time_stamp] = score
+        journal_size = files.append_score_record(self.get_path, name, time_stamp, score)
+        if journal_size > self.__journal_compaction_size:
+            files.compact_score_file(self.get_path)
+
+    def add_scores(self, rows:Iterable[tuple[str, str, int]]):
+        rows = list(rows)
+        for name, time_stamp, score in rows:
+            self.__scores.setdefault(name, {})[time_stamp] = score
+        journal_size = files.append_score_records(self.get_path, rows)
+        if journal_size > self.__journal_compaction_size:
+            files.compact_score_file(self.get_path)
+
+    def reset(self, scores:dict[str, dict[str, int]]):
+        self.__scores = {name : dict(user_scores) for name, user_scores in scores.items()}
+        files.save_score_file(self.get_path, self.__scores)
+        self._set_corrupted(False)
+
+    def get_user_scores(self, name:str) -> dict[str, int]:
+        return dict(self.__scores.get(name, {}))
+
+    def get_user_scores_page(self, name:str, limit:int|None, cursor:tuple[int, int]|None = None) -> list[tuple[int, int]]:
+        if cursor is not None:
+            cursor = (epoch_to_time_stamp(cursor[0]), cursor[1])
+        page = page_of_scores(self.__scores.get(name, {}).items(), limit, cursor, user_score_order)
+        return [(time_stamp_to_epoch(time_stamp), score) for time_stamp, score in page]
+
+    def get_top_scores(self, limit:int, cursor:tuple[str, int, int]|None = None) -> list[tuple[str, int, int]]:
+        if cursor is not None:
+            cursor = (cursor[0], epoch_to_time_stamp(cursor[1]), cursor[2])
+        all_scores = ((name, time_stamp, score) for name, user_scores in self.__scores.items() for time_stamp, score in user_scores.items())
+        page = page_of_scores(all_scores, limit, cursor, leaderboard_order)
+        return [(name, time_stamp_to_epoch(time_stamp), score) for name, time_stamp, score in page]
+
+    def get_scores_between(self, start:str, end:str) -> list[tuple[str, str, int]]:
+        in_range = [(name, time_stamp, score) for name, user_scores in self.__scores.items() for time_stamp, score in user_scores.items() if start <= time_stamp <= end]
+        in_range.sort(key=lambda item: item[1])
+        return in_range
+
+    def get_user_stats(self, name:str) -> UserStats|None:
+        user_scores = self.__scores.get(name)
+        if not user_scores:
+            return None
+        return UserStats.from_scores(array('B', [user_scores[time_stamp] for time_stamp in sorted(user_scores)]))
+
+    def get_percentile(self, score:int) -> float|None:
+        # The score file has no running aggregates, so every score is counted.
+        count = sum(len(user_scores) for user_scores in self.__scores.values())
+        if count == 0:
+            return None
+        return 100 * sum(1 for user_scores in self.__scores.values() for saved in user_scores.values() if saved < score) / count
+
+class SqliteScoreStore(ScoreStore):
+    '''
+    Scores kept in an SQLite database (in WAL mode, so readers don't block the writer).
+
+    Scores are indexed by name, timestamp and score, so one user's history, leaderboards and date ranges are all answered from an index without reading every score.
+
+    Attributes:
+        __connection : sqlite3.Connection
+            The connection to the database.
+    '''
+
+    SCHEMA = '''
+        CREATE TABLE IF NOT EXISTS scores (
+            name TEXT NOT NULL,
+            time_stamp TEXT NOT NULL,
+            score INTEGER NOT NULL CHECK (score BETWEEN 0 AND 100),
+            PRIMARY KEY (name, time_stamp)
+        ) WITHOUT ROWID;
+        CREATE INDEX IF NOT EXISTS scores_by_user_score ON scores (name, score DESC, time_stamp);
+        CREATE INDEX IF NOT EXISTS scores_by_score ON scores (score DESC, time_stamp, name);
+        CREATE INDEX IF NOT EXISTS scores_by_time_stamp ON scores (time_stamp);
+        CREATE TABLE IF NOT EXISTS metadata (
+            key TEXT PRIMARY KEY,
+            value TEXT NOT NULL
+        );
+    '''
+
+    def __init__(self, database_path:str, legacy_score_file_path:str|None = None):
+        super().__init__(database_path)
+        self.__connect()
+
+        if legacy_score_file_path is not None and not self.get_corrupted:
+            self.migrate_from_json(legacy_score_file_path)
+
+    def __connect(self):
+        '''
+        Open the database, creating the tables and indexes if they don't exist yet. Marks the store as corrupted if the file is not a valid database.
+        '''
+        self.__connection = sqlite3.connect(self.get_path, timeout=30, isolation_level=None)
+        try:
+            self.__connection.execute('PRAGMA journal_mode=WAL')
+            self.__connection.execute('PRAGMA synchronous=NORMAL')
+            self.__connection.executescript(self.SCHEMA)
+        except sqlite3.DatabaseError:
+            self._set_corrupted(True)
+        else:
+            self._set_corrupted(False)
+
+    def migrate_from_json(self, score_file_path:str):
+        '''
+        Copy the scores from a JSON score file (and its journal) into the database.
+
+        This only happens once per database: afterwards, the JSON file is ignored. Nothing is migrated if the JSON file is missing or corrupted.
+
+        Parameters:
+            score_file_path : str
+                The path to the JSON score file.
+        '''
+        MIGRATED_KEY = 'migrated_from_json'
+
+        if self.__connection.execute('SELECT 1 FROM metadata WHERE key = ?', (MIGRATED_KEY,)).fetchone() is not None:
+            return
+
+        try:
+            scores = files.load_score_file(score_file_path)
+        except ValueError:
+            scores = {}
+
+        with self.__connection:
+            self.__connection.execute('BEGIN IMMEDIATE')
+            # Another process may have migrated while this one was waiting for the lock.
+            if self.__connection.execute('SELECT 1 FROM metadata WHERE key = ?', (MIGRATED_KEY,)).fetchone() is not None:
+                return
+            self.__connection.executemany('INSERT OR REPLACE INTO scores (name, time_stamp, score) VALUES (?, ?, ?)', ((name, time_stamp, score) for name, user_scores in scores.items() for time_stamp, score in user_scores.items()))
+            self.__connection.execute('INSERT INTO metadata (key, value) VALUES (?, ?)', (MIGRATED_KEY, os.path.abspath(score_file_path)))
+
+    def add_score(self, name:str, time_stamp:str, score:int):
+        with self.__connection:
+            self.__connection.execute('INSERT OR REPLACE INTO scores (name, time_stamp, score) VALUES (?, ?, ?)', (name, time_stamp, score))
+
+    def add_scores(self, rows:Iterable[tuple[str, str, int]]):
+        with self.__connection:
+            self.__connection.execute('BEGIN IMMEDIATE')
+            self.__connection.executemany('INSERT OR REPLACE INTO scores (name, time_stamp, score) VALUES (?, ?, ?)', rows)
+
+    def reset(self, scores:dict[str, dict[str, int]]):
+        self.__connection.close()
+        for suffix in ['', '-wal', '-shm']:
+            if os.path.exists(self.get_path + suffix):
+                os.remove(self.get_path + suffix)
+        self.__connect()
+        with self.__connection:
+            self.__connection.execute('BEGIN IMMEDIATE')
+            self.__connection.executemany('INSERT OR REPLACE INTO scores (name, time_stamp, score) VALUES (?, ?, ?)', ((name, time_stamp, score) for name, user_scores in scores.items() for time_stamp, score in user_scores.items()))
+            # The old JSON scores were lost with the corrupted database; don't bring them back.
+            self.__connection.execute("INSERT OR REPLACE INTO metadata (key, value) VALUES ('migrated_from_json', '')")
+
+    def get_user_scores(self, name:str) -> dict[str, int]:
+        if self.get_corrupted:
+            return {}
+        rows = self.__connection.execute('SELECT time_stamp, score FROM scores WHERE name = ? ORDER BY score DESC', (name,))
+        return dict(rows)
+
+    def get_user_scores_page(self, name:str, limit:int|None, cursor:tuple[int, int]|None = None) -> list[tuple[int, int]]:
+        if self.get_corrupted:
+            return []
+        if limit is None:
+            limit = -1
+        if cursor is None:
+            page = self.__connection.execute('SELECT time_stamp, score FROM scores WHERE name = ? ORDER BY score DESC, time_stamp LIMIT ?', (name, limit)).fetchall()
+        else:
+            epoch, score = cursor
+            page = self.__connection.execute('SELECT time_stamp, score FROM scores WHERE name = ? AND (score < ? OR (score = ? AND time_stamp > ?)) ORDER BY score DESC, time_stamp LIMIT ?', (name, score, score, epoch_to_time_stamp(epoch), limit)).fetchall()
+        return [(time_stamp_to_epoch(time_stamp), score) for time_stamp, score in page]
+
+    def get_top_scores(self, limit:int, cursor:tuple[str, int, int]|None = None) -> list[tuple[str, int, int]]:
+        if self.get_corrupted:
+            return []
+        if cursor is None:
+            page = self.__connection.execute('SELECT name, time_stamp, score FROM scores ORDER BY score DESC, time_stamp, name LIMIT ?', (limit,)).fetchall()
+        else:
+            name, epoch, score = cursor
+            time_stamp = epoch_to_time_stamp(epoch)
+            page = self.__connection.execute('SELECT name, time_stamp, score FROM scores WHERE score < ? OR (score = ? AND (time_stamp > ? OR (time_stamp = ? AND name > ?))) ORDER BY score DESC, time_stamp, name LIMIT ?', (score, score, time_stamp, time_stamp, name, limit)).fetchall()
+        return [(name, time_stamp_to_epoch(time_stamp), score) for name, time_stamp, score in page]
+
+    def get_scores_between(self, start:str, end:str) -> list[tuple[str, str, int]]:
+        if self.get_corrupted:
+            return []
+        return self.__connection.execute('SELECT name, time_stamp, score FROM scores WHERE time_stamp BETWEEN ? AND ? ORDER BY time_stamp', (start, end)).fetchall()
+
+    def get_user_stats(self, name:str) -> UserStats|None:
+        if self.get_corrupted:
+            return None
+        count, total, best = self.__connection.execute('SELECT COUNT(*), TOTAL(score), MAX(score) FROM scores WHERE name = ?', (name,)).fetchone()
+        if count == 0:
+            return None
+        recent = self.__connection.execute('SELECT score FROM scores WHERE name = ? ORDER BY time_stamp DESC LIMIT ?', (name, MOVING_AVERAGE_LENGTH)).fetchall()
+        return UserStats(count, int(total), best, [score for (score,) in reversed(recent)])
+
+    def get_percentile(self, score:int) -> float|None:
+        if self.get_corrupted:
+            return None
+        count, lower = self.__connection.execute('SELECT COUNT(*), TOTAL(score < ?) FROM scores', (score,)).fetchone()
+        if count == 0:
+            return None
+        return 100 * lower / count
+
+    def close(self):
+        self.__connection.close()
+
+class ColumnarScoreStore(ScoreStore):
+    '''
+    Scores kept in a columnar score history file (see `ScoreHistory`) and its journal.
+
+    Running aggregates of the scores (see `ScoreStats`) are kept up to date as scores are saved, and saved next to the history file whenever it is rewritten. If they go missing or don't match the history file, they are rebuilt from it.
+
+    Attributes:
+        __history : ScoreHistory
+            All the saved scores.
+        __stats : ScoreStats
+            Running aggregates of all the saved scores.
+        __journal_compaction_size : int
+            The size (in bytes) the journal can grow to before it is folded into the history file.
+    '''
+
+    def __init__(self, history_path:str, legacy_score_file_path:str|None = None, journal_compaction_size:int = 65536):
+        super().__init__(history_path)
+        self.__journal_compaction_size = journal_compaction_size
+
+        if legacy_score_file_path is not None:
+            self.migrate_from_json(legacy_score_file_path)
+        try:
+            with files.lock_score_file(history_path):
+                self.__history = score_history.load_score_history_snapshot(history_path)
+                digest = score_history.read_snapshot_digest(history_path)
+                # A journal left over from an interrupted compaction comes before the current one.
+                records = [record for journal_path in [files.score_journal_path(history_path) + '.compacting', files.score_journal_path(history_path)] for record in files.load_score_journal(journal_path)]
+            files.validate_scores([time_stamp for _, time_stamp, _ in records], (score for _, _, score in records))
+            self.__stats = self.__load_stats(digest)
+            self.__add_rows(records)
+        except ValueError:
+            self.__history = ScoreHistory()
+            self.__stats = ScoreStats()
+            self._set_corrupted(True)
+
+    def __load_stats(self, digest:bytes|None) -> ScoreStats:
+        '''
+        Load the aggregates saved for the history file, rebuilding (and saving) them if they are missing or out of date.
+
+        Parameters:
+            digest : bytes | None
+                The history file's checksum, or `None` if there is no history file.
+
+        Returns:
+            The aggregates of the history file's scores.
+        '''
+        if digest is not None:
+            stats = score_stats.load_score_stats(self.get_path, digest)
+            if stats is not None:
+                return stats
+        stats = stats_of_history(self.__history)
+        if digest is not None:
+            score_stats.save_score_stats(self.get_path, stats, digest)
+        return stats
+
+    def __add_rows(self, rows:Iterable[tuple[str, str, int]]):
+        '''
+        Add scores to the history and the aggregates.
+
+        Parameters:
+            rows : Iterable[tuple[str, str, int]]
+                The names, timestamps and scores to add.
+        '''
+        for name, time_stamp, score in rows:
+            epoch = time_stamp_to_epoch(time_stamp)
+            replaced = self.__history.add(name, epoch, score)
+            if replaced is not None:
+                self.__stats.replace(name, replaced, score, self.__history.get_user_columns(name)[1])
+                continue
+            times, scores = self.__history.get_user_columns(name)
+            if times[-1] == epoch:
+                self.__stats.add(name, score)
+            else:
+                # Inserted before the user's latest score, rather than after it.
+                self.__stats.insert(name, score, scores)
+
+    def migrate_from_json(self, score_file_path:str):
+        '''
+        Copy the scores from a JSON score file (and its journal) into a new score history file.
+
+        This only happens if the history file and its journal don't exist yet: afterwards, the JSON file is ignored. Nothing is migrated if the JSON file is missing or corrupted.
+
+        Parameters:
+            score_file_path : str
+                The path to the JSON score file.
+        '''
+        journal_path = files.score_journal_path(self.get_path)
+        if any(os.path.exists(path) for path in [self.get_path, journal_path, journal_path + '.compacting']):
+            return
+        try:
+            scores = files.load_score_file(score_file_path)
+            history = ScoreHistory.from_rows((name, time_stamp, score) for name, user_scores in scores.items() for time_stamp, score in user_scores.items())
+        except ValueError:
+            history = ScoreHistory()
+        # Another process may have migrated (and saved more scores) in the meantime.
+        digest = score_history.save_score_history(self.get_path, history, create=True)
+        if digest is not None:
+            score_stats.save_score_stats(self.get_path, stats_of_history(history), digest)
+
+    def __journal(self, journal_size:int):
+        '''
+        Compact the journal if it has grown too big.
+
+        Parameters:
+            journal_size : int
+                The size of the journal in bytes.
+        '''
+        if journal_size > self.__journal_compaction_size:
+            compacted = score_history.compact_score_history(self.get_path)
+            if compacted is not None:
+                history, digest = compacted
+                score_stats.save_score_stats(self.get_path, stats_of_history(history), digest)
+
+    def add_score(self, name:str, time_stamp:str, score:int):
+        self.__add_rows([(name, time_stamp, score)])
+        self.__journal(files.append_score_record(self.get_path, name, time_stamp, score))
+
+    def add_scores(self, rows:Iterable[tuple[str, str, int]]):
+        rows = list(rows)
+        self.__add_rows(rows)
+        self.__journal(files.append_score_records(self.get_path, rows))
+
+    def reset(self, scores:dict[str, dict[str, int]]):
+        self.__history = ScoreHistory.from_rows((name, time_stamp, score) for name, user_scores in scores.items() for time_stamp, score in user_scores.items())
+        self.__stats = stats_of_history(self.__history)
+        digest = score_history.save_score_history(self.get_path, self.__history)
+        score_stats.save_score_stats(self.get_path, self.__stats, digest)
+        self._set_corrupted(False)
+
+    def get_user_scores(self, name:str) -> dict[str, int]:
+        times, scores = self.__history.get_user_columns(name)
+        return {epoch_to_time_stamp(epoch) : score for epoch, score in zip(times, scores)}
+
+    def get_user_scores_page(self, name:str, limit:int|None, cursor:tuple[int, int]|None = None) -> list[tuple[int, int]]:
+        return self.__history.get_user_page(name, limit, cursor)
+
+    def get_top_scores(self, limit:int, cursor:tuple[str, int, int]|None = None) -> list[tuple[str, int, int]]:
+        return self.__history.get_top(limit, cursor)
+
+    def get_scores_between(self, start:str, end:str) -> list[tuple[str, str, int]]:
+        return [(name, epoch_to_time_stamp(epoch), score) for name, epoch, score in self.__history.get_between(time_stamp_to_epoch(start), time_stamp_to_epoch(end))]
+
+    def get_user_stats(self, name:str) -> UserStats|None:
+        return self.__stats.get_user(name)
+
+    def get_percentile(self, score:int) -> float|None:
+        return self.__stats.get_percentile(score)
+
+    @property
+    def get_history(self) -> ScoreHistory:
+        '''
+        All the saved scores, which must not be modified.
+        '''
+        return self.__history
+
+def open_score_store(backend:str, score_file_path:str, score_database_path:str, journal_compaction_size:int = 65536, score_history_path:str = 'data/scores.history') -> ScoreStore:
+    '''
+    Open the configured score store.
+
+    Parameters:
+        backend : str
+            Which store to use: `"json"`, `"sqlite"` or `"columnar"`.
+        score_file_path : str
+            The path to the JSON score file (which is migrated into the database or score history the first time the SQLite or columnar store is used).
+        score_database_path : str
+            The path to the SQLite database.
+        journal_compaction_size : int
+            The size (in bytes) the JSON score journal (or score history journal) can grow to before it is folded into the score file.
+        score_history_path : str
+            The path to the columnar score history file.
+
+    Raises:
+        ValueError
+            If `backend` is not a known store.
+
+    Returns:
+        The opened store.
+    '''
+    if backend == 'json':
+        return JsonScoreStore(score_file_path, journal_compaction_size)
+    if backend == 'sqlite':
+        return SqliteScoreStore(score_database_path, score_file_path)
+    if backend == 'columnar':
+        return ColumnarScoreStore(score_history_path, score_file_path, journal_compaction_size)
+    raise ValueError(backend)
@@ -1,49 +1,61 @@
 import datetime
+import heapq
 import os
+from array import array
 from error_handling import ErrorMessages
-import file_handling as files
+from score_store import ScoreStore, user_score_order
+from score_history import epoch_to_datetime, page_of_columns, time_stamp_to_epoch
 from display_text import DisplayText
 from prompts import Prompts
+from profiling import profiler
 
-def save_and_view_scores(name : str, score_file_path:str, score:int):
+def save_and_view_scores(name : str, store:ScoreStore, score:int, table_size:int = 10, time_stamp:str|None = None) -> bool:
     '''
     Allow the user to save their score and view their past scores.
 
     Parameters:
         name : str
             The user's name.
-        score_file_path : str
-            The path to the score file.
+        store : ScoreStore
+            Where the scores are saved.
         score : int
             The user's final (adjusted) score.
+        table_size : int
+            The number of scores to display at a time.
+        time_stamp : str | None
+            The timestamp to save the score under. `None` for now.
+
+    Returns:
+        Whether the user saved their score.
 
     Calls:
-        load_score_file
         yes_or_no
         save_score
         print_scores
+        print_leaderboard
     '''
-    
-    try:
-        scores = files.load_score_file(score_file_path)
-        score_file_corrupted = False
-    except ValueError:
-        score_file_corrupted = True
-        scores = {}
-
-    time_stamp = DisplayText.TIME_STAMP.format(datetime.datetime.now())
-    if name in scores.keys():
-        scores[name][time_stamp] = score
-    else:
-        scores[name] = {time_stamp : score}
+
+    if time_stamp is None:
+        time_stamp = DisplayText.TIME_STAMP.format(datetime.datetime.now())
 
     save = yes_or_no(Prompts.SAVE_SCORE)
     if save:
-        save_score(score_file_path, scores, score_file_corrupted)
+        save_score(store, name, time_stamp, score)
+
+    percentile = store.get_percentile(score)
+    if percentile is not None:
+        print(DisplayText.SCORE_PERCENTILE.format(percentile))
 
     view_scores = yes_or_no(Prompts.VIEW_SCORES)
     if view_scores:
-        print_scores(name, scores)
+        # Include this score even if it wasn't saved.
+        print_scores(name, store, table_size, None if save else (time_stamp_to_epoch(time_stamp), score))
+
+    view_leaderboard = yes_or_no(Prompts.VIEW_LEADERBOARD)
+    if view_leaderboard:
+        print_leaderboard(store, table_size)
+
+    return save
 
 def yes_or_no(prompt:str) -> bool:
     '''
@@ -73,83 +85,141 @@ def yes_or_no(prompt:str) -> bool:
         else:
             print(Prompts.YES_OR_NO)
 
-def save_score(score_file_path:str, scores:dict[str, dict[str, int]], score_file_corrupted:bool):
+@profiler.timed('scores.save_score')
+def save_score(store:ScoreStore, name:str, time_stamp:str, score:int):
     '''
-    Save scores to the scores file.
+    Save a score to the score store.
 
     Parameters:
-        score_file_path : str
-            The path to the score file.
-        scores : dict[str, dict[str, int]]
-            All the currently saved scores.
-        score_file_corrupted : bool
-            Whether or not the score file was loaded correctly.
+        store : ScoreStore
+            Where the scores are saved.
+        name : str
+            The name to save the score under.
+        time_stamp : str
+            The timestamp to save the score under.
+        score : int
+            The score to save.
 
     Calls:
         yes_or_no
-        save_score_file
     '''
 
-    if score_file_corrupted:
-        print(ErrorMessages.FILE_CORRUPTED.format(os.path.abspath(score_file_path)))
+    if store.get_corrupted:
+        print(ErrorMessages.FILE_CORRUPTED.format(os.path.abspath(store.get_path)))
         overwrite_corrupted_score_file = yes_or_no(Prompts.SAVE_SCORE + Prompts.OVERWRITE_CORRUPTED_SCORES)
         if not overwrite_corrupted_score_file:
             return
-    files.save_score_file(score_file_path, scores)
+        store.reset({name : {time_stamp : score}})
+    else:
+        store.add_score(name, time_stamp, score)
     print(DisplayText.SCORE_SAVED)
 
-def print_scores(name:str, scores:dict[str, dict[str, int]]):
+def print_scores(name:str, store:ScoreStore, table_size:int, unsaved_score:tuple[int, int]|None = None):
     '''
-    Display the timestamps and scores saved under the specified `name` in order of score (descending).
+    Display a summary of the scores saved under the specified `name`, then their timestamps and scores in order of score (descending), one page of `table_size` scores at a time.
 
     Parameters:
         name : str
-            Scores saved under this name will be displayed.
-        scores: dict[str, dict[str, int]]
-            All the saved scores.
+            The name the scores were saved under.
+        store : ScoreStore
+            Where the scores are saved.
+        table_size : int
+            The number of scores to display at a time.
+        unsaved_score : tuple[int, int] | None
+            The timestamp (in epoch seconds) and score of a score that wasn't saved but should be displayed anyway.
 
     Calls:
         sort_scores
+        yes_or_no
     '''
-    if name not in scores:
-        print(DisplayText.NO_SCORES_FOR_USER.format(name))
-        return
-    print(DisplayText.SCORE_TABLE_HEADER)
-    for time_stamp, score in sort_scores(scores[name]).items():
-        print(DisplayText.SCORE_TABLE_ROW.format(time_stamp[:-3], score))
-
-def sort_scores(scores:dict[str, int]) -> dict[str, int]:
+    cursor = None
+    while True:
+        page = store.get_user_scores_page(name, table_size, cursor)
+
+        # Slot the unsaved score into the page it belongs on. Anything it pushes off the end is after the new cursor, so it will be on the next page.
+        if unsaved_score is not None and (len(page) < table_size or user_score_order(unsaved_score) < user_score_order(page[-1])):
+            rows = sorted(page + [unsaved_score])
+            page = sort_scores(array('q', [epoch for epoch, _ in rows]), array('B', [score for _, score in rows]), table_size)
+            unsaved_score = None
+
+        if cursor is None:
+            if len(page) == 0:
+                print(DisplayText.NO_SCORES_FOR_USER.format(name))
+                return
+            stats = store.get_user_stats(name)
+            if stats is not None:
+                print(DisplayText.USER_STATS.format(stats.get_count, stats.get_mean, stats.get_best, stats.get_moving_average))
+            print(DisplayText.SCORE_TABLE_HEADER)
+
+        for epoch, score in page:
+            print(DisplayText.SCORE_TABLE_ROW.format(epoch_to_datetime(epoch), score))
+
+        if len(page) < table_size or not yes_or_no(Prompts.MORE_SCORES):
+            return
+        cursor = page[-1]
+
+def print_leaderboard(store:ScoreStore, table_size:int):
+    '''
+    Display the best scores saved under any name, one page of `table_size` scores at a time.
+
+    Parameters:
+        store : ScoreStore
+            Where the scores are saved.
+        table_size : int
+            The number of scores to display at a time.
+
+    Calls:
+        yes_or_no
     '''
-    Sort a scores dictionary according to the scores in descending order.
+    print(DisplayText.LEADERBOARD_HEADER)
+    cursor = None
+    while True:
+        page = store.get_top_scores(table_size, cursor)
+        for name, epoch, score in page:
+            print(DisplayText.LEADERBOARD_ROW.format(name, epoch_to_datetime(epoch), score))
+
+        if len(page) < table_size or not yes_or_no(Prompts.MORE_SCORES):
+            return
+        cursor = page[-1]
+
+@profiler.timed('scores.sort')
+def sort_scores(times:array, scores:array, limit:int|None = None, cursor:tuple[int, int]|None = None) -> list[tuple[int, int]]:
+    '''
+    Select the best scores from one user's score columns, in descending order of score (oldest first for equal scores).
+
+    Nothing is sorted: see `page_of_columns`.
 
     Parameters:
-        scores : dict[str, int]
-            The scores to sort.
+        times : array
+            The timestamps (epoch seconds, oldest first).
+        scores : array
+            The scores (unsigned bytes), in the same order.
+        limit : int | None
+            The maximum number of scores to select. `None` for all of them.
+        cursor : tuple[int, int] | None
+            The last timestamp and score selected by the previous call, to select the next page of scores. `None` for the first page.
     
     Returns:
-        The sorted `scores`.
+        The selected timestamps and scores.
 
     Calls:
-        sort_dict
+        page_of_columns
     '''
-    return sort_dict(scores)
+    return page_of_columns(times, scores, limit, cursor)
 
-def sort_dict(dictionary:dict) -> dict:
+def sort_dict(dictionary:dict, limit:int|None = None) -> dict:
     '''
     Sort items in a `dictionary` in descending order according to its values.
 
     Parameters:
         dictionary : dict
             The dictionary to sort.
+        limit : int | None
+            The maximum number of items to keep. `None` to keep them all.
     
     Returns:
         The sorted dictionary.
     '''
-    as_list = []
-    sorted_dict = {}
-    for key, value in dictionary.items():
-        as_list.append((key, value))
-    as_list.sort(key=lambda item: item[1], reverse=True)
-    for i in as_list:
-        sorted_dict[i[0]] = i[1]
-    return sorted_dict
+    if limit is None:
+        limit = len(dictionary)
+    return dict(heapq.nlargest(limit, dictionary.items(), key=lambda item: item[1]))
@@ -0,0 +1,573 @@
+import asyncio
+import datetime
+import json
+import os
+import random
+from concurrent.futures import ThreadPoolExecutor
+from typing import Sequence
+
+import sessions
+import question_stats
+import file_handling as files
+from array import array
+from compiled_bank import CompiledBank
+from config import Config
+from display_text import DisplayText
+from engine import QuizEngine, QuizProgress
+from error_handling import ErrorMessages
+from file_watcher import FileWatcher
+from prompts import Prompts
+from question import Question, question_key
+from rendering import question_lines
+from score_store import ScoreStore, open_score_store
+from text_table import TextSnapshot
+from profiling import profiler
+
+class ClientDisconnected(Exception):
+    '''
+    An exception to be raised when a client closes its connection partway through a quiz.
+    '''
+    def __init__(self, *args: object) -> None:
+        super().__init__(*args)
+
+class ScoreWriter:
+    '''
+    The single writer for every session's scores, session log entries and question outcomes.
+
+    Sessions queue their writes; the writer task takes everything that has queued up since its last write and saves it all at once, on a dedicated thread so the event loop never blocks on disk I/O.
+
+    Attributes:
+        __settings : Config
+            The loaded config settings.
+        __queue : asyncio.Queue
+            Writes waiting to be saved: tuples of score row (or `None`), encoded session (or `None`), question outcomes (see `question_stats.record_question_outcomes`), and a future to resolve once saved (or `None` if nobody is waiting).
+        __thread : ThreadPoolExecutor
+            The thread the store is opened and written on.
+        __store : ScoreStore | None
+            Where scores are saved.
+    '''
+
+    def __init__(self, settings:Config):
+        self.__settings = settings
+        self.__queue:asyncio.Queue = asyncio.Queue()
+        self.__thread = ThreadPoolExecutor(1, thread_name_prefix='score-writer')
+        self.__store:ScoreStore|None = None
+
+    async def run(self):
+        '''
+        Save queued writes until cancelled.
+
+        If the store can't be opened, every write fails (so sessions are told their scores weren't saved, rather than waiting forever).
+        '''
+        loop = asyncio.get_running_loop()
+        try:
+            self.__store = await loop.run_in_executor(self.__thread, lambda: open_score_store(self.__settings.get_score_backend, self.__settings.get_score_file_path, self.__settings.get_score_database_path, self.__settings.get_score_journal_compaction_size, self.__settings.get_score_history_path))
+        except Exception as error:
+            print(ErrorMessages.SCORE_STORE_FAILED.format(repr(error)))
+            try:
+                while True:
+                    for _, _, _, saved in await self.__next_batch():
+                        if saved is not None and not saved.done():
+                            saved.set_exception(error)
+            finally:
+                self.__thread.shutdown()
+
+        try:
+            while True:
+                batch = await self.__next_batch()
+                try:
+                    score_error, error = await loop.run_in_executor(self.__thread, self.__write, batch)
+                except Exception as unexpected:
+                    score_error = error = unexpected
+                for row, _, _, saved in batch:
+                    # A failure to save the scores only fails the writes that had a score.
+                    failure = error if error is not None or row is None else score_error
+                    if saved is None or saved.done():
+                        continue
+                    if failure is None:
+                        saved.set_result(True)
+                    else:
+                        saved.set_exception(failure)
+        finally:
+            await loop.run_in_executor(self.__thread, self.__store.close)
+            self.__thread.shutdown()
+
+    async def __next_batch(self) -> list[tuple]:
+        '''
+        Returns:
+            Every write queued since the last batch, waiting for one if there are none.
+        '''
+        batch = [await self.__queue.get()]
+        while not self.__queue.empty():
+            batch.append(self.__queue.get_nowait())
+        return batch
+
+    @profiler.timed('server.write_batch')
+    def __write(self, batch:list[tuple]) -> tuple[Exception|None, Exception|None]:
+        '''
+        Save a batch of writes (on the writer thread).
+
+        The scores, question outcomes and session log entries are saved independently, so that failing to save one doesn't lose the others.
+
+        Parameters:
+            batch : list[tuple]
+                The queued writes.
+
+        Returns:
+            The error saving the scores, and the error saving the question outcomes or session log entries (each `None` if they were saved).
+        '''
+        score_error = error = None
+
+        rows = [row for row, _, _, _ in batch if row is not None]
+        if len(rows) > 0:
+            try:
+                if self.__store.get_corrupted:
+                    raise ValueError(self.__store.get_path)
+                self.__store.add_scores(rows)
+            except Exception as caught:
+                score_error = caught
+
+        outcomes = [outcome for _, _, session_outcomes, _ in batch for outcome in session_outcomes]
+        if len(outcomes) > 0 and self.__settings.get_question_stats_path is not None:
+            try:
+                question_stats.record_question_outcomes(self.__settings.get_question_stats_path, outcomes)
+            except Exception as caught:
+                error = caught
+
+        encoded_sessions = [session for _, session, _, _ in batch if session is not None]
+        if len(encoded_sessions) > 0 and self.__settings.get_session_log_path is not None:
+            try:
+                log = os.open(self.__settings.get_session_log_path, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+                try:
+                    data = memoryview(b''.join(encoded_sessions))
+                    while len(data) > 0:
+                        data = data[os.write(log, data):]
+                finally:
+                    os.close(log)
+            except OSError as caught:
+                error = error or caught
+
+        return score_error, error
+
+    async def save(self, row:tuple[str, str, int]|None, session:bytes|None, outcomes:list[tuple[int, int, bool]]|None = None) -> bool:
+        '''
+        Queue a score, session and/or question outcomes to be saved, and wait until they have been.
+
+        Parameters:
+            row : tuple[str, str, int] | None
+                The name, timestamp and score to save.
+            session : bytes | None
+                The encoded session to append to the session log.
+            outcomes : list[tuple[int, int, bool]] | None
+                The key, attempts used and correctness of each question asked.
+
+        Returns:
+            `True` if everything was saved.
+            `False` otherwise.
+        '''
+        saved = asyncio.get_running_loop().create_future()
+        await self.__queue.put((row, session, outcomes or [], saved))
+        try:
+            return await saved
+        except Exception:
+            return False
+
+    def record_outcomes(self, outcomes:list[tuple[int, int, bool]]):
+        '''
+        Queue question outcomes to be saved with the next batch, without waiting for them to be.
+
+        Parameters:
+            outcomes : list[tuple[int, int, bool]]
+                The key, attempts used and correctness of each question asked.
+        '''
+        if len(outcomes) > 0:
+            self.__queue.put_nowait((None, None, outcomes, None))
+
+class Snapshot:
+    '''
+    Everything a session is played with that can be reloaded: the question bank and the display text and prompts.
+
+    Snapshots are never changed once made. Reloading makes a new snapshot, and sessions keep the one they started with.
+
+    Attributes:
+        __bank : Sequence[Question]
+            Every available question.
+        __keys : Sequence[int]
+            The key of every question in the bank (see `question.question_key`).
+        __selector : QuestionSelector | None
+            Draws questions around the target difficulty, or `None` to draw them uniformly at random.
+        __display_text : TextSnapshot
+            The display text (see `DisplayText`).
+        __prompts : TextSnapshot
+            The prompts (see `Prompts`).
+    '''
+
+    def __init__(self, bank:Sequence[Question], keys:Sequence[int], selector:'question_stats.QuestionSelector|None', display_text:TextSnapshot, prompts:TextSnapshot):
+        self.__bank = bank
+        self.__keys = keys
+        self.__selector = selector
+        self.__display_text = display_text
+        self.__prompts = prompts
+
+    @property
+    def get_bank(self) -> Sequence[Question]:
+        return self.__bank
+    @property
+    def get_keys(self) -> Sequence[int]:
+        return self.__keys
+    @property
+    def get_selector(self) -> 'question_stats.QuestionSelector|None':
+        return self.__selector
+    @property
+    def get_display_text(self) -> TextSnapshot:
+        return self.__display_text
+    @property
+    def get_prompts(self) -> TextSnapshot:
+        return self.__prompts
+
+class QuizSession:
+    '''
+    One client's quiz, played over a line-based JSON connection.
+
+    Every message the server sends is a JSON object on its own line, with a `type` and the `text` the terminal version would have displayed. The client replies with `{"name": ...}`, `{"answer": ...}` (the answer text, or the 1-based index of the selected answer option) and `{"save": true|false}`.
+
+    The quiz's state (and how each question is laid out) is shared with the terminal's `Quiz`, through `QuizProgress`: the session only sends and receives messages.
+
+    Attributes:
+        __reader : asyncio.StreamReader
+        __writer : asyncio.StreamWriter
+        __progress : QuizProgress
+            This session's questions (shared with other sessions, so never modified), results and answers.
+        __display_text : TextSnapshot
+            The display text this session was started with.
+        __prompts : TextSnapshot
+            The prompts this session was started with.
+    '''
+
+    def __init__(self, reader:asyncio.StreamReader, writer:asyncio.StreamWriter, questions:list[Question], engine:QuizEngine, display_text:TextSnapshot, prompts:TextSnapshot):
+        self.__reader = reader
+        self.__writer = writer
+        self.__progress = QuizProgress(engine, questions)
+        self.__display_text = display_text
+        self.__prompts = prompts
+
+    @property
+    def get_outcomes(self) -> list[tuple[Question, int, bool]]:
+        return self.__progress.get_outcomes
+
+    async def send(self, message_type:str, text:str, **details):
+        '''
+        Send a message to the client.
+
+        Parameters:
+            message_type : str
+                What kind of message it is.
+            text : str
+                The text to display to the user.
+            details
+                Any other fields to include in the message.
+        '''
+        self.__writer.write((json.dumps({'type' : message_type, 'text' : text, **details}) + '\n').encode('utf-8'))
+        await self.__writer.drain()
+
+    async def receive(self, key:str):
+        '''
+        Wait for the client to send a message containing `key`, ignoring anything else.
+
+        Parameters:
+            key : str
+                The field to wait for.
+
+        Raises:
+            ClientDisconnected
+                If the client closes the connection.
+
+        Returns:
+            The value of `key` in the client's message.
+        '''
+        while True:
+            line = await self.__reader.readline()
+            if len(line) == 0:
+                raise ClientDisconnected
+            try:
+                message = json.loads(line)
+                return message[key]
+            except (ValueError, TypeError, KeyError):
+                continue
+
+    async def get_user_name(self) -> str:
+        '''
+        Ask the client for a valid name until they send one.
+
+        Returns:
+            Valid user name.
+        '''
+        while True:
+            await self.send('prompt', self.__prompts.NAME, expecting='name')
+            name = await self.receive('name')
+            if not isinstance(name, str):
+                continue
+            if '"' in name:
+                await self.send('error', self.__display_text.INVALID_CHARACTER.format('"'))
+            elif len(name.strip()) > 0:
+                return name
+
+    async def do_question(self):
+        '''
+        Send the next question, grade the client's answers, and tell them whether they were correct.
+        '''
+        engine = self.__progress.get_engine
+        select_using_index = engine.get_multiple_choice and engine.get_select_using_index
+
+        number = self.__progress.get_next_question + 1
+        attempt = self.__progress.start_question()
+        lines = [template.format(*values) if len(values) > 0 else template for template, values in question_lines(self.__display_text, self.__prompts, self.__progress, attempt)]
+        if not engine.get_multiple_choice:
+            # The terminal asks with this as the input prompt.
+            lines.append(self.__prompts.ANSWER_TYPED)
+        displayed_options = attempt.get_displayed_options if engine.get_multiple_choice else []
+        await self.send('question', '\n'.join(lines), number=number, total=len(self.__progress.get_questions), question=attempt.get_question.get_question, answer_options=displayed_options, expecting='answer')
+
+        while not attempt.get_finished:
+            answer = await self.receive('answer')
+            if select_using_index:
+                answer = attempt.select(answer)
+                if answer is None:
+                    await self.send('prompt', self.__prompts.VALID_INDEX.format(1, len(attempt.get_option_order)), expecting='answer')
+                    continue
+            else:
+                answer = str(answer)
+
+            if not attempt.submit(answer):
+                await self.send('incorrect', self.__display_text.INCORRECT.format(attempt.get_attempts_remaining), attempts_remaining=attempt.get_attempts_remaining, expecting='answer' if not attempt.get_finished else None)
+
+        self.__progress.finish_question(attempt)
+        if attempt.get_correct:
+            await self.send('correct', self.__display_text.CORRECT.format(attempt.get_points), points=attempt.get_points)
+        score = self.__progress.get_results.get_score
+        await self.send('score', self.__display_text.CURRENT_SCORE.format(score), score=score)
+
+    async def play(self, score_writer:ScoreWriter, session_log:bool):
+        '''
+        Play the whole quiz, then let the client save their score.
+
+        Parameters:
+            score_writer : ScoreWriter
+                Where scores and sessions are saved.
+            session_log : bool
+                Whether to record the session in the session log.
+
+        Raises:
+            ClientDisconnected
+                If the client closes the connection partway through.
+        '''
+        await self.send('welcome', self.__display_text.WELCOME)
+        name = await self.get_user_name()
+
+        while not self.__progress.get_finished:
+            await self.do_question()
+
+        results = self.__progress.results_values()
+        questions_correct, _, score, max_score, final_score = results
+        await self.send('results', self.__display_text.RESULTS.format(*results), questions_correct=questions_correct, score=score, max_score=max_score, final_score=final_score)
+
+        await self.send('prompt', self.__prompts.SAVE_SCORE + ' ' + self.__prompts.YES_OR_NO, expecting='save')
+        save = await self.receive('save') is True
+
+        time_stamp = self.__display_text.TIME_STAMP.format(datetime.datetime.now())
+        row = (name, time_stamp, final_score) if save else None
+        session = sessions.encode_session(name, time_stamp, save, self.__progress.get_engine, self.__progress.get_answer_log) if session_log else None
+        if row is not None or session is not None:
+            saved = await score_writer.save(row, session)
+            if save:
+                await self.send('saved', self.__display_text.SCORE_SAVED if saved else self.__display_text.COULD_NOT_SAVE_SCORE, saved=saved)
+
+        await self.send('goodbye', self.__display_text.GOODBYE)
+
+class QuizServer:
+    '''
+    Hosts many concurrent quizzes in one process.
+
+    The question bank and the display text and prompt tables are loaded once and shared (read-only) by every session; each connection gets its own questions, engine state and results.
+
+    If a reload interval is configured, the question file and the display text and prompt files are watched (see `FileWatcher`), and any that change are reloaded on a dedicated thread, then swapped in as a new snapshot in one assignment on the event loop. Sessions already being played keep the snapshot they started with; new sessions get the new one. If a changed file can't be loaded, the old snapshot is kept.
+
+    Attributes:
+        __settings : Config
+            The loaded config settings.
+        __snapshot : Snapshot
+            The question bank, display text and prompts new sessions are played with.
+        __score_writer : ScoreWriter
+            The single writer for every session's scores.
+    '''
+
+    def __init__(self, settings:Config, bank:Sequence[Question]):
+        self.__settings = settings
+        keys, selector = self.index_bank(bank)
+        self.__snapshot = Snapshot(bank, keys, selector, DisplayText.snapshot(), Prompts.snapshot())
+        self.__score_writer:ScoreWriter|None = None
+
+    @property
+    def get_snapshot(self) -> Snapshot:
+        return self.__snapshot
+
+    def index_bank(self, bank:Sequence[Question], stats:'question_stats.QuestionStats|None' = None) -> tuple[Sequence[int], 'question_stats.QuestionSelector|None']:
+        '''
+        Parameters:
+            bank : Sequence[Question]
+                Every available question.
+            stats : QuestionStats | None
+                How every question has gone so far. `None` to load them from the question statistics file.
+
+        Returns:
+            The key of every question in the bank (see `question.question_key`), and a selector that draws questions around the target difficulty (or `None` to draw them uniformly at random).
+        '''
+        keys = bank.get_keys if isinstance(bank, CompiledBank) else array('Q', (question_key(question.get_question) for question in bank))
+        selector:question_stats.QuestionSelector|None = None
+        if self.__settings.get_target_difficulty is not None and self.__settings.get_question_stats_path is not None:
+            if stats is None:
+                stats = question_stats.load_question_stats(self.__settings.get_question_stats_path)
+            selector = question_stats.QuestionSelector(keys, stats, self.__settings.get_target_difficulty)
+        return keys, selector
+
+    def draw_questions(self, snapshot:Snapshot) -> list[int]:
+        '''
+        Parameters:
+            snapshot : Snapshot
+                The snapshot to draw from.
+
+        Returns:
+            The indices (in the snapshot's bank) of a random selection of questions for one session.
+        '''
+        if snapshot.get_selector is not None:
+            return snapshot.get_selector.sample(self.__settings.get_number_of_questions, random)
+        return random.sample(range(len(snapshot.get_bank)), min(self.__settings.get_number_of_questions, len(snapshot.get_bank)))
+
+    def record_outcomes(self, snapshot:Snapshot, indices:list[int], outcomes:list[tuple[Question, int, bool]]):
+        '''
+        Update the question statistics with how a session's questions went. The selector is updated straight away; saving them is left to the score writer.
+
+        Parameters:
+            snapshot : Snapshot
+                The snapshot the session was played with.
+            indices : list[int]
+                The indices (in the snapshot's bank) of the session's questions.
+            outcomes : list[tuple[Question, int, bool]]
+                Each question answered, the points earned for it, and whether it was answered correctly.
+        '''
+        outcomes = [(index, question_stats.attempts_used(points, correct, self.__settings.get_number_of_attempts), correct) for index, (_, points, correct) in zip(indices, outcomes)]
+        if snapshot.get_selector is not None:
+            # Every snapshot's selector shares the same statistics, so these count towards the current snapshot's even if the bank has been reloaded since.
+            snapshot.get_selector.add_outcomes(outcomes)
+        if self.__settings.get_question_stats_path is not None:
+            self.__score_writer.record_outcomes([(snapshot.get_keys[index], attempts_used, correct) for index, attempts_used, correct in outcomes])
+
+    def reload(self, snapshot:Snapshot, changed:list[str]) -> Snapshot:
+        '''
+        Load the files that have changed (on the reload thread), reusing everything else from the current snapshot.
+
+        A changed file that can't be loaded is reported, and the current snapshot's version of it is kept. It isn't tried again until it changes again.
+
+        Parameters:
+            snapshot : Snapshot
+                The current snapshot.
+            changed : list[str]
+                The paths of the files that have changed (see `FileWatcher.poll`).
+
+        Returns:
+            The new snapshot, or `snapshot` itself if none of the changed files could be loaded.
+        '''
+        bank, keys, selector = snapshot.get_bank, snapshot.get_keys, snapshot.get_selector
+        display_text, prompts = snapshot.get_display_text, snapshot.get_prompts
+        reloaded = False
+        for file_path in changed:
+            try:
+                if file_path == self.__settings.get_question_file_path:
+                    bank = files.read_question_bank(self.__settings)
+                    # Carry the statistics over, including outcomes not saved yet. Outcomes added while the selector is built may leave their questions' weights stale until they are next asked.
+                    keys, selector = self.index_bank(bank, None if selector is None else selector.get_stats)
+                if file_path == self.__settings.get_display_text_file_path:
+                    display_text = files.read_text_table(file_path, DisplayText)
+                if file_path == self.__settings.get_prompt_file_path:
+                    prompts = files.read_text_table(file_path, Prompts)
+            except (OSError, ValueError) as error:
+                print(ErrorMessages.RELOAD_FAILED.format(files.describe_load_error(file_path, error)))
+                continue
+            reloaded = True
+
+        if not reloaded:
+            return snapshot
+        profiler.count('reloads')
+        return Snapshot(bank, keys, selector, display_text, prompts)
+
+    async def watch(self, interval:float):
+        '''
+        Reload the question file and the display text and prompt files whenever they change, until cancelled.
+
+        Parameters:
+            interval : float
+                How often (in seconds) to check the files for changes.
+        '''
+        loop = asyncio.get_running_loop()
+        thread = ThreadPoolExecutor(1, thread_name_prefix='reloader')
+        try:
+            watcher = FileWatcher([self.__settings.get_question_file_path, self.__settings.get_display_text_file_path, self.__settings.get_prompt_file_path])
+            while True:
+                await asyncio.sleep(interval)
+                changed = await loop.run_in_executor(thread, watcher.poll)
+                if len(changed) > 0:
+                    snapshot = self.__snapshot
+                    self.__snapshot = await loop.run_in_executor(thread, self.reload, snapshot, changed)
+        finally:
+            thread.shutdown(wait=False, cancel_futures=True)
+
+    async def handle_connection(self, reader:asyncio.StreamReader, writer:asyncio.StreamWriter):
+        '''
+        Play one quiz with a newly connected client, using the current snapshot throughout.
+
+        Parameters:
+            reader : asyncio.StreamReader
+            writer : asyncio.StreamWriter
+        '''
+        snapshot = self.__snapshot
+        engine = QuizEngine(self.__settings.get_multiple_choice, self.__settings.get_select_using_index, self.__settings.get_number_of_attempts, self.__settings.get_max_typo_distance)
+        indices = self.draw_questions(snapshot)
+        session = QuizSession(reader, writer, [snapshot.get_bank[index] for index in indices], engine, snapshot.get_display_text, snapshot.get_prompts)
+        try:
+            await session.play(self.__score_writer, self.__settings.get_session_log_path is not None)
+        except (ClientDisconnected, ConnectionError):
+            pass
+        finally:
+            self.record_outcomes(snapshot, indices, session.get_outcomes)
+            writer.close()
+            try:
+                await writer.wait_closed()
+            except ConnectionError:
+                pass
+
+    async def serve(self, host:str, port:int):
+        '''
+        Accept connections until cancelled.
+
+        Parameters:
+            host : str
+                The address to listen on.
+            port : int
+                The port to listen on.
+        '''
+        self.__score_writer = ScoreWriter(self.__settings)
+        tasks = [asyncio.create_task(self.__score_writer.run())]
+        if self.__settings.get_reload_interval is not None:
+            tasks.append(asyncio.create_task(self.watch(self.__settings.get_reload_interval)))
+        server = await asyncio.start_server(self.handle_connection, host, port)
+        try:
+            async with server:
+                await server.serve_forever()
+        finally:
+            for task in tasks:
+                task.cancel()
+            for task in tasks:
+                try:
+                    await task
+                except asyncio.CancelledError:
+                    pass
@@ -0,0 +1,119 @@
+import json
+import os
+from typing import Iterator
+
+from engine import QuizEngine
+from question import Question
+from results import Results
+from profiling import profiler
+
+def encode_session(name:str, time_stamp:str, saved:bool, engine:QuizEngine, answer_log:list[tuple[str, list[str]]]) -> bytes:
+    '''
+    Encode a finished quiz as one line of the session log.
+
+    Parameters:
+        name : str
+            The user's name.
+        time_stamp : str
+            The timestamp the score was (or would have been) saved under.
+        saved : bool
+            Whether the user saved their score.
+        engine : QuizEngine
+            The engine the quiz was graded with (for its settings).
+        answer_log : list[tuple[str, list[str]]]
+            Every question asked, with the text of every answer given to it.
+
+    Returns:
+        The encoded session, including its trailing newline.
+    '''
+    session = {
+        'name' : name
+        ,'time_stamp' : time_stamp
+        ,'saved' : saved
+        ,'multiple_choice' : engine.get_multiple_choice
+        ,'select_using_index' : engine.get_select_using_index
+        ,'max_number_of_attempts' : engine.get_max_number_of_attempts
+        ,'max_typo_distance' : engine.get_max_typo_distance
+        ,'questions' : [{'question' : question, 'answers' : answers} for question, answers in answer_log]
+    }
+    return (json.dumps(session, separators=(',', ':')) + '\n').encode('utf-8')
+
+def append_session(file_path:str, name:str, time_stamp:str, saved:bool, engine:QuizEngine, answer_log:list[tuple[str, list[str]]]):
+    '''
+    Record a finished quiz in the session log, so that it can be re-graded later.
+
+    The session is written with a single `O_APPEND` write, so concurrent quizzes can't interleave their sessions.
+
+    Parameters:
+        file_path : str
+            The path to the session log.
+        (See `encode_session` for the rest.)
+    '''
+    log = os.open(file_path, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+    try:
+        session = encode_session(name, time_stamp, saved, engine, answer_log)
+        os.write(log, session)
+        profiler.count('bytes_written', len(session))
+    finally:
+        os.close(log)
+
+def iter_session_chunks(file_path:str, chunk_size:int) -> Iterator[list[str]]:
+    '''
+    Read the session log a chunk of sessions at a time.
+
+    Sessions are not decoded here, so that decoding can be spread over several processes.
+
+    Parameters:
+        file_path : str
+            The path to the session log.
+        chunk_size : int
+            The maximum number of sessions per chunk.
+
+    Raises:
+        FileNotFoundError
+            If the session log does not exist.
+
+    Returns:
+        A generator of chunks of encoded sessions.
+    '''
+    file = open(file_path, 'r', encoding='utf-8')
+    try:
+        chunk:list[str] = []
+        for line in file:
+            # A final line without a newline was cut short mid-write.
+            if not line.endswith('\n'):
+                break
+            chunk.append(line)
+            if len(chunk) == chunk_size:
+                yield chunk
+                chunk = []
+        if len(chunk) > 0:
+            yield chunk
+    finally:
+        file.close()
+
+def grade_session(line:str, answer_key:dict[str, Question]) -> tuple[str, str, int] | None:
+    '''
+    Re-grade a recorded session against the current answer key, using the same rules as the original quiz.
+
+    Parameters:
+        line : str
+            The encoded session.
+        answer_key : dict[str, Question]
+            The current questions, keyed by their text.
+
+    Returns:
+        The name, timestamp and new (adjusted) score of the session, or `None` if the session was not saved, is corrupted, or asked a question that is no longer in the answer key.
+    '''
+    try:
+        session = json.loads(line)
+        if not session['saved']:
+            return None
+        engine = QuizEngine(session['multiple_choice'], session['select_using_index'], session['max_number_of_attempts'], session.get('max_typo_distance', 0))
+        results = Results()
+        for asked in session['questions']:
+            # Each question only gets the answers recorded for it: after a correction, a question may be answered correctly earlier than it was originally.
+            engine.score_question(results, answer_key[asked['question']], iter(asked['answers']))
+        return session['name'], session['time_stamp'], results.calculate_adjusted_score()
+    except (ValueError, KeyError, TypeError, ZeroDivisionError):
+        return None
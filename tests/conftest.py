@@ -0,0 +1,18 @@
+import json
+import os
+
+import pytest
+
+from display_text import DisplayText
+from prompts import Prompts
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+@pytest.fixture
+def text_tables():
+    '''
+    Load the display text and prompts shipped in data/, without touching the startup bundle.
+    '''
+    for file_name, the_class in (('display-text.json', DisplayText), ('prompts.json', Prompts)):
+        with open(os.path.join(ROOT, 'data', file_name), encoding='utf-8') as file:
+            the_class.set_lazy_values(json.load(file))
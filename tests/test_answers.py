@@ -0,0 +1,93 @@
+import random
+
+import pytest
+
+from question import Question, normalise_answer, within_edit_distance
+
+def edit_distance(a:str, b:str) -> int:
+    '''
+    The Levenshtein distance, worked out with the whole dynamic programming table.
+    '''
+    previous = list(range(len(b) + 1))
+    for i in range(1, len(a) + 1):
+        current = [i] + [0] * len(b)
+        for j in range(1, len(b) + 1):
+            current[j] = min(previous[j - 1] + (a[i - 1] != b[j - 1]), previous[j] + 1, current[j - 1] + 1)
+        previous = current
+    return previous[len(b)]
+
+def random_string(generator:random.Random, length:int) -> str:
+    # A small alphabet, so that characters often match by chance.
+    return ''.join(generator.choice('abcé') for _ in range(length))
+
+def mutate(generator:random.Random, text:str, edits:int) -> str:
+    for _ in range(edits):
+        position = generator.randrange(len(text) + 1)
+        edit = generator.randrange(3) if len(text) > position else 0
+        if edit == 0:
+            text = text[:position] + random_string(generator, 1) + text[position:]
+        elif edit == 1:
+            text = text[:position] + text[position + 1:]
+        else:
+            text = text[:position] + random_string(generator, 1) + text[position + 1:]
+    return text
+
+@pytest.mark.parametrize('seed', range(5))
+def test_matches_full_edit_distance(seed):
+    generator = random.Random(seed)
+    for _ in range(400):
+        a = random_string(generator, generator.randrange(12))
+        b = mutate(generator, a, generator.randrange(5)) if generator.random() < 0.7 else random_string(generator, generator.randrange(12))
+        distance = edit_distance(a, b)
+        for max_distance in range(6):
+            assert within_edit_distance(a, b, max_distance) == (distance <= max_distance), (a, b, max_distance)
+        # Exactly at the distance, and one short of it.
+        assert within_edit_distance(a, b, distance)
+        assert within_edit_distance(b, a, distance)
+        if distance > 0:
+            assert not within_edit_distance(a, b, distance - 1)
+
+@pytest.mark.parametrize('a, b, distance', [
+    ('', '', 0)
+    ,('', 'abc', 3)
+    ,('kitten', 'sitting', 3)
+    ,('flaw', 'lawn', 2)
+    ,('abcdef', 'bcdefa', 2)
+    ,('a' * 50, 'a' * 48 + 'bb', 2)
+])
+def test_known_distances(a, b, distance):
+    assert edit_distance(a, b) == distance
+    assert within_edit_distance(a, b, distance)
+    assert not within_edit_distance(a, b, distance - 1)
+
+@pytest.mark.parametrize('typed, normalised', [
+    ('Paris', 'paris')
+    # Full-width letters and digits.
+    ,('ＰＡＲＩＳ　１２', 'paris 12')
+    ,('Straße', 'strasse')
+    ,('STRASSE', 'strasse')
+    # Ligatures, and an accent typed as a separate combining character.
+    ,('ﬁnland', 'finland')
+    ,('Cafe\u0301', 'caf\u00e9')
+    ,('  New-York,   City! ', 'new york city')
+    ,('snake_case', 'snake case')
+    ,('Ǆ', 'dž')
+    ,('ΣΊΣΥΦΟΣ', 'σίσυφοσ')
+])
+def test_normalise_answer(typed, normalised):
+    assert normalise_answer(typed) == normalised
+
+def test_accepts_typos_and_normalised_forms():
+    question = Question('Where is the Brandenburg Gate?', 'Berlin', ['Berlin', 'Bonn'], ['Hauptstadt Deutschlands'])
+    assert question.accepts('ＢＥＲＬＩＮ')
+    assert question.accepts('hauptstadt-deutschlands')
+    assert not question.accepts('Berlinn')
+    assert question.accepts('Berlinn', 1)
+    assert question.accepts('Hauptstad Deutschland', 2)
+    assert not question.accepts('Bern', 1)
+    assert question.accepts('Bern', 2)
+    # 'ß' normalises to 'ss', so 'strase' is one deletion away.
+    street = Question('Street?', 'Straße', ['Straße'])
+    assert street.accepts('strasse')
+    assert street.accepts('strase', 1)
+    assert not street.accepts('strase')
@@ -0,0 +1,115 @@
+import io
+import json
+import random
+
+import pytest
+
+from checkpoint import Checkpoint, load_checkpoint
+from engine import QuizProgress
+from question import Question
+from quiz import Quiz
+from rendering import Screen
+
+QUESTIONS = [Question(f'Question {number}?', 'Paris', ['Paris', 'Rome', 'Oslo', 'Lima'], ['Paree'] if number % 2 else None) for number in range(6)]
+# The lines typed for each question: some right first time, some after a wrong answer, some never.
+TYPED_ANSWERS = [['Paris'], ['Rome', 'paree'], ['Oslo', 'Lima', 'Bern'], ['Rome', 'Pariss'], ['PARIS'], ['Lima', 'Oslo', 'Paris']]
+INDEXED_ANSWERS = [['1'], ['2', '3'], ['9', 'x', '4', '1', '2'], ['3'], ['4', '2'], ['1', '1', '1']]
+
+def play(questions:list[Question], multiple_choice:bool, select_using_index:bool, lines:list[list[str]], checkpoint:Checkpoint|None = None, answered:list|None = None) -> Quiz:
+    '''
+    Play a quiz with the given answers, stopping (as if interrupted) if they run out.
+    '''
+    quiz = Quiz(questions, multiple_choice, select_using_index, 3, 1, checkpoint, Screen(io.StringIO(), io.StringIO(''.join(f'{line}\n' for answers in lines for line in answers))))
+    if answered is not None:
+        quiz.restore(answered)
+    try:
+        quiz.start()
+    except EOFError:
+        pass
+    return quiz
+
+def start_checkpoint(file_path:str, multiple_choice:bool, select_using_index:bool) -> Checkpoint:
+    checkpoint = Checkpoint(file_path)
+    checkpoint.start('amy', Quiz(QUESTIONS, multiple_choice, select_using_index, 3, 1).get_engine, QUESTIONS)
+    return checkpoint
+
+def progress_of(quiz:Quiz) -> tuple:
+    results = quiz.get_results
+    return results.get_questions_correct, results.get_score, results.get_max_score, [(question.get_question, points, correct) for question, points, correct in quiz.get_outcomes], quiz.get_answer_log
+
+@pytest.mark.parametrize('multiple_choice', [True, False])
+@pytest.mark.parametrize('interrupted_after', [0, 2, 5])
+def test_resumed_quiz_matches_uninterrupted(text_tables, tmp_path, multiple_choice, interrupted_after):
+    random.seed(1)
+    uninterrupted = play(QUESTIONS, multiple_choice, False, TYPED_ANSWERS)
+
+    random.seed(1)
+    file_path = str(tmp_path / 'quiz.checkpoint')
+    checkpoint = start_checkpoint(file_path, multiple_choice, False)
+    play(QUESTIONS, multiple_choice, False, TYPED_ANSWERS[:interrupted_after], checkpoint)
+    checkpoint.close()
+
+    state = load_checkpoint(file_path)
+    assert state.get_name == 'amy'
+    assert len(state.get_answered) == interrupted_after
+    engine = state.get_engine
+    checkpoint.resume()
+    resumed = play(state.get_questions, engine.get_multiple_choice, engine.get_select_using_index, TYPED_ANSWERS[interrupted_after:], checkpoint, state.get_answered)
+    checkpoint.close()
+
+    assert resumed.get_final_score == uninterrupted.get_final_score
+    assert progress_of(resumed) == progress_of(uninterrupted)
+    # Resuming carries on the same checkpoint, which ends up recording the whole quiz.
+    assert [answers for *_, answers in load_checkpoint(file_path).get_answered] == [answers for _, answers in uninterrupted.get_answer_log]
+
+def test_restore_rebuilds_the_quiz(text_tables, tmp_path, monkeypatch):
+    attempts = []
+    finish_question = QuizProgress.finish_question
+    def record_attempt(progress, attempt):
+        attempts.append((attempt.get_option_order, len(attempt.get_answers), attempt.get_points, attempt.get_correct, attempt.get_answers))
+        finish_question(progress, attempt)
+    monkeypatch.setattr(QuizProgress, 'finish_question', record_attempt)
+
+    random.seed(1)
+    file_path = str(tmp_path / 'quiz.checkpoint')
+    checkpoint = start_checkpoint(file_path, True, True)
+    uninterrupted = play(QUESTIONS, True, True, INDEXED_ANSWERS, checkpoint)
+    checkpoint.close()
+
+    # The checkpoint has the order the options were shown in and every attempt, not just the score.
+    state = load_checkpoint(file_path)
+    assert [tuple(answered) for answered in state.get_answered] == attempts
+    restored = Quiz(state.get_questions, True, True, 3, 1)
+    restored.restore(state.get_answered)
+    assert progress_of(restored) == progress_of(uninterrupted)
+
+def test_truncated_last_line_is_ignored(text_tables, tmp_path):
+    file_path = str(tmp_path / 'quiz.checkpoint')
+    checkpoint = start_checkpoint(file_path, True, False)
+    play(QUESTIONS, True, False, TYPED_ANSWERS, checkpoint)
+    checkpoint.close()
+    answered = load_checkpoint(file_path).get_answered
+
+    # Interrupted part-way through writing the last record.
+    with open(file_path, 'rb') as file:
+        contents = file.read()
+    with open(file_path, 'wb') as file:
+        file.write(contents[:-10])
+    assert load_checkpoint(file_path).get_answered == answered[:-1]
+
+@pytest.mark.parametrize('field, value', [(0, 3), (1, 'question 9?')])
+def test_mismatched_record_is_rejected(text_tables, tmp_path, field, value):
+    file_path = str(tmp_path / 'quiz.checkpoint')
+    checkpoint = start_checkpoint(file_path, True, False)
+    play(QUESTIONS, True, False, TYPED_ANSWERS[:3], checkpoint)
+    checkpoint.close()
+
+    with open(file_path, 'r', encoding='utf-8') as file:
+        lines = file.read().split('\n')
+    record = json.loads(lines[2])
+    record[field] = value
+    lines[2] = json.dumps(record)
+    with open(file_path, 'w', encoding='utf-8') as file:
+        file.write('\n'.join(lines))
+    with pytest.raises(ValueError):
+        load_checkpoint(file_path)
@@ -0,0 +1,39 @@
+import json
+
+import pytest
+
+from compiled_bank import CompiledBank, compile_bank
+from duplicates import DuplicateFinder
+
+ORIGINAL = {'question' : 'What is the capital of Australia?', 'answer' : 'Sydney', 'answer_options' : ['Sydney', 'Canberra', 'Perth'], 'aliases' : ['Syd']}
+
+def compile_questions(tmp_path, questions:list[dict]) -> tuple[list[tuple], DuplicateFinder]:
+    source_path = tmp_path / 'questions.json'
+    source_path.write_text(json.dumps(questions), encoding='utf-8')
+    duplicates = DuplicateFinder()
+    compile_bank(str(source_path), str(tmp_path / 'questions.qbank'), duplicates)
+    bank = CompiledBank(str(tmp_path / 'questions.qbank'))
+    try:
+        return [(question.get_question, question.get_answer, question.get_answer_options, question.get_aliases) for question in bank], duplicates
+    finally:
+        bank.close()
+
+def test_exact_copies_are_left_out(tmp_path):
+    # Only the text's case and spacing, and the order of the options and aliases, differ.
+    copy = {**ORIGINAL, 'question' : 'what is the  CAPITAL of australia?', 'answer_options' : ['Perth', 'Sydney', 'Canberra']}
+    compiled, duplicates = compile_questions(tmp_path, [ORIGINAL, {'question' : 'Another?', 'answer' : 'A', 'answer_options' : ['A', 'B']}, copy])
+    assert [question[0] for question in compiled] == [ORIGINAL['question'], 'Another?']
+    assert duplicates.get_exact_duplicates == [(2, 0)]
+    assert duplicates.get_conflicts == []
+
+@pytest.mark.parametrize('correction', [{'answer' : 'Canberra'}, {'answer_options' : ['Sydney', 'Canberra', 'Darwin']}, {'aliases' : ['Sydney NSW']}, {'aliases' : None}])
+def test_corrected_copy_is_kept_and_reported(tmp_path, correction):
+    corrected = {key : value for key, value in {**ORIGINAL, **correction}.items() if value is not None}
+    compiled, duplicates = compile_questions(tmp_path, [ORIGINAL, corrected, dict(corrected)])
+    assert len(compiled) == 2
+    assert compiled[1][1] == corrected['answer']
+    assert sorted(compiled[1][2]) == sorted(corrected['answer_options'])
+    assert duplicates.get_conflicts == [(1, 0)]
+    # A copy of the corrected question is still an exact duplicate of it, and neither is only a near duplicate.
+    assert duplicates.get_exact_duplicates == [(2, 1)]
+    assert duplicates.get_near_duplicates == []
@@ -0,0 +1,84 @@
+import json
+import os
+
+import pytest
+
+import file_handling as files
+from file_watcher import FileWatcher
+
+CONFIG_FILE_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'data', 'config.json')
+
+def write(path, contents:str, mtime_ns:int):
+    # Set the modification time explicitly, so that writes within the file system's timestamp resolution still look different.
+    with open(path, 'w', encoding='utf-8') as file:
+        file.write(contents)
+    os.utime(path, ns=(mtime_ns, mtime_ns))
+
+@pytest.fixture
+def watched(tmp_path) -> tuple[str, FileWatcher]:
+    path = str(tmp_path / 'questions.json')
+    write(path, '[1]', 1_000_000_000)
+    watcher = FileWatcher([path])
+    # The first poll works out the digest of the file as it was loaded.
+    assert watcher.poll() == []
+    return path, watcher
+
+def test_change_is_reported_once_it_settles(watched):
+    path, watcher = watched
+    write(path, '[1, 2]', 2_000_000_000)
+    assert watcher.poll() == []
+    assert watcher.poll() == [path]
+    assert watcher.poll() == []
+
+def test_burst_of_writes_is_reported_once(watched):
+    path, watcher = watched
+    for number in range(2, 6):
+        write(path, '[' + ', '.join(['1'] * number) + ']', number * 1_000_000_000)
+        # Still being written: each poll sees a different file from the last.
+        assert watcher.poll() == []
+    assert watcher.poll() == [path]
+    assert watcher.poll() == []
+
+def test_touched_file_is_not_reported(watched):
+    path, watcher = watched
+    os.utime(path, ns=(5_000_000_000, 5_000_000_000))
+    assert watcher.poll() == []
+    assert watcher.poll() == []
+    # Rewritten with the same contents.
+    write(path, '[1]', 6_000_000_000)
+    assert watcher.poll() == []
+    assert watcher.poll() == []
+    # A real change after a touch is still reported.
+    write(path, '[2]', 7_000_000_000)
+    assert watcher.poll() == []
+    assert watcher.poll() == [path]
+
+def test_removed_file_is_reported(watched):
+    path, watcher = watched
+    os.remove(path)
+    assert watcher.poll() == []
+    assert watcher.poll() == [path]
+    assert watcher.poll() == []
+
+def test_changed_shard_is_reported(tmp_path):
+    directory = tmp_path / 'bank'
+    directory.mkdir()
+    write(directory / 'geography.json', '[]', 1_000_000_000)
+    watcher = FileWatcher([str(directory), str(directory)])
+    assert watcher.get_paths == [str(directory)]
+    assert watcher.poll() == []
+
+    write(directory / 'history.json', '[]', 1_000_000_000)
+    assert watcher.poll() == []
+    assert watcher.poll() == [str(directory)]
+    # Files that aren't shards (like the manifest) don't count.
+    write(directory / 'manifest.json', '{}', 2_000_000_000)
+    assert watcher.poll() == []
+    assert watcher.poll() == []
+
+@pytest.mark.parametrize('reload_interval, expected', [(None, None), (-5, 0.1), (0, 0.1), (0.05, 0.1), (2, 2.0)])
+def test_reload_interval_is_positive(tmp_path, reload_interval, expected):
+    with open(CONFIG_FILE_PATH, 'r', encoding='utf-8') as file:
+        values = json.load(file)
+    values['reload_interval'] = reload_interval
+    assert files.build_config(str(tmp_path / 'config.json'), values).get_reload_interval == expected
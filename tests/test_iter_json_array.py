@@ -0,0 +1,13 @@
+import json
+
+import pytest
+
+import file_handling as files
+
+@pytest.mark.parametrize('contents', ['[1.5, 2]', '[1.5e-3,-20, 3 ,{"a":[1.25]}, "x", true, null, 12345.678]', '[ 10 ]'])
+@pytest.mark.parametrize('chunk_size', [1, 2, 3, 5, 1 << 16])
+def test_numbers_split_across_chunks(tmp_path, contents, chunk_size):
+    file_path = tmp_path / 'array.json'
+    file_path.write_text(contents)
+    assert list(files.iter_json_array(str(file_path), chunk_size)) == json.loads(contents)
+    assert [element for _, element in files.iter_json_array(str(file_path), chunk_size, with_offsets=True)] == json.loads(contents)
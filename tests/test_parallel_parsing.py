@@ -0,0 +1,60 @@
+import json
+
+import pytest
+
+import file_handling as files
+import parallel_parsing
+
+def question_parts(question) -> tuple:
+    return (question.get_question, question.get_answer, question.get_answer_options, question.get_aliases, question.get_accepted_answers)
+
+def write_questions(path, questions:list[dict], indent:int|None = None):
+    with open(path, 'w', encoding='utf-8') as file:
+        json.dump(questions, file, indent=indent, ensure_ascii=False)
+    return str(path)
+
+@pytest.fixture(autouse=True)
+def small_chunks(monkeypatch, tmp_path):
+    # Parse even a small bank in parallel, in many chunks, searching for their starts a few bytes at a time.
+    monkeypatch.setattr(parallel_parsing, 'MIN_PARALLEL_FILE_SIZE', 0)
+    monkeypatch.setattr(parallel_parsing, 'CHUNKS_PER_WORKER', 8)
+    monkeypatch.setattr(parallel_parsing, 'SEARCH_SIZE', 16)
+    monkeypatch.setattr(files, 'VALIDATION_CACHE_FILE_PATH', str(tmp_path / 'validation.cache'))
+
+def bank(size:int) -> list[dict]:
+    questions = []
+    for index in range(size):
+        question = {'question' : f'Qué es {index}? "quoted" \\ {{braces}}', 'answer' : f'Answer {index % 7}', 'answer_options' : [f'Answer {option}' for option in range(index % 5, index % 5 + 3)] + [f'Answer {index % 7}']}
+        if index % 3 == 0:
+            question['aliases'] = [f'ANSWER  {index % 7}', 'Ünïcode']
+        questions.append(question)
+    return questions
+
+@pytest.mark.parametrize('indent', [None, 4])
+def test_parallel_matches_serial(tmp_path, indent):
+    file_path = write_questions(tmp_path / 'questions.json', bank(500), indent)
+    serial = files.load_questions_file(file_path)
+
+    parallel = parallel_parsing.load_questions(file_path, 2, True)
+    assert parallel is not None
+    assert [question_parts(question) for question in parallel] == [question_parts(question) for question in serial]
+    assert [question_parts(question) for question in files.load_questions_file(file_path, 2)] == [question_parts(question) for question in serial]
+
+def test_boundary_inside_string_falls_back(tmp_path):
+    questions = [{'question' : f'Which {index}? ' + '}, {' * 40, 'answer' : 'A', 'answer_options' : ['A', 'B']} for index in range(200)]
+    file_path = write_questions(tmp_path / 'questions.json', questions)
+
+    contents = open(file_path, 'rb').read()
+    true_starts = {position for position in range(len(contents)) if contents.startswith(b'{"question"', position)}
+    starts = parallel_parsing.find_chunk_starts(file_path, 16)
+    assert any(start not in true_starts for start in starts)
+
+    assert parallel_parsing.load_questions(file_path, 2, True) is None
+    assert [question_parts(question) for question in files.load_questions_file(file_path, 2)] == [question_parts(question) for question in files.load_questions_file(file_path)]
+
+def test_invalid_question_falls_back(tmp_path):
+    questions = bank(200)
+    questions[150]['answer'] = 5
+    file_path = write_questions(tmp_path / 'questions.json', questions)
+
+    assert parallel_parsing.load_questions(file_path, 2, True) is None
@@ -0,0 +1,64 @@
+import json
+import os
+from collections import Counter
+
+import pytest
+
+import question_shards
+from question_shards import INDEX_INTERVAL
+
+def write_shard(directory, file_name:str, count:int, indent:int|None = None) -> list[dict]:
+    category = question_shards.shard_category(file_name)
+    questions = [{'question' : f'{category} {file_name} {index}? "{{[' , 'answer' : f'Answer {index}', 'answer_options' : [f'Answer {index}', 'Other']} for index in range(count)]
+    with open(os.path.join(directory, file_name), 'w', encoding='utf-8') as file:
+        json.dump(questions, file, indent=indent)
+    return questions
+
+@pytest.mark.parametrize('indent', [None, 2])
+def test_reading_across_index_boundaries_matches_a_full_load(tmp_path, indent):
+    count = 2 * INDEX_INTERVAL + 3
+    questions = write_shard(tmp_path, 'geography.json', count, indent)
+    bank = question_shards.index_sharded_bank(str(tmp_path))
+    shard = question_shards.load_manifest(str(tmp_path))['geography.json']
+    assert shard.get_count == count
+    assert len(shard.get_offsets) == 3
+
+    # Every question read on its own, then all of them at once, in any order.
+    for index in range(count):
+        assert bank.read(shard, [index]) == {index : questions[index]}
+    everything = bank.read(shard, list(range(count - 1, -1, -1)))
+    assert [everything[index] for index in range(count)] == questions
+    boundaries = [0, INDEX_INTERVAL - 1, INDEX_INTERVAL, INDEX_INTERVAL + 1, 2 * INDEX_INTERVAL, count - 1]
+    assert bank.read(shard, boundaries) == {index : questions[index] for index in boundaries}
+    assert list(bank.iter_questions()) == questions
+
+def test_reading_past_the_end_is_an_error(tmp_path):
+    write_shard(tmp_path, 'geography.json', 10)
+    bank = question_shards.index_sharded_bank(str(tmp_path))
+    with pytest.raises(ValueError):
+        bank.read(question_shards.load_manifest(str(tmp_path))['geography.json'], [10])
+
+@pytest.fixture
+def categorised_bank(tmp_path) -> question_shards.ShardedBank:
+    write_shard(tmp_path, 'geography.json', INDEX_INTERVAL + 10)
+    write_shard(tmp_path, 'geography.2.json', 300)
+    write_shard(tmp_path, 'history.json', 20)
+    write_shard(tmp_path, 'science.json', 5)
+    return question_shards.index_sharded_bank(str(tmp_path))
+
+@pytest.mark.parametrize('seed', range(5))
+def test_category_quotas_are_honoured(categorised_bank, seed):
+    assert categorised_bank.get_categories == {'geography' : INDEX_INTERVAL + 310, 'history' : 20, 'science' : 5}
+    # Science has fewer questions than its quota, and there are no music questions at all.
+    questions = categorised_bank.sample(0, {'geography' : 100, 'history' : 20, 'science' : 8, 'music' : 3}, seed)
+    texts = [question.get_question for question in questions]
+    assert len(set(texts)) == len(texts)
+    assert Counter(text.split(' ', 1)[0] for text in texts) == {'geography' : 100, 'history' : 20, 'science' : 5}
+    assert [question.get_question for question in categorised_bank.sample(0, {'geography' : 100, 'history' : 20, 'science' : 8, 'music' : 3}, seed)] == texts
+
+def test_sample_without_quotas(categorised_bank):
+    assert len(categorised_bank.sample(50, None, 1)) == 50
+    # Asking for more questions than the bank has gives every question once.
+    questions = categorised_bank.sample(10000, None, 1)
+    assert sorted(question.get_question for question in questions) == sorted(question['question'] for question in categorised_bank.iter_questions())
+    assert categorised_bank.sample(5, {'history' : 0}, 1) == []
@@ -0,0 +1,62 @@
+import asyncio
+import io
+import json
+import random
+
+import pytest
+
+from display_text import DisplayText
+from engine import QuizEngine
+from prompts import Prompts
+from question import Question
+from quiz import Quiz
+from rendering import Screen
+from server import QuizSession
+
+QUESTIONS = [Question(f'Question {number}?', 'A', ['A', 'B', 'C', 'D'], ['ay'] if number % 2 else None) for number in range(6)]
+INDEXED_ANSWERS = ['x', 9, 2, 1, 3, 4, 2, 1] * 6
+TYPED_ANSWERS = ['B', 'ay', 'a', 'C', 'D', 'B', 'zz', 'A'] * 6
+
+class RecordingWriter:
+    def __init__(self):
+        self.messages:list[dict] = []
+    def write(self, data:bytes):
+        self.messages.append(json.loads(data))
+    async def drain(self):
+        pass
+
+class AcceptingScoreWriter:
+    async def save(self, row, session, outcomes = None) -> bool:
+        return True
+
+def play_in_terminal(multiple_choice:bool, select_using_index:bool, answers:list) -> Quiz:
+    random.seed(1)
+    quiz = Quiz(QUESTIONS, multiple_choice, select_using_index, 3, 1, None, Screen(io.StringIO(), io.StringIO(''.join(f'{answer}\n' for answer in answers))))
+    quiz.start()
+    return quiz
+
+def play_on_server(multiple_choice:bool, select_using_index:bool, answers:list) -> tuple[QuizSession, list[dict]]:
+    async def play():
+        random.seed(1)
+        reader = asyncio.StreamReader()
+        messages = [{'name' : 'amy'}, *({'answer' : answer} for answer in answers), {'save' : False}]
+        reader.feed_data(''.join(json.dumps(message) + '\n' for message in messages).encode('utf-8'))
+        reader.feed_eof()
+        writer = RecordingWriter()
+        session = QuizSession(reader, writer, QUESTIONS, QuizEngine(multiple_choice, select_using_index, 3, 1), DisplayText.snapshot(), Prompts.snapshot())
+        await session.play(AcceptingScoreWriter(), False)
+        return session, writer.messages
+    return asyncio.run(play())
+
+@pytest.mark.parametrize('multiple_choice, select_using_index, answers', [(True, True, INDEXED_ANSWERS), (True, False, TYPED_ANSWERS), (False, False, TYPED_ANSWERS)])
+def test_terminal_and_server_share_the_quiz_flow(text_tables, multiple_choice, select_using_index, answers):
+    quiz = play_in_terminal(multiple_choice, select_using_index, answers)
+    session, messages = play_on_server(multiple_choice, select_using_index, answers)
+
+    assert session.get_outcomes == quiz.get_outcomes
+    results = next(message for message in messages if message['type'] == 'results')
+    assert results['final_score'] == quiz.get_final_score
+    assert results['max_score'] == quiz.get_results.get_max_score
+    # The same answer options are shown in the same order.
+    displayed = [message['answer_options'] for message in messages if message['type'] == 'question']
+    assert len(displayed) == len(QUESTIONS)
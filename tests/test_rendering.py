@@ -0,0 +1,12 @@
+import io
+
+from rendering import Screen, compile_template
+
+def test_fieldless_template_ignores_arguments():
+    assert compile_template('Correct!')(3) == 'Correct!'
+    assert compile_template('{{Correct}}')() == '{Correct}'
+
+def test_screen_renders_fieldless_template_with_arguments():
+    screen = Screen(io.StringIO(), io.StringIO())
+    assert screen.render('Correct!', 3) == 'Correct!'
+    assert screen.render('Score: {}', 3) == 'Score: 3'
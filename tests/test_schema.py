@@ -0,0 +1,137 @@
+import json
+import os
+
+import pytest
+
+import file_handling as files
+import schema
+from display_text import DisplayText
+from error_handling import ErrorMessages
+
+CONFIG_FILE_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'data', 'config.json')
+QUESTION = {'question' : 'Capital of France?', 'answer' : 'Paris', 'answer_options' : ['Paris', 'Rome'], 'aliases' : ['paree']}
+
+def shipped_config() -> dict:
+    with open(CONFIG_FILE_PATH, 'r', encoding='utf-8') as file:
+        return json.load(file)
+
+@pytest.mark.parametrize('changes', [
+    {}
+    ,{'question_seed' : 7, 'compiled_question_file_path' : 'data/questions.qbank'}
+    # Any JSON number is a float: integers are too.
+    ,{'target_difficulty' : 1, 'reload_interval' : 0.5}
+    ,{'category_quotas' : {'geography' : 3, 'history' : 0}}
+    ,{'score_backend' : 'json'}
+    ,{'score_backend' : 'sqlite'}
+    ,{'question_load_workers' : None}
+])
+def test_valid_config(changes):
+    assert schema.CONFIG_SCHEMA.check({**shipped_config(), **changes}) == []
+
+@pytest.mark.parametrize('changes, problem', [
+    ({'number_of_questions' : '3'}, ErrorMessages.WRONG_TYPE.format('Config: "number_of_questions"', 'an integer', 'a string'))
+    # `true` and `false` are not integers, even though Python thinks they are.
+    ,({'number_of_attempts' : True}, ErrorMessages.WRONG_TYPE.format('Config: "number_of_attempts"', 'an integer', 'true or false'))
+    ,({'number_of_questions' : 2.5}, ErrorMessages.WRONG_TYPE.format('Config: "number_of_questions"', 'an integer', 'a number'))
+    ,({'multiple_choice' : 1}, ErrorMessages.WRONG_TYPE.format('Config: "multiple_choice"', 'true or false', 'an integer'))
+    ,({'question_file_path' : None}, ErrorMessages.WRONG_TYPE.format('Config: "question_file_path"', 'a string', 'null'))
+    ,({'target_difficulty' : '0.5'}, ErrorMessages.WRONG_TYPE.format('Config: "target_difficulty"', 'a number or null', 'a string'))
+    ,({'category_quotas' : []}, ErrorMessages.WRONG_TYPE.format('Config: "category_quotas"', 'an object or null', 'a list'))
+    ,({'category_quotas' : {'geography' : 'three'}}, ErrorMessages.WRONG_TYPE.format('Config: "category_quotas"[geography]', 'an integer', 'a string'))
+    ,({'score_backend' : 'mongodb'}, ErrorMessages.NOT_A_CHOICE.format('Config: "score_backend"', '"json", "sqlite", "columnar"', '"mongodb"'))
+    ,({'colour' : 'blue'}, ErrorMessages.KEY_UNEXPECTED.format('Config', 'colour'))
+])
+def test_invalid_config(changes, problem):
+    assert schema.CONFIG_SCHEMA.check({**shipped_config(), **changes}) == [problem]
+
+def test_every_problem_is_found():
+    values = shipped_config()
+    del values['score_file_path']
+    # Optional keys can be left out.
+    del values['score_backend']
+    values['multiple_choice'] = 'yes'
+    values['extra'] = 1
+    assert schema.CONFIG_SCHEMA.check(values) == [
+        ErrorMessages.WRONG_TYPE.format('Config: "multiple_choice"', 'true or false', 'a string')
+        ,ErrorMessages.KEY_MISSING.format('Config', 'score_file_path')
+        ,ErrorMessages.KEY_UNEXPECTED.format('Config', 'extra')
+    ]
+    assert schema.CONFIG_SCHEMA.check([values]) == [ErrorMessages.WRONG_TYPE.format('Config', 'an object', 'a list')]
+
+@pytest.mark.parametrize('question, problems', [
+    (QUESTION, [])
+    ,({**QUESTION, 'aliases' : None}, [])
+    ,({key : value for key, value in QUESTION.items() if key != 'aliases'}, [])
+    ,({**QUESTION, 'answer' : 5}, [ErrorMessages.WRONG_TYPE.format('Question 3: "answer"', 'a string', 'an integer')])
+    ,({**QUESTION, 'answer_options' : ['Paris', 2, None]}, [ErrorMessages.WRONG_TYPE.format('Question 3: "answer_options"[1]', 'a string', 'an integer'), ErrorMessages.WRONG_TYPE.format('Question 3: "answer_options"[2]', 'a string', 'null')])
+    ,({**QUESTION, 'aliases' : 'paree'}, [ErrorMessages.WRONG_TYPE.format('Question 3: "aliases"', 'a list or null', 'a string')])
+    ,({'answer' : 'Paris', 'answer_options' : []}, [ErrorMessages.KEY_MISSING.format('Question 3', 'question')])
+    ,('Capital of France?', [ErrorMessages.WRONG_TYPE.format('Question 3', 'an object', 'a string')])
+])
+def test_questions(question, problems):
+    assert schema.QUESTION_SCHEMA.check_element(question, 2) == problems
+
+def test_text_table_schema():
+    text_schema = schema.text_table_schema(DisplayText)
+    values = {name : 'text' for name in DisplayText.__annotations__}
+    assert text_schema.check(values) == []
+    name = next(iter(DisplayText.__annotations__))
+    assert text_schema.check({**values, name : 1}) == [ErrorMessages.WRONG_TYPE.format(f'DisplayText: "{name}"', 'a string', 'an integer')]
+
+def test_fingerprint_changes_with_the_schema():
+    fields = [schema.Field('a', (int,)), schema.Field('b', (str,), False)]
+    assert schema.Schema('S', fields).get_fingerprint == schema.Schema('S', list(fields)).get_fingerprint
+    assert schema.Schema('S', [*fields, schema.Field('c', (int,), False)]).get_fingerprint != schema.Schema('S', fields).get_fingerprint
+    assert schema.Schema('S', [fields[0], schema.Field('b', (str,), False, choices=('x',))]).get_fingerprint != schema.Schema('S', fields).get_fingerprint
+
+@pytest.fixture
+def verified_file(tmp_path) -> tuple[str, str]:
+    cache_path = str(tmp_path / 'validation.cache')
+    file_path = str(tmp_path / 'questions.json')
+    with open(file_path, 'w', encoding='utf-8') as file:
+        json.dump([QUESTION], file)
+    os.utime(file_path, ns=(1_000_000_000, 1_000_000_000))
+    schema.record_verified(cache_path, file_path, schema.QUESTION_SCHEMA, (1_000_000_000, os.path.getsize(file_path)))
+    assert schema.is_verified(cache_path, file_path, schema.QUESTION_SCHEMA)
+    return cache_path, file_path
+
+def rewrite(file_path:str, contents:str, mtime_ns:int):
+    with open(file_path, 'w', encoding='utf-8') as file:
+        file.write(contents)
+    os.utime(file_path, ns=(mtime_ns, mtime_ns))
+
+def test_changed_file_is_validated_again(verified_file):
+    cache_path, file_path = verified_file
+    with open(file_path, 'r', encoding='utf-8') as file:
+        contents = file.read()
+    # The same size, so only the digest shows it changed.
+    rewrite(file_path, contents.replace('Paris', 'Parks'), 2_000_000_000)
+    assert not schema.is_verified(cache_path, file_path, schema.QUESTION_SCHEMA)
+    rewrite(file_path, contents + ' ', 3_000_000_000)
+    assert not schema.is_verified(cache_path, file_path, schema.QUESTION_SCHEMA)
+
+def test_touched_file_is_still_verified(verified_file):
+    cache_path, file_path = verified_file
+    os.utime(file_path, ns=(2_000_000_000, 2_000_000_000))
+    assert schema.is_verified(cache_path, file_path, schema.QUESTION_SCHEMA)
+    # The new modification time is recorded, so the file isn't hashed again.
+    assert schema.load_validation_cache(cache_path)[os.path.abspath(file_path)][0] == 2_000_000_000
+
+def test_cache_is_per_schema_and_file(verified_file, tmp_path):
+    cache_path, file_path = verified_file
+    assert not schema.is_verified(cache_path, file_path, schema.Schema('Question', [schema.Field('question', (str,))]))
+    assert not schema.is_verified(cache_path, str(tmp_path / 'other.json'), schema.QUESTION_SCHEMA)
+    os.remove(file_path)
+    assert not schema.is_verified(cache_path, file_path, schema.QUESTION_SCHEMA)
+
+def test_invalid_edit_to_a_verified_file_is_caught(tmp_path, monkeypatch, capsys):
+    monkeypatch.setattr(files, 'VALIDATION_CACHE_FILE_PATH', str(tmp_path / 'validation.cache'))
+    file_path = str(tmp_path / 'questions.json')
+    rewrite(file_path, json.dumps([QUESTION]), 1_000_000_000)
+    assert [question.get_answer for question in files.load_questions_file(file_path)] == ['Paris']
+    assert schema.is_verified(files.VALIDATION_CACHE_FILE_PATH, file_path, schema.QUESTION_SCHEMA)
+
+    rewrite(file_path, json.dumps([{**QUESTION, 'answer' : 12345}]), 2_000_000_000)
+    with pytest.raises(SystemExit):
+        files.load_questions_file(file_path)
+    assert '"answer"' in capsys.readouterr().out
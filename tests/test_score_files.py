@@ -0,0 +1,113 @@
+import glob
+import multiprocessing
+import os
+
+import pytest
+
+import file_handling as files
+import score_history
+from score_store import ColumnarScoreStore, JsonScoreStore
+
+SAVING_PROCESSES = 4
+SAVES_PER_PROCESS = 40
+BASE_SCORES = {'amy' : {'2020-01-01 00:00:00' : 50, '2020-01-02 00:00:00' : 75}}
+
+def time_stamp(number:int) -> str:
+    return f'2030-01-01 00:{number // 60:02d}:{number % 60:02d}'
+
+def save_scores(store_class, file_path:str, process:int):
+    # Small enough that the journal is compacted (by every process, racing each other) many times.
+    store = store_class(file_path, journal_compaction_size=200)
+    for number in range(SAVES_PER_PROCESS):
+        store.add_score(f'saver{process}', time_stamp(number), number % 101)
+
+def load_scores(store_class, file_path:str) -> dict[str, dict[str, int]]:
+    if store_class is JsonScoreStore:
+        return files.load_score_file(file_path)
+    return score_history.load_score_history(file_path).to_scores()
+
+@pytest.mark.parametrize('store_class', [JsonScoreStore, ColumnarScoreStore])
+def test_concurrent_saves_keep_every_row(tmp_path, store_class):
+    file_path = str(tmp_path / 'scores')
+    store_class(file_path).reset(BASE_SCORES)
+
+    context = multiprocessing.get_context('fork')
+    savers = [context.Process(target=save_scores, args=(store_class, file_path, process)) for process in range(SAVING_PROCESSES)]
+    for saver in savers:
+        saver.start()
+    for saver in savers:
+        saver.join()
+    assert all(saver.exitcode == 0 for saver in savers)
+
+    saved = load_scores(store_class, file_path)
+    assert saved.pop('amy') == BASE_SCORES['amy']
+    assert saved == {f'saver{process}' : {time_stamp(number) : number % 101 for number in range(SAVES_PER_PROCESS)} for process in range(SAVING_PROCESSES)}
+    assert glob.glob(str(tmp_path / '*.tmp')) == []
+
+def test_save_during_compaction_is_not_lost(tmp_path):
+    file_path = str(tmp_path / 'scores.json')
+    files.save_score_file(file_path, BASE_SCORES)
+    files.append_score_record(file_path, 'amy', time_stamp(1), 10)
+
+    def merge(compacting_path:str) -> tuple[bytes, None]:
+        scores = files.load_score_snapshot(file_path)
+        for name, saved_time_stamp, score in files.load_score_journal(compacting_path):
+            scores.setdefault(name, {})[saved_time_stamp] = score
+        # Saved by another process after the journal was moved aside.
+        files.append_score_record(file_path, 'bob', time_stamp(2), 20)
+        return files.encode_score_snapshot(scores), None
+
+    files.compact_journal(file_path, merge)
+    assert files.load_score_file(file_path) == {'amy' : {**BASE_SCORES['amy'], time_stamp(1) : 10}, 'bob' : {time_stamp(2) : 20}}
+
+def test_compaction_retries_when_the_score_file_is_replaced(tmp_path):
+    file_path = str(tmp_path / 'scores.json')
+    files.save_score_file(file_path, BASE_SCORES)
+    files.append_score_record(file_path, 'amy', time_stamp(1), 10)
+    merges = []
+
+    def merge(compacting_path:str) -> tuple[bytes, int]:
+        scores = files.load_score_snapshot(file_path)
+        for name, saved_time_stamp, score in files.load_score_journal(compacting_path):
+            scores.setdefault(name, {})[saved_time_stamp] = score
+        merges.append(len(merges))
+        if len(merges) == 1:
+            # Another process replaces the score file while this one is merging, so this merge is stale.
+            stat = os.stat(file_path)
+            os.utime(file_path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1_000_000_000))
+        return files.encode_score_snapshot(scores), len(merges)
+
+    assert files.compact_journal(file_path, merge) == 2
+    assert files.load_score_file(file_path) == {'amy' : {**BASE_SCORES['amy'], time_stamp(1) : 10}}
+    assert not os.path.exists(files.score_journal_path(file_path) + '.compacting')
+
+def test_leftover_temporary_file_is_ignored(tmp_path):
+    file_path = str(tmp_path / 'scores.json')
+    files.save_score_file(file_path, BASE_SCORES)
+    # Left behind by a process that crashed before moving it into place.
+    with open(file_path + '.crashed.tmp', 'w') as file:
+        file.write('{"amy": {"2020-01-01 00:')
+
+    assert files.load_score_file(file_path) == BASE_SCORES
+    files.save_score_file(file_path, {'bob' : {time_stamp(1) : 5}})
+    assert files.load_score_file(file_path) == {'bob' : {time_stamp(1) : 5}}
+
+@pytest.mark.parametrize('interrupted', ['fsync', 'replace'])
+def test_interrupted_write_keeps_the_previous_file(tmp_path, monkeypatch, interrupted):
+    file_path = str(tmp_path / 'scores.json')
+    files.save_score_file(file_path, BASE_SCORES)
+    files.append_score_record(file_path, 'amy', time_stamp(1), 10)
+    with open(file_path, 'rb') as file:
+        previous = file.read()
+
+    def interrupt(*args):
+        raise KeyboardInterrupt
+    monkeypatch.setattr(os, interrupted, interrupt)
+    with pytest.raises(KeyboardInterrupt):
+        files.save_score_file(file_path, {'bob' : {time_stamp(2) : 20}})
+    monkeypatch.undo()
+
+    with open(file_path, 'rb') as file:
+        assert file.read() == previous
+    assert files.load_score_file(file_path) == {'amy' : {**BASE_SCORES['amy'], time_stamp(1) : 10}}
+    assert glob.glob(str(tmp_path / '*.tmp')) == []
@@ -0,0 +1,99 @@
+import hashlib
+import random
+
+import pytest
+
+import file_handling as files
+import score_history
+from score_history import HEADER, MAGIC, VERSION, ScoreHistory, epoch_to_time_stamp, time_stamp_to_epoch
+from score_store import ColumnarScoreStore, leaderboard_order, user_score_order
+
+START = time_stamp_to_epoch('2024-01-01 00:00:00')
+
+def random_rows(seed:int, count:int) -> list[tuple[str, str, int]]:
+    generator = random.Random(seed)
+    # Few names, timestamps and scores, so that many rows tie on score, or on score and timestamp.
+    return [(f'user{generator.randrange(6)}', epoch_to_time_stamp(START + generator.randrange(400)), generator.choice([0, 50, 99, 100, generator.randrange(101)])) for _ in range(count)]
+
+def saved_rows(rows:list[tuple[str, str, int]]) -> list[tuple[str, int, int]]:
+    # A later score under the same name and timestamp replaces the earlier one.
+    latest = {(name, time_stamp) : score for name, time_stamp, score in rows}
+    return [(name, time_stamp_to_epoch(time_stamp), score) for (name, time_stamp), score in latest.items()]
+
+def test_migration_keeps_the_json_scores(tmp_path):
+    score_file_path = str(tmp_path / 'scores.json')
+    rows = random_rows(1, 300)
+    files.save_score_file(score_file_path, ScoreHistory.from_rows(rows[:200]).to_scores())
+    # Scores still in the JSON file's journal are migrated too.
+    files.append_score_records(score_file_path, rows[200:])
+    expected = files.load_score_file(score_file_path)
+
+    store = ColumnarScoreStore(str(tmp_path / 'scores.history'), score_file_path)
+    assert store.get_history.to_scores() == expected
+    assert all(store.get_user_scores(name) == user_scores for name, user_scores in expected.items())
+    assert score_history.load_score_history(store.get_path).to_scores() == expected
+
+    # Once migrated, the JSON file is ignored.
+    files.save_score_file(score_file_path, {})
+    assert ColumnarScoreStore(store.get_path, score_file_path).get_history.to_scores() == expected
+
+@pytest.mark.parametrize('limit', [1, 7, 1000])
+def test_paging_matches_a_full_sort(limit):
+    rows = random_rows(2, 500)
+    history = ScoreHistory.from_rows(rows)
+    expected = sorted(saved_rows(rows), key=leaderboard_order)
+
+    pages = []
+    page = history.get_top(limit)
+    while len(page) > 0:
+        assert len(page) <= limit
+        pages.extend(page)
+        page = history.get_top(limit, page[-1])
+    assert pages == expected
+
+    for name in history.get_names:
+        expected_user = sorted([(epoch, score) for row_name, epoch, score in expected if row_name == name], key=user_score_order)
+        pages = []
+        page = history.get_user_page(name, limit)
+        while len(page) > 0:
+            pages.extend(page)
+            page = history.get_user_page(name, limit, page[-1])
+        assert pages == expected_user
+        assert history.get_user_page(name, None) == expected_user
+
+def corrupt_digest(contents:bytes) -> bytes:
+    contents = bytearray(contents)
+    contents[-1] ^= 1
+    return bytes(contents)
+
+def corrupt_magic(contents:bytes) -> bytes:
+    return b'QSCX' + contents[4:]
+
+def corrupt_version(contents:bytes) -> bytes:
+    _, _, user_count, digest = HEADER.unpack_from(contents)
+    return HEADER.pack(MAGIC, VERSION + 1, user_count, digest) + contents[HEADER.size:]
+
+def corrupt_user_count(contents:bytes) -> bytes:
+    # The checksum still matches, but the header doesn't describe the users that follow it.
+    _, _, user_count, digest = HEADER.unpack_from(contents)
+    return HEADER.pack(MAGIC, VERSION, user_count + 1, digest) + contents[HEADER.size:]
+
+def corrupt_score(contents:bytes) -> bytes:
+    body = bytearray(contents[HEADER.size:])
+    body[-1] = 101
+    return HEADER.pack(MAGIC, VERSION, HEADER.unpack_from(contents)[2], hashlib.sha256(body).digest()) + bytes(body)
+
+def truncate_header(contents:bytes) -> bytes:
+    return contents[:HEADER.size - 1]
+
+@pytest.mark.parametrize('corrupt', [corrupt_digest, corrupt_magic, corrupt_version, corrupt_user_count, corrupt_score, truncate_header])
+def test_corrupted_history_is_detected(tmp_path, corrupt):
+    contents = ScoreHistory.from_rows(random_rows(3, 50)).encode()
+    assert ScoreHistory.decode(contents).to_scores() == ScoreHistory.from_rows(random_rows(3, 50)).to_scores()
+    with pytest.raises(ValueError):
+        ScoreHistory.decode(corrupt(contents))
+
+    history_path = str(tmp_path / 'scores.history')
+    with open(history_path, 'wb') as file:
+        file.write(corrupt(contents))
+    assert ColumnarScoreStore(history_path).get_corrupted
@@ -0,0 +1,104 @@
+import os
+
+import pytest
+
+import file_handling as files
+from score_store import JsonScoreStore
+
+BASE_SCORES = {'amy' : {'2020-01-01 00:00:00' : 50, '2020-01-02 00:00:00' : 75}, 'bob' : {'2020-01-01 12:00:00' : 0}}
+
+def time_stamp(number:int) -> str:
+    return f'2030-01-01 {number // 3600:02d}:{number // 60 % 60:02d}:{number % 60:02d}'
+
+def apply(scores:dict[str, dict[str, int]], records:list[tuple[str, str, int]]) -> dict[str, dict[str, int]]:
+    scores = {name : dict(user_scores) for name, user_scores in scores.items()}
+    for name, saved_time_stamp, score in records:
+        scores.setdefault(name, {})[saved_time_stamp] = score
+    return scores
+
+def test_journal_replayed_over_the_score_file(tmp_path):
+    file_path = str(tmp_path / 'scores.json')
+    files.save_score_file(file_path, BASE_SCORES)
+    records = [
+        ('carol', time_stamp(1), 100)
+        # Saved again under the same name and timestamp: the later score wins.
+        ,('amy', '2020-01-01 00:00:00', 90)
+        ,('Zoë "the\tbest"\n', time_stamp(2), 33)
+        ,('carol', time_stamp(3), 7)
+    ]
+    files.append_score_record(file_path, *records[0])
+    files.append_score_records(file_path, records[1:])
+
+    expected = apply(BASE_SCORES, records)
+    assert files.load_score_file(file_path) == expected
+    # The score file itself is untouched until the journal is compacted.
+    assert files.load_score_snapshot(file_path) == BASE_SCORES
+    store = JsonScoreStore(file_path)
+    assert {name : store.get_user_scores(name) for name in expected} == expected
+
+    files.compact_score_file(file_path)
+    assert not os.path.exists(files.score_journal_path(file_path))
+    assert files.load_score_snapshot(file_path) == expected
+
+def test_truncated_record_is_ignored(tmp_path):
+    file_path = str(tmp_path / 'scores.json')
+    files.save_score_file(file_path, BASE_SCORES)
+    files.append_score_record(file_path, 'carol', time_stamp(1), 100)
+    # Cut short by a crash part-way through a write.
+    with open(files.score_journal_path(file_path), 'ab') as journal:
+        journal.write(files.encode_score_record('dave', time_stamp(2), 50)[:-5])
+    assert files.load_score_file(file_path) == apply(BASE_SCORES, [('carol', time_stamp(1), 100)])
+
+def test_corrupted_record_is_rejected(tmp_path):
+    file_path = str(tmp_path / 'scores.json')
+    files.save_score_file(file_path, BASE_SCORES)
+    with open(files.score_journal_path(file_path), 'ab') as journal:
+        journal.write(f'{time_stamp(1)}\t101\t"carol"\n'.encode('utf-8'))
+    with pytest.raises(ValueError):
+        files.load_score_file(file_path)
+    assert JsonScoreStore(file_path).get_corrupted
+
+def test_interrupted_compaction_is_replayed_first(tmp_path):
+    file_path = str(tmp_path / 'scores.json')
+    files.save_score_file(file_path, BASE_SCORES)
+    files.append_score_record(file_path, 'carol', time_stamp(1), 10)
+    # A compaction moved the journal aside and stopped; a newer score was saved to a new journal since.
+    os.replace(files.score_journal_path(file_path), files.score_journal_path(file_path) + '.compacting')
+    files.append_score_record(file_path, 'carol', time_stamp(1), 20)
+
+    expected = apply(BASE_SCORES, [('carol', time_stamp(1), 20)])
+    assert files.load_score_file(file_path) == expected
+    # The next compaction only folds in the moved journal; the new one is left for the one after.
+    files.compact_score_file(file_path)
+    assert not os.path.exists(files.score_journal_path(file_path) + '.compacting')
+    assert files.load_score_file(file_path) == expected
+    files.compact_score_file(file_path)
+    assert files.load_score_snapshot(file_path) == expected
+
+@pytest.mark.parametrize('batch', [1, 7])
+def test_compaction_keeps_every_row(tmp_path, batch):
+    file_path = str(tmp_path / 'scores.json')
+    compaction_size = 500
+    record_size = len(files.encode_score_record('saver', time_stamp(0), 0))
+    store = JsonScoreStore(file_path, compaction_size)
+    store.reset(BASE_SCORES)
+
+    records = [(f'saver{number % 3}', time_stamp(number), number % 101) for number in range(300)]
+    compactions = 0
+    for start in range(0, len(records), batch):
+        rows = records[start:start + batch]
+        if batch == 1:
+            store.add_score(*rows[0])
+        else:
+            store.add_scores(rows)
+        journal_path = files.score_journal_path(file_path)
+        journal_size = os.path.getsize(journal_path) if os.path.exists(journal_path) else 0
+        compactions += journal_size == 0
+        # The journal is compacted as soon as it grows past the compaction size.
+        assert journal_size <= compaction_size
+        assert files.load_score_file(file_path) == apply(BASE_SCORES, records[:start + batch])
+
+    assert compactions >= len(records) * record_size // (compaction_size + batch * record_size) > 1
+    expected = apply(BASE_SCORES, records)
+    assert {name : store.get_user_scores(name) for name in expected} == expected
+    assert {name : JsonScoreStore(file_path).get_user_scores(name) for name in expected} == expected
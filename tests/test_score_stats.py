@@ -0,0 +1,82 @@
+import json
+import random
+
+import pytest
+
+import score_history
+import score_stats
+from score_history import ScoreHistory, epoch_to_time_stamp, time_stamp_to_epoch
+from score_stats import ScoreStats, score_stats_path
+from score_store import ColumnarScoreStore, stats_of_history
+
+START = time_stamp_to_epoch('2024-01-01 00:00:00')
+
+def stats_values(store:ColumnarScoreStore) -> tuple:
+    users = {name : store.get_user_stats(name) for name in store.get_history.get_names}
+    return {name : (user.get_count, user.get_total, user.get_best, user.get_recent) for name, user in users.items()}, [store.get_percentile(score) for score in range(102)]
+
+def rebuilt_values(history:ScoreHistory) -> tuple:
+    stats = ScoreStats.from_user_scores((name, history.get_user_columns(name)[1]) for name in history.get_names)
+    users = {name : stats.get_user(name) for name in history.get_names}
+    return {name : (user.get_count, user.get_total, user.get_best, user.get_recent) for name, user in users.items()}, [stats.get_percentile(score) for score in range(102)]
+
+@pytest.mark.parametrize('seed', range(5))
+def test_incremental_stats_match_a_rebuild(tmp_path, seed):
+    generator = random.Random(seed)
+    history_path = str(tmp_path / 'scores.history')
+    store = ColumnarScoreStore(history_path, journal_compaction_size=1 << 30)
+    latest = {}
+    for _ in range(300):
+        name = f'user{generator.randrange(4)}'
+        action = generator.randrange(3)
+        if action == 0 and name in latest:
+            # Replace a score already saved.
+            epoch = generator.choice(list(store.get_history.get_user_columns(name)[0]))
+        elif action == 1 and name in latest:
+            # Insert a score older than the user's latest.
+            epoch = generator.randrange(START, latest[name])
+        else:
+            epoch = latest.get(name, START) + generator.randrange(1, 100)
+        latest[name] = max(latest.get(name, epoch), epoch)
+        store.add_score(name, epoch_to_time_stamp(epoch), generator.randrange(101))
+
+        assert stats_values(store) == rebuilt_values(store.get_history)
+
+    # Reopening replays the journal over the saved stats.
+    assert stats_values(ColumnarScoreStore(history_path)) == rebuilt_values(store.get_history)
+
+def test_stale_stats_are_rebuilt(tmp_path):
+    history_path = str(tmp_path / 'scores.history')
+    rows = [(f'user{number % 3}', epoch_to_time_stamp(START + number), number % 101) for number in range(200)]
+    store = ColumnarScoreStore(history_path)
+    store.reset(ScoreHistory.from_rows(rows).to_scores())
+    digest = score_history.read_snapshot_digest(history_path)
+    assert score_stats.load_score_stats(history_path, digest) is not None
+
+    # The history file is replaced without its stats (e.g. by an older version), so the saved stats are for other scores.
+    history = ScoreHistory.from_rows(rows[:50])
+    new_digest = score_history.save_score_history(history_path, history)
+    assert score_stats.load_score_stats(history_path, new_digest) is None
+
+    reopened = ColumnarScoreStore(history_path)
+    assert stats_values(reopened) == rebuilt_values(history)
+    # The rebuilt stats are saved for the new history file.
+    with open(score_stats_path(history_path), 'r') as file:
+        saved = json.load(file)
+    assert saved['sha256'] == new_digest.hex()
+    assert score_stats.load_score_stats(history_path, new_digest).encode() == stats_of_history(history).encode()
+
+@pytest.mark.parametrize('field, value', [('version', score_stats.STATS_VERSION + 1), ('sha256', '00' * 32), ('histogram', [1] * 100)])
+def test_mismatched_stats_file_is_ignored(tmp_path, field, value):
+    history_path = str(tmp_path / 'scores.history')
+    history = ScoreHistory.from_rows([('amy', epoch_to_time_stamp(START + number), number) for number in range(20)])
+    digest = score_history.save_score_history(history_path, history)
+    score_stats.save_score_stats(history_path, stats_of_history(history), digest)
+
+    with open(score_stats_path(history_path), 'r') as file:
+        values = json.load(file)
+    values[field] = value
+    with open(score_stats_path(history_path), 'w') as file:
+        json.dump(values, file)
+    assert score_stats.load_score_stats(history_path, digest) is None
+    assert stats_values(ColumnarScoreStore(history_path)) == rebuilt_values(history)
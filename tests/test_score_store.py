@@ -0,0 +1,98 @@
+import random
+
+import pytest
+
+import file_handling as files
+from score_history import time_stamp_to_epoch
+from score_store import ScoreStore, leaderboard_order, open_score_store, user_score_order
+
+BACKENDS = ['json', 'sqlite', 'columnar']
+
+def time_stamp(generator:random.Random) -> str:
+    # Few distinct timestamps, so that scores often tie on score and timestamp.
+    return f'2030-01-{generator.randrange(1, 4):02d} 00:00:{generator.randrange(20):02d}'
+
+def rows(seed:int, count:int) -> list[tuple[str, str, int]]:
+    generator = random.Random(seed)
+    return [(f'user{generator.randrange(5)}', time_stamp(generator), generator.choice([0, 50, 100, generator.randrange(101)])) for _ in range(count)]
+
+@pytest.fixture(params=BACKENDS)
+def store_and_scores(request, tmp_path):
+    score_file_path = str(tmp_path / 'scores.json')
+    migrated = rows(1, 100)
+    scores:dict[str, dict[str, int]] = {}
+    for name, saved_time_stamp, score in migrated:
+        scores.setdefault(name, {})[saved_time_stamp] = score
+    files.save_score_file(score_file_path, scores)
+
+    store = open_score_store(request.param, score_file_path, str(tmp_path / 'scores.db'), 1024, str(tmp_path / 'scores.history'))
+    # Saved one at a time and in batches, some replacing migrated scores.
+    added = rows(2, 200)
+    for name, saved_time_stamp, score in added[:50]:
+        store.add_score(name, saved_time_stamp, score)
+    store.add_scores(added[50:])
+    for name, saved_time_stamp, score in added:
+        scores.setdefault(name, {})[saved_time_stamp] = score
+    yield store, scores
+    store.close()
+
+def test_user_scores(store_and_scores):
+    store, scores = store_and_scores
+    for name, user_scores in scores.items():
+        assert store.get_user_scores(name) == user_scores
+        expected = sorted(((time_stamp_to_epoch(saved_time_stamp), score) for saved_time_stamp, score in user_scores.items()), key=user_score_order)
+        assert store.get_user_scores_page(name, None) == expected
+        for limit in (1, 3):
+            pages = []
+            page = store.get_user_scores_page(name, limit)
+            while len(page) > 0:
+                pages.extend(page)
+                page = store.get_user_scores_page(name, limit, page[-1])
+            assert pages == expected
+    assert store.get_user_scores('nobody') == {}
+    assert store.get_user_scores_page('nobody', 10) == []
+
+@pytest.mark.parametrize('limit', [1, 7, 1000])
+def test_top_scores(store_and_scores, limit):
+    store, scores = store_and_scores
+    expected = sorted(((name, time_stamp_to_epoch(saved_time_stamp), score) for name, user_scores in scores.items() for saved_time_stamp, score in user_scores.items()), key=leaderboard_order)
+    assert store.get_top_scores(limit) == expected[:limit]
+    pages = []
+    page = store.get_top_scores(limit)
+    while len(page) > 0:
+        pages.extend(page)
+        page = store.get_top_scores(limit, page[-1])
+    assert pages == expected
+
+def test_percentile(store_and_scores):
+    store, scores = store_and_scores
+    every_score = [score for user_scores in scores.values() for score in user_scores.values()]
+    for score in range(-1, 103):
+        assert store.get_percentile(score) == 100 * sum(1 for saved in every_score if saved < score) / len(every_score)
+
+def test_user_stats(store_and_scores):
+    store, scores = store_and_scores
+    for name, user_scores in scores.items():
+        stats = store.get_user_stats(name)
+        oldest_first = [user_scores[saved_time_stamp] for saved_time_stamp in sorted(user_scores)]
+        assert (stats.get_count, stats.get_total, stats.get_best, stats.get_recent) == (len(oldest_first), sum(oldest_first), max(oldest_first), oldest_first[-10:])
+    assert store.get_user_stats('nobody') is None
+
+@pytest.mark.parametrize('backend', BACKENDS)
+def test_empty_store(tmp_path, backend):
+    store = open_score_store(backend, str(tmp_path / 'scores.json'), str(tmp_path / 'scores.db'), 1024, str(tmp_path / 'scores.history'))
+    try:
+        assert store.get_percentile(50) is None
+        assert store.get_top_scores(10) == []
+    finally:
+        store.close()
+
+def test_every_store_implements_the_interface():
+    with pytest.raises(TypeError):
+        ScoreStore('scores.json')
+
+    class PartialStore(ScoreStore):
+        def add_score(self, name:str, time_stamp:str, score:int):
+            pass
+    with pytest.raises(TypeError):
+        PartialStore('scores.json')
@@ -0,0 +1,73 @@
+class TextTable(type):
+    '''
+    A metaclass for non-instance classes of text constants (like `DisplayText` and `Prompts`) whose values are loaded from a file.
+
+    Values loaded with `set_lazy_values` are only set as class attributes the first time they are used.
+    '''
+
+    def __getattr__(cls, name:str):
+        # Only called when `name` isn't already a class attribute.
+        values = cls.__dict__.get('_lazy_values', {})
+        if name not in values:
+            raise AttributeError(f"type object '{cls.__name__}' has no attribute '{name}'")
+        value = values[name]
+        setattr(cls, name, value)
+        return value
+
+    def set_lazy_values(cls, values:dict[str, str]):
+        '''
+        Load the values of the class's constants, to be set when they are first used.
+
+        Parameters:
+            values : dict[str, str]
+                The values, keyed by constant name.
+
+        Raises:
+            KeyError
+                If a constant declared by the class is missing from `values`.
+            TypeError
+                If a value is not a string.
+        '''
+        for name in cls.__annotations__:
+            if name not in values:
+                raise KeyError(name)
+            if not isinstance(values[name], str):
+                raise TypeError(name)
+
+        # Forget any values set before, so that they are looked up again.
+        for name in cls.__annotations__:
+            if name in cls.__dict__:
+                delattr(cls, name)
+        cls._lazy_values = dict(values)
+
+    def snapshot(cls) -> 'TextSnapshot':
+        '''
+        Returns:
+            The class's current values, frozen (see `TextSnapshot`).
+        '''
+        return TextSnapshot({name : getattr(cls, name) for name in cls.__annotations__})
+
+class TextSnapshot:
+    '''
+    The values of a text table (like `DisplayText` or `Prompts`) at one moment, read the same way (e.g. `display_text.QUESTION`), for code that has to keep using the same text while the table is reloaded.
+
+    Snapshots can't be changed once made.
+
+    Attributes:
+        __values : dict[str, str]
+            The values, keyed by constant name.
+    '''
+
+    __slots__ = ('__values',)
+
+    def __init__(self, values:dict[str, str]):
+        object.__setattr__(self, '_TextSnapshot__values', dict(values))
+
+    def __getattr__(self, name:str) -> str:
+        try:
+            return self.__values[name]
+        except KeyError:
+            raise AttributeError(name)
+
+    def __setattr__(self, name:str, value):
+        raise AttributeError(f"'{type(self).__name__}' object is read-only")